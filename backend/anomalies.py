@@ -0,0 +1,130 @@
+# This file contains streaming per-category spending anomaly detection.
+# Each user keeps running statistics (count, mean and M2 via Welford's algorithm) per
+# expense category in category_stats. Every expense write updates one row in O(1)
+# without rescanning history, and an expense far above the user's usual spend in its
+# category creates a Notification. Repeating expenses are planned bills, so they're
+# left out of the statistics.
+
+import math
+import os
+from typing import Optional, Tuple
+
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from categories import determine_category
+from db_env import CategoryStat, Expense, Notification
+
+# Standard deviations above the category mean that count as unusual
+ANOMALY_Z_THRESHOLD = float(os.environ.get("ANOMALY_Z_THRESHOLD", "3.0"))
+# Expenses a category needs before it's judged at all
+ANOMALY_MIN_SAMPLES = int(os.environ.get("ANOMALY_MIN_SAMPLES", "5"))
+
+def expense_category(expense: Expense) -> str:
+    return expense.category or determine_category(expense.name or "", "")
+
+def expense_sample(expense: Expense) -> Optional[Tuple[str, float]]:
+    """The (category, amount) an expense contributes to the statistics, or None."""
+    if expense.repeating or expense.price is None:
+        return None
+    return expense_category(expense), float(expense.price)
+
+def _get_stat(db: Session, username: str, category: str) -> CategoryStat:
+    dialect = db.get_bind().dialect.name
+    if dialect not in ("sqlite", "postgresql"):
+        # No portable upsert; fall back to read-then-insert
+        stat = db.query(CategoryStat).filter_by(username=username, category=category).with_for_update().first()
+        if stat is None:
+            stat = CategoryStat(username=username, category=category, count=0, mean=0.0, m2=0.0)
+            db.add(stat)
+            db.flush([stat])  # Sessions don't autoflush, so make it visible to the next lookup
+        return stat
+    # Create the row if it's missing in one statement, so concurrent first expenses in a
+    # category don't both insert it. On SQLite (where FOR UPDATE is a no-op) the insert
+    # also takes the write lock, so the read-modify-write below can't interleave either.
+    insert = sqlite_insert if dialect == "sqlite" else postgresql_insert
+    db.execute(insert(CategoryStat.__table__)
+               .values(username=username, category=category, count=0, mean=0.0, m2=0.0)
+               .on_conflict_do_nothing(index_elements=["username", "category"]))
+    return db.query(CategoryStat).filter_by(username=username, category=category).with_for_update().one()
+
+def _add(stat: CategoryStat, value: float):
+    stat.count += 1
+    delta = value - stat.mean
+    stat.mean += delta / stat.count
+    stat.m2 += delta * (value - stat.mean)
+
+def _remove(stat: CategoryStat, value: float):
+    if stat.count <= 1:
+        stat.count, stat.mean, stat.m2 = 0, 0.0, 0.0
+        return
+    old_mean = stat.mean
+    stat.count -= 1
+    stat.mean = (old_mean * (stat.count + 1) - value) / stat.count
+    stat.m2 = max(0.0, stat.m2 - (value - old_mean) * (value - stat.mean))
+
+def z_score(stat: CategoryStat, value: float) -> Optional[float]:
+    """How many sample standard deviations value is above the mean, if the stats are usable."""
+    if stat.count < ANOMALY_MIN_SAMPLES:
+        return None
+    std = math.sqrt(stat.m2 / (stat.count - 1))
+    if std <= 0:
+        return None
+    return (value - stat.mean) / std
+
+def record_expense(db: Session, expense: Expense, previous: Optional[Tuple[str, float]] = None) -> Optional[Notification]:
+    """Fold an expense write into the user's statistics and flag it if it's an outlier.
+
+    previous is the expense's expense_sample() before an update, so its old amount can be
+    taken out first. The new amount is scored against the statistics without itself.
+    """
+    if previous is not None:
+        _remove(_get_stat(db, expense.username, previous[0]), previous[1])
+    sample = expense_sample(expense)
+    if sample is None:
+        return None
+    category, amount = sample
+    stat = _get_stat(db, expense.username, category)
+    score = z_score(stat, amount)
+    mean = stat.mean
+    _add(stat, amount)
+
+    if score is None or score < ANOMALY_Z_THRESHOLD:
+        return None
+    notification = Notification(
+        username=expense.username,
+        message=(f"Unusual {category} expense: {expense.name} (${amount:.2f}) is "
+                 f"{score:.1f} standard deviations above your average of ${mean:.2f}")
+    )
+    db.add(notification)
+    return notification
+
+def forget_expense(db: Session, expense: Expense):
+    """Take a deleted expense out of the statistics."""
+    sample = expense_sample(expense)
+    if sample is not None:
+        _remove(_get_stat(db, expense.username, sample[0]), sample[1])
+
+def rebuild_stats(db: Session, username: Optional[str] = None) -> int:
+    """Recompute statistics from scratch (e.g. for expenses written before they existed)."""
+    query = db.query(CategoryStat)
+    expenses = db.query(Expense).filter(Expense.repeating.isnot(True))
+    if username is not None:
+        query = query.filter(CategoryStat.username == username)
+        expenses = expenses.filter(Expense.username == username)
+    query.delete(synchronize_session=False)
+    stats = {}
+    count = 0
+    for expense in expenses.yield_per(1000):
+        sample = expense_sample(expense)
+        if sample is None:
+            continue
+        key = (expense.username, sample[0])
+        stat = stats.get(key)
+        if stat is None:
+            stat = stats[key] = CategoryStat(username=key[0], category=key[1], count=0, mean=0.0, m2=0.0)
+        _add(stat, sample[1])
+        count += 1
+    db.add_all(stats.values())
+    return count
@@ -0,0 +1,75 @@
+# This file contains per-category monthly budgets and the spend rollups they are compared to.
+# Every expense write adds its price to category_spend for its category and local month
+# (an upsert, so O(1) per write), which keeps budget-vs-actual for every category a single
+# indexed read over at most a few dozen rows, however many expenses the month holds.
+
+from datetime import date
+from typing import List, Optional, Tuple
+
+from sqlalchemy import func, literal, select, union_all
+from sqlalchemy.orm import Session
+
+from db_env import Budget, CategorySpend, Expense
+from categories import UNCATEGORIZED
+from sketches import upsert_totals
+import timeframes
+
+def month_start(day: date) -> date:
+    return day.replace(day=1)
+
+def expense_sample(expense: Expense, tz_name: Optional[str] = None) -> Optional[Tuple[str, date, float]]:
+    """The (category, local month, amount) an expense contributes to category_spend, or None."""
+    if expense.price is None or expense.timestamp is None:
+        return None
+    month = month_start(timeframes.local_today(tz_name, expense.timestamp))
+    return expense.category or UNCATEGORIZED, month, float(expense.price)
+
+def _apply(db: Session, username: str, sample: Tuple[str, date, float], sign: int):
+    category, month, amount = sample
+    upsert_totals(db, CategorySpend, {"username": username, "month": month, "category": category},
+                  sign, sign * amount)
+
+def record_expense(db: Session, expense: Expense, tz_name: Optional[str] = None,
+                   previous: Optional[Tuple[str, date, float]] = None):
+    """Add an expense write to its month's category spend, first removing its previous sample on updates."""
+    sample = expense_sample(expense, tz_name)
+    if sample == previous:
+        return
+    if previous is not None:
+        _apply(db, expense.username, previous, -1)
+    if sample is not None:
+        _apply(db, expense.username, sample, 1)
+
+def forget_expense(db: Session, expense: Expense, tz_name: Optional[str] = None):
+    sample = expense_sample(expense, tz_name)
+    if sample is not None:
+        _apply(db, expense.username, sample, -1)
+
+def budget_rollup(db: Session, username: str, month: date) -> List[dict]:
+    """Budgeted vs. spent for every category with a budget or spending in a local month."""
+    month = month_start(month)
+    rows = union_all(
+        select(Budget.category.label("category"), Budget.amount.label("budgeted"), literal(0.0).label("spent"))
+        .where(Budget.username == username, Budget.month == month),
+        select(CategorySpend.category, literal(0.0), CategorySpend.total)
+        .where(CategorySpend.username == username, CategorySpend.month == month)
+    ).subquery()
+    results = db.connection().execute(
+        select(rows.c.category, func.sum(rows.c.budgeted), func.sum(rows.c.spent))
+        .group_by(rows.c.category)
+        .order_by(rows.c.category)
+    )
+
+    rollup = []
+    for category, budgeted, spent in results:
+        budgeted, spent = round(budgeted or 0.0, 2), round(spent or 0.0, 2)
+        if budgeted == 0 and spent == 0:
+            continue
+        rollup.append({
+            "category": category,
+            "budgeted": budgeted,
+            "spent": spent,
+            "remaining": round(max(0, budgeted - spent), 2),
+            "percentage": round(spent / budgeted * 100, 2) if budgeted > 0 else 0
+        })
+    return rollup
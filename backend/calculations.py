@@ -1,12 +1,17 @@
 # This file contains all financial calculation logic.
 # It is used to calculate daily limits, monthly earnings, and other financial metrics.
 
-from typing import Union
-from datetime import timedelta, datetime, timezone
-from sqlalchemy import func
-from db_env import Account, Expense, DailyEarning, FinancialOverview
+import os
+from collections import defaultdict
+from typing import Union, List
+from datetime import timedelta, datetime, timezone, date, time
+from sqlalchemy import func, select, case, and_, not_
+from db_env import Account, Expense, ExpenseOccurrence, DailyEarning, FinancialOverview
 from settings.db_settings import SessionLocal
+from singleflight import coalesced
 import env
+import timeframes
+import recurring
 
 # Account functions
 def get_account(session, username):
@@ -30,10 +35,26 @@ def verify_and_get_account(session, username) -> Union[Account, int]:
     account = get_verified_account(session, username)
     return account if account else 0
 
-def get_local_date(utc_date):
-    """Convert UTC date to local date."""
-    local_date = utc_date - timedelta(hours=5)  # Adjust offset as needed
-    return local_date.replace(hour=0, minute=0, second=0, microsecond=0)
+def get_account_timezone(session, username) -> str:
+    """The account's timezone, or DEFAULT_TIMEZONE if unset."""
+    tz_name = session.query(Account.timezone).filter_by(username=username).scalar()
+    return timeframes.resolve_timezone(tz_name)
+
+def get_local_date(utc_date, tz_name=None):
+    """Convert a UTC instant to local midnight in the given timezone (DEFAULT_TIMEZONE if None)."""
+    return datetime.combine(timeframes.local_today(tz_name, utc_date), time.min)
+
+# "eager" resets repeating tasks with a nightly UPDATE; "lazy" derives completion at read time
+# from Task.last_completed_on, so no midnight write is needed
+TASK_RESET_MODE = os.environ.get("TASK_RESET_MODE", "eager").lower()
+
+def get_local_today(current_date=None, tz_name=None) -> date:
+    """The local calendar day for a UTC instant (now by default)."""
+    return timeframes.local_today(tz_name, current_date)
+
+def user_day(username, current_date=None, tz_name=None):
+    """Coalescing key for per-user daily figures: callers pass now(), so key on the local day."""
+    return username, get_local_today(current_date, tz_name)
 
 # Financial calculations
 def calculate_daily_score(username, date):
@@ -41,14 +62,15 @@ def calculate_daily_score(username, date):
     daily_expenses = calculate_total_money_spent_today(username, date)
     return daily_earnings - daily_expenses
 
-def calculate_daily_limit(username, current_date):
+@coalesced("daily_limit", key=user_day)
+def calculate_daily_limit(username, current_date, tz_name=None):
     session = SessionLocal()
     try:
         account = verify_and_get_account(session, username)
         if not account:
             return 0
 
-        monthly_earnings = calculate_monthly_earnings(username)
+        monthly_earnings = calculate_monthly_earnings(username, tz_name=tz_name)
         monthly_expenses_repeating = calculate_monthly_expenses_repeating(username)
         monthly_savings_goal = account.monthly_savings_goal or 0
 
@@ -68,12 +90,11 @@ def calculate_daily_limit(username, current_date):
 def calculate_unused_daily_limit(username, current_date, daily_limit):
     session = SessionLocal()
     try:
-        start_of_day = current_date.replace(hour=0, minute=0, second=0, microsecond=0)
-        end_of_day = start_of_day + timedelta(days=1)
+        day = timeframes.timeframe(get_account_timezone(session, username), now=current_date)
         daily_expenses = session.query(Expense).filter(
             Expense.username == username,
-            Expense.timestamp >= start_of_day,
-            Expense.timestamp < end_of_day,
+            Expense.timestamp >= day.day_start,
+            Expense.timestamp < day.day_end,
             Expense.repeating == False
         ).with_entities(func.sum(Expense.price)).scalar() or 0
 
@@ -133,12 +154,13 @@ def calculate_daily_earnings(username, date):
 def calculate_monthly_expenses_repeating(username):
     session = SessionLocal()
     try:
-        repeating_expenses = session.query(Expense).filter(
+        # Weekly and yearly rules are normalized to their monthly cost
+        monthly_repeating = session.query(func.coalesce(func.sum(recurring.monthly_amount()), 0.0)).filter(
             Expense.username == username,
             Expense.repeating == True
-        ).all()
+        ).scalar()
 
-        return env.round_env(sum(expense.price for expense in repeating_expenses), 2)
+        return env.round_env(monthly_repeating, 2)
     except Exception as e:
         print(f"An error occurred while calculating repeating monthly expenses for {username}: {str(e)}")
         return 0
@@ -151,11 +173,17 @@ def calculate_average_daily_expenses(username, current_date):
         start_date = current_date - timedelta(days=30)
         total_expenses = session.query(Expense).filter(
             Expense.username == username,
-            Expense.timestamp.between(start_date, current_date)
+            Expense.timestamp.between(start_date, current_date),
+            Expense.repeating == False
         ).with_entities(func.sum(Expense.price)).scalar() or 0
 
-        monthly_repeating = calculate_monthly_expenses_repeating(username)
-        total_expenses += monthly_repeating
+        # Recurring spend that actually fell in the last 30 local days
+        today = get_local_today(current_date, get_account_timezone(session, username))
+        total_expenses += session.query(func.coalesce(func.sum(ExpenseOccurrence.amount), 0.0)).filter(
+            ExpenseOccurrence.username == username,
+            ExpenseOccurrence.occurs_on > today - timedelta(days=30),
+            ExpenseOccurrence.occurs_on <= today
+        ).scalar()
 
         return env.round_env(total_expenses / 30, 2)
     except Exception as e:
@@ -167,23 +195,20 @@ def calculate_average_daily_expenses(username, current_date):
 def calculate_total_money_spent_today(username, current_date=None):
     session = SessionLocal()
     try:
-        current_date = get_local_date(current_date or datetime.now(timezone.utc))
-        start_of_day = current_date.replace(tzinfo=timezone.utc)
-        end_of_day = (current_date + timedelta(days=1)).replace(tzinfo=timezone.utc)
+        day = timeframes.timeframe(get_account_timezone(session, username), now=current_date)
 
-        non_repeating_expenses = session.query(Expense).filter(
+        non_repeating = session.query(func.coalesce(func.sum(Expense.price), 0.0)).filter(
             Expense.username == username,
-            Expense.timestamp.between(start_of_day, end_of_day),
+            Expense.timestamp >= day.day_start,
+            Expense.timestamp < day.day_end,
             Expense.repeating == False
-        ).all()
+        ).scalar()
 
-        repeating_expenses = session.query(Expense).filter(
-            Expense.username == username,
-            Expense.repeating == True
-        ).all()
-
-        non_repeating = sum(e.price for e in non_repeating_expenses)
-        daily_repeating = sum(e.price for e in repeating_expenses) / 30
+        # Recurring expenses count on the days they fall on, from the occurrence calendar
+        daily_repeating = session.query(func.coalesce(func.sum(ExpenseOccurrence.amount), 0.0)).filter(
+            ExpenseOccurrence.username == username,
+            ExpenseOccurrence.occurs_on == day.today
+        ).scalar()
 
         return env.round_env(non_repeating + daily_repeating, 2)
     except Exception as e:
@@ -192,7 +217,8 @@ def calculate_total_money_spent_today(username, current_date=None):
     finally:
         session.close()
 
-def calculate_monthly_earnings(username, current_date=None):
+@coalesced("monthly_earnings", key=user_day)
+def calculate_monthly_earnings(username, current_date=None, tz_name=None):
     session = SessionLocal()
     try:
         current_date = current_date or datetime.now(timezone.utc)
@@ -218,4 +244,142 @@ def calculate_monthly_earnings(username, current_date=None):
         print(f"Error calculating monthly earnings for {username}: {str(e)}")
         return 0
     finally:
-        session.close()
\ No newline at end of file
+        session.close()
+
+# Batched calculations (nightly FinancialOverview snapshots)
+def _sum_if(condition, value):
+    return func.coalesce(func.sum(case((condition, value), else_=0.0)), 0.0)
+
+def calculate_financial_overviews(session, usernames: List[str], current_date=None) -> List[dict]:
+    """Compute FinancialOverview rows for a chunk of users with a few grouped queries.
+
+    Mirrors the per-user calculate_* functions above, but aggregates every user in
+    the chunk at once instead of issuing several queries per user.
+    """
+    if not usernames:
+        return []
+    now = current_date or datetime.now(timezone.utc)
+    if now.tzinfo is not None:
+        now = now.astimezone(timezone.utc).replace(tzinfo=None)
+    month_ago = now - timedelta(days=30)
+
+    accounts = session.execute(
+        select(Account.username, Account.monthly_savings_goal, Account.timezone).where(Account.username.in_(usernames))
+    ).all()
+    goals = {row.username: row.monthly_savings_goal for row in accounts}
+
+    # Users are grouped by timezone so "today" is one range query per distinct timezone
+    frames = {}
+    by_timezone = defaultdict(list)
+    for row in accounts:
+        frame = timeframes.timeframe(row.timezone, now=now)
+        frames[row.username] = frame
+        by_timezone[frame].append(row.username)
+
+    non_repeating = not_(func.coalesce(Expense.repeating, False))
+    in_last_30_days = Expense.timestamp.between(month_ago, now)
+    expense_rows = session.execute(
+        select(
+            Expense.username,
+            _sum_if(Expense.repeating == True, recurring.monthly_amount()).label("repeating"),
+            _sum_if(and_(non_repeating, Expense.timestamp >= now - timedelta(days=1), Expense.timestamp < now + timedelta(days=1)), Expense.price).label("last_24h"),
+            _sum_if(and_(non_repeating, in_last_30_days), Expense.price).label("non_repeating_30d"),
+            func.coalesce(func.sum(Expense.price), 0.0).label("total")
+        ).where(Expense.username.in_(usernames)).group_by(Expense.username)
+    ).all()
+    expenses = {row.username: row for row in expense_rows}
+
+    spent_today = {}
+    recurring_today = {}
+    recurring_30d = {}
+    for frame, group in by_timezone.items():
+        spent_today.update(session.execute(
+            select(Expense.username, func.sum(Expense.price)).where(
+                Expense.username.in_(group),
+                non_repeating,
+                Expense.timestamp >= frame.day_start,
+                Expense.timestamp < frame.day_end
+            ).group_by(Expense.username)
+        ).all())
+        for row in session.execute(
+            select(
+                ExpenseOccurrence.username,
+                _sum_if(ExpenseOccurrence.occurs_on == frame.today, ExpenseOccurrence.amount).label("today"),
+                func.sum(ExpenseOccurrence.amount).label("last_30d")
+            ).where(
+                ExpenseOccurrence.username.in_(group),
+                ExpenseOccurrence.occurs_on > frame.today - timedelta(days=30),
+                ExpenseOccurrence.occurs_on <= frame.today
+            ).group_by(ExpenseOccurrence.username)
+        ):
+            recurring_today[row.username] = row.today
+            recurring_30d[row.username] = row.last_30d
+
+    earnings = dict(session.execute(
+        select(
+            DailyEarning.username,
+            func.coalesce(func.sum(
+                func.coalesce(DailyEarning.cash_tips, 0.0)
+                + func.coalesce(DailyEarning.hourly_rate, 0.0) * func.coalesce(DailyEarning.hours, 0.0)
+            ), 0.0)
+        ).where(
+            DailyEarning.username.in_(usernames),
+            DailyEarning.timestamp.between(month_ago, now)
+        ).group_by(DailyEarning.username)
+    ).all())
+
+    # Latest salary per user: newest salary timestamp per user, joined back for the amount
+    latest = select(
+        DailyEarning.username, func.max(DailyEarning.timestamp).label("latest")
+    ).where(
+        DailyEarning.username.in_(usernames),
+        DailyEarning.salary > 0
+    ).group_by(DailyEarning.username).subquery()
+    salaries = dict(session.execute(
+        select(DailyEarning.username, func.max(DailyEarning.salary)).join(
+            latest,
+            and_(DailyEarning.username == latest.c.username, DailyEarning.timestamp == latest.c.latest)
+        ).where(DailyEarning.salary > 0).group_by(DailyEarning.username)
+    ).all())
+
+    overviews = []
+    timestamp = datetime.now(timezone.utc)
+    for username in usernames:
+        if username not in goals:
+            continue
+        savings_goal = goals[username] or 0
+        row = expenses.get(username)
+        repeating = row.repeating if row else 0.0
+        today_spent = spent_today.get(username) or 0.0
+        frame = frames[username]
+        last_24h = row.last_24h if row else 0.0
+        non_repeating_30d = row.non_repeating_30d if row else 0.0
+        total = row.total if row else 0.0
+
+        monthly_earnings = earnings.get(username, 0.0) + salaries.get(username, 0.0) / 12
+        monthly_expenses = repeating + non_repeating_30d
+        daily_limit = max(0, (monthly_earnings - repeating - savings_goal) / 30)
+        savings = monthly_earnings - monthly_expenses
+
+        overviews.append({
+            "username": username,
+            "daily_limit": env.round_env(daily_limit, 2),
+            "daily_earnings": env.round_env(monthly_earnings / 30, 2),
+            "total_money_spent_today": env.round_env(today_spent + recurring_today.get(username, 0.0), 2),
+            "monthly_earnings": env.round_env(monthly_earnings, 2),
+            "monthly_expenses": env.round_env(monthly_expenses, 2),
+            "monthly_expenses_repeating": env.round_env(repeating, 2),
+            "monthly_expenses_non_repeating": env.round_env(non_repeating_30d, 2),
+            "savings_rate": env.round_env(savings / monthly_earnings, 4) if monthly_earnings > 0 else 0.0,
+            "savings_forecast": env.round_env(savings - savings_goal, 2),
+            "daily_expenses_total": env.round_env(last_24h, 2),
+            "average_daily_expenses": env.round_env((non_repeating_30d + recurring_30d.get(username, 0.0)) / 30, 2),
+            "total_expenses": env.round_env(total, 2),
+            "start_of_month": frame.month_start,
+            "end_of_month": frame.month_end,
+            "start_of_week": frame.week_start,
+            "end_of_week": frame.week_end,
+            "unused_daily_limit": env.round_env(max(0, daily_limit - today_spent), 2),
+            "timestamp": timestamp
+        })
+    return overviews
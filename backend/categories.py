@@ -0,0 +1,34 @@
+# This file contains the expense categories and the keyword rules used to assign them.
+# Receipts are categorized from their OCR text and vendor, manual expenses from their name.
+
+import re
+
+CATEGORY_KEYWORDS = {
+    "Groceries": ["grocery", "market", "food", "supermarket", "walmart", "kroger", "safeway", "aldi", "costco", "trader joe", "produce", "bakery", "deli", "organic", "fruits", "vegetables"],
+    "Dining": ["restaurant", "cafe", "diner", "bistro", "bar", "grill", "eatery", "pizzeria", "sushi", "takeout", "delivery", "fast food", "mcdonald", "starbucks", "chipotle", "taco", "burger"],
+    "Entertainment": ["cinema", "theater", "movie", "game", "entertainment", "concert", "festival", "amusement", "netflix", "spotify", "disney", "hulu", "ticket", "park", "event", "bowling"],
+    "Transportation": ["gas", "fuel", "taxi", "uber", "lyft", "transport", "parking", "toll", "bus", "train", "subway", "airline", "flight", "rental car", "metro", "transit", "exxon", "shell"],
+    "Utilities": ["electric", "water", "gas", "internet", "phone", "utility", "cable", "broadband", "wireless", "sewage", "trash", "waste", "at&t", "verizon", "comcast", "xfinity", "power"],
+    "Healthcare": ["doctor", "pharmacy", "hospital", "clinic", "health", "medical", "dental", "vision", "prescription", "insurance", "walgreens", "cvs", "therapy", "urgent care", "laboratory"],
+    "Shopping": ["mall", "store", "amazon", "target", "retail", "clothing", "electronics", "furniture", "department", "online", "purchase", "ebay", "best buy", "home depot", "walmart"],
+    "Education": ["tuition", "school", "college", "university", "textbook", "course", "class", "education", "student", "loan", "supplies", "books", "academic"],
+    "Personal Care": ["salon", "spa", "haircut", "beauty", "cosmetics", "barber", "gym", "fitness", "wellness", "makeup", "skincare"]
+}
+
+UNCATEGORIZED = "Uncategorized"
+CATEGORIES = list(CATEGORY_KEYWORDS) + [UNCATEGORIZED]
+
+# One alternation per category, so matching is a single regex search instead of a
+# substring test per keyword (this runs for every expense and during backfills)
+CATEGORY_PATTERNS = [
+    (cat, re.compile("|".join(re.escape(keyword) for keyword in keywords)))
+    for cat, keywords in CATEGORY_KEYWORDS.items()
+]
+
+def determine_category(text, vendor):
+    text_lower = text.lower()
+    vendor_lower = vendor.lower()
+    for cat, pattern in CATEGORY_PATTERNS:
+        if pattern.search(text_lower) or pattern.search(vendor_lower):
+            return cat
+    return UNCATEGORIZED
@@ -0,0 +1,179 @@
+# This file implements optional group commit for small writes on SQLite.
+# SQLite has one writer lock per database and pays an fsync for every commit, so many
+# tiny transactions from several workers mostly wait on each other. With
+# SQLITE_GROUP_COMMIT=true, write routes hand their unit of work to a writer thread in
+# this process instead of committing it themselves. The writer collects the units that
+# arrive within GROUP_COMMIT_WINDOW_MS (up to GROUP_COMMIT_MAX_BATCH), runs each in its
+# own SAVEPOINT of one BEGIN IMMEDIATE transaction and commits them together: one lock
+# acquisition and one fsync per batch. A unit that raises is rolled back to its
+# savepoint and only its caller gets the error; if the commit itself fails, every
+# caller in the batch does. Callers await the result, so the event loop keeps serving
+# requests (and queueing more writes) while a batch is written.
+# Without the setting, run() executes the unit on the request's session and commits it
+# right away, exactly like the routes did before.
+
+import asyncio
+import os
+import queue
+import threading
+import time
+from typing import Any, Callable
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from metrics import instrument_engine
+from settings.db_settings import engine, IS_SQLITE, IS_MEMORY
+
+GROUP_COMMIT = os.environ.get("SQLITE_GROUP_COMMIT", "false").lower() == "true" and IS_SQLITE and not IS_MEMORY
+GROUP_COMMIT_WINDOW_MS = float(os.environ.get("GROUP_COMMIT_WINDOW_MS", "2"))
+GROUP_COMMIT_MAX_BATCH = int(os.environ.get("GROUP_COMMIT_MAX_BATCH", "64"))
+
+class CommitQueue:
+    """A writer thread that commits queued units of work in batches."""
+
+    def __init__(self, window_ms: float = GROUP_COMMIT_WINDOW_MS, max_batch: int = GROUP_COMMIT_MAX_BATCH):
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self._engine = None
+        self._sessions = None
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.operations = 0
+
+    async def submit(self, work: Callable[[Session], Any]) -> Any:
+        """Run work(session) in the next batch and return its result (or raise its error)."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._ensure_started()
+        self._queue.put((work, future, loop))
+        return await future
+
+    def stats(self) -> dict:
+        return {"batches": self.batches, "operations": self.operations,
+                "average_batch": round(self.operations / self.batches, 2) if self.batches else 0.0}
+
+    def stop(self):
+        """Finish the queued work and stop the writer (it starts again on the next submit)."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(None)
+            thread.join()
+        if self._engine is not None:
+            self._engine.dispose()
+            self._engine = self._sessions = None
+
+    def after_fork(self):
+        """Drop what a forked worker inherited: the parent's writer thread and connection."""
+        self._thread = None
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        if self._engine is not None:
+            self._engine.dispose(close=False)
+            self._engine = self._sessions = None
+
+    def _ensure_started(self):
+        # Started on first use, so a preloaded gunicorn master (or a process without group
+        # commit) never owns the thread or its connection
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    if self._engine is None:
+                        # The writer's own connection: waiting on the shared pool could deadlock,
+                        # since the requests waiting on the writer hold connections from it
+                        self._engine = create_engine(engine.url, connect_args={"check_same_thread": False},
+                                                     poolclass=StaticPool)
+                        instrument_engine(self._engine)
+                        self._sessions = sessionmaker(bind=self._engine, autoflush=False)
+                    # The thread keeps the queue and sessions it started with, so one left over
+                    # from before after_fork() cannot take work meant for its replacement
+                    self._thread = threading.Thread(target=self._run, args=(self._queue, self._sessions),
+                                                    name="commit-queue", daemon=True)
+                    self._thread.start()
+
+    def _next_batch(self, work_queue: queue.Queue) -> list:
+        first = work_queue.get()
+        if first is None:
+            return []
+        batch = [first]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                item = work_queue.get(timeout=remaining) if remaining > 0 else work_queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                work_queue.put(None)  # Stop after this batch
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self, work_queue: queue.Queue, sessions: sessionmaker):
+        while True:
+            batch = self._next_batch(work_queue)
+            if not batch:
+                return
+            outcomes = self._commit(batch, sessions)
+            self.batches += 1
+            self.operations += len(batch)
+            for (_, future, loop), (ok, value) in zip(batch, outcomes):
+                loop.call_soon_threadsafe(_resolve, future, ok, value)
+
+    def _commit(self, batch: list, sessions: sessionmaker) -> list:
+        """Run a batch in one transaction; returns (ok, result or exception) per unit."""
+        session = sessions()
+        outcomes = []
+        try:
+            # Take the write lock up front (a deferred transaction could fail to upgrade
+            # later), and so the savepoints below nest in it instead of starting their own
+            session.connection().exec_driver_sql("BEGIN IMMEDIATE")
+            for work, _, _ in batch:
+                try:
+                    with session.begin_nested():
+                        outcomes.append((True, work(session)))
+                except Exception as e:
+                    outcomes.append((False, e))
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            session.close()
+            print(f"Error committing a batch of {len(batch)} writes: {str(e)}")
+            return [(False, e)] * len(batch)
+        try:
+            # Reload what the batch wrote, as a commit-then-refresh on the request's session
+            # would, then detach it so callers can read it from the event loop
+            for instance in list(session.identity_map.values()):
+                session.refresh(instance)
+        except Exception as e:
+            print(f"Error reloading a committed batch of {len(batch)} writes: {str(e)}")
+        finally:
+            session.expunge_all()
+            session.close()
+        return outcomes
+
+def _resolve(future, ok: bool, value):
+    if future.cancelled():
+        return  # The request went away; its write was still committed (or rolled back) with the batch
+    if ok:
+        future.set_result(value)
+    else:
+        future.set_exception(value)
+
+commit_queue = CommitQueue()
+
+async def run(work: Callable[[Session], Any], db: Session) -> Any:
+    """Apply a unit of work and commit it, grouped with concurrent writes when SQLITE_GROUP_COMMIT is on.
+
+    work(session) must do all its reads and writes through the session it is given (in
+    group mode that is the writer's, not db) and return what the route needs afterwards.
+    """
+    if not GROUP_COMMIT:
+        result = work(db)
+        db.commit()
+        return result
+    return await commit_queue.submit(work)
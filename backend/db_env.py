@@ -1,13 +1,16 @@
-#This file defines all SQLAlchemy database models and migration logic.
-# It is used to create and update database tables, and run migrations safely.
+#This file defines all SQLAlchemy database models and the helpers that maintain derived tables.
+# Tables are created and upgraded by the versioned migrations in migrations.py, not on import.
 
-from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, ForeignKey, inspect, text, LargeBinary  # Moved LargeBinary import
+from sqlalchemy import Column, Integer, String, Float, Boolean, Date, DateTime, ForeignKey, LargeBinary, Index, UniqueConstraint, bindparam, func, select, update, event  # Moved LargeBinary import
 from sqlalchemy.dialects.postgresql import JSON  # Adjust JSON import if necessary
 from datetime import datetime, timezone
-from sqlalchemy.orm import relationship  # Added relationship import
+from itertools import chain
+from sqlalchemy.orm import relationship, Session  # Added relationship import
 
 # Local imports
-from settings.db_settings import Base, engine  # Updated import
+from settings.db_settings import Base  # Updated import
+from categories import determine_category
+import timeframes
 
 # Define a base class for all user-related models
 class UserBase(Base):
@@ -22,6 +25,9 @@ class Account(UserBase):
     password = Column(String)
     spending_limit = Column(Float, default=0.0)
     monthly_savings_goal = Column(Float, default=0.0)
+    data_version = Column(Integer, default=0, nullable=False)  # Bumped on every write to the user's data
+    timezone = Column(String)  # IANA name, e.g. "America/Chicago"; None means DEFAULT_TIMEZONE
+    is_admin = Column(Boolean, default=False, nullable=False)  # Can read all feedback
     feedback = relationship("Feedback", back_populates="user")
 
 # Database models
@@ -31,9 +37,38 @@ class Expense(Base):
     username = Column(String, ForeignKey('accounts.username'))
     name = Column(String)
     price = Column(Float)
+    category = Column(String)  # One of categories.CATEGORIES
     repeating = Column(Boolean, default=False)
+    recurrence = Column(String)  # weekly, monthly or yearly; set whenever repeating is true
+    recurrence_day = Column(Integer)  # Weekday (0 = Monday) for weekly, day of month otherwise
+    materialized_through = Column(Date)  # Last day expense_occurrences has been generated for
+    receipt_id = Column(Integer, ForeignKey('receipts.id'))  # Set for expenses created from a receipt
     timestamp = Column(DateTime, default=lambda: datetime.now(timezone.utc))
 
+    # Every GET /expenses filter and sort key leads with username (see read_models.ExpenseQuery)
+    __table_args__ = (
+        Index('ix_expenses_username_timestamp', 'username', 'timestamp'),
+        Index('ix_expenses_username_price', 'username', 'price'),
+        Index('ix_expenses_username_category_timestamp', 'username', 'category', 'timestamp'),
+        Index('ix_expenses_username_repeating_timestamp', 'username', 'repeating', 'timestamp'),
+        Index('ix_expenses_username_receipt_id', 'username', 'receipt_id'),
+    )
+
+# Case-insensitive name prefix filters and name sorting
+Index('ix_expenses_username_name_lower', Expense.username, func.lower(Expense.name))
+
+class ExpenseOccurrence(Base):
+    __tablename__ = 'expense_occurrences'
+    id = Column(Integer, primary_key=True, index=True)
+    expense_id = Column(Integer, ForeignKey('expenses.id'), index=True)
+    username = Column(String, ForeignKey('accounts.username'))
+    occurs_on = Column(Date)  # Local calendar day the recurring expense falls on
+    amount = Column(Float)
+
+    __table_args__ = (
+        Index('ix_expense_occurrences_username_occurs_on', 'username', 'occurs_on'),
+    )
+
 class Task(Base):
     __tablename__ = 'tasks'
     id = Column(Integer, primary_key=True, index=True)
@@ -41,6 +76,7 @@ class Task(Base):
     title = Column(String)
     is_complete = Column(Boolean, default=False)
     repeat_daily = Column(Boolean, default=False)
+    last_completed_on = Column(Date)  # Local day the task was last completed
     timestamp = Column(DateTime, default=lambda: datetime.now(timezone.utc))
 
 class DailyEarning(Base):
@@ -53,6 +89,10 @@ class DailyEarning(Base):
     salary = Column(Float)
     timestamp = Column(DateTime, default=lambda: datetime.now(timezone.utc))
 
+    __table_args__ = (
+        Index('ix_daily_earnings_username_timestamp', 'username', 'timestamp'),
+    )
+
 class InventoryItem(Base):
     __tablename__ = 'inventory_items'
     id = Column(Integer, primary_key=True, index=True)
@@ -63,6 +103,10 @@ class InventoryItem(Base):
     price = Column(Float)
     timestamp = Column(DateTime, default=lambda: datetime.now(timezone.utc))
 
+    __table_args__ = (
+        Index('ix_inventory_items_username_name', 'username', 'name'),
+    )
+
 class FinancialOverview(Base):
     __tablename__ = 'financial_overview'
     id = Column(Integer, primary_key=True, index=True)
@@ -109,6 +153,10 @@ class Receipt(Base):
     vendor = Column(String)
     timestamp = Column(DateTime, default=lambda: datetime.now(timezone.utc))
 
+    __table_args__ = (
+        Index('ix_receipts_username_vendor', 'username', 'vendor'),
+    )
+
 class Notification(Base):
     __tablename__ = 'notifications'
     id = Column(Integer, primary_key=True, index=True)
@@ -117,6 +165,50 @@ class Notification(Base):
     is_read = Column(Boolean, default=False)
     timestamp = Column(DateTime, default=lambda: datetime.now(timezone.utc))
 
+class CategoryStat(Base):
+    __tablename__ = 'category_stats'
+    username = Column(String, ForeignKey('accounts.username'), primary_key=True)
+    category = Column(String, primary_key=True)
+    count = Column(Integer, default=0)
+    mean = Column(Float, default=0.0)
+    m2 = Column(Float, default=0.0)  # Sum of squared deviations from the mean (Welford)
+
+class Budget(Base):
+    __tablename__ = 'budgets'
+    id = Column(Integer, primary_key=True, index=True)
+    username = Column(String, ForeignKey('accounts.username'))
+    category = Column(String)
+    month = Column(Date)  # First day of the local month
+    amount = Column(Float)
+
+    __table_args__ = (
+        UniqueConstraint('username', 'month', 'category', name='uq_budgets_username_month_category'),
+    )
+
+class CategorySpend(Base):
+    __tablename__ = 'category_spend'
+    username = Column(String, ForeignKey('accounts.username'), primary_key=True)
+    month = Column(Date, primary_key=True)  # First day of the local month
+    category = Column(String, primary_key=True)
+    count = Column(Integer, default=0)
+    total = Column(Float, default=0.0)
+
+class ExpenseHistogramBucket(Base):
+    __tablename__ = 'expense_histograms'
+    username = Column(String, ForeignKey('accounts.username'), primary_key=True)
+    day = Column(Date, primary_key=True)  # Local calendar day
+    bucket = Column(Integer, primary_key=True)  # Log-spaced amount bucket, see sketches.py
+    count = Column(Integer, default=0)
+    total = Column(Float, default=0.0)
+
+class MerchantDailyTotal(Base):
+    __tablename__ = 'merchant_daily_totals'
+    username = Column(String, ForeignKey('accounts.username'), primary_key=True)
+    day = Column(Date, primary_key=True)
+    merchant = Column(String, primary_key=True)
+    count = Column(Integer, default=0)
+    total = Column(Float, default=0.0)
+
 class Feedback(Base):
     __tablename__ = "feedback"
     
@@ -130,92 +222,102 @@ class Feedback(Base):
     # Relationship with Account
     user = relationship("Account", back_populates="feedback")
 
-def migrate_database():
-    """Run database migrations safely"""
-    try:
-        # Create new columns if they don't exist
-        with engine.connect() as conn:
-            # Check if columns exist before adding them
-            inspector = inspect(engine)
-            
-            # Financial overview table migrations
-            financial_columns = {col['name'] for col in inspector.get_columns('financial_overview')}
-            
-            if 'monthly_expenses_repeating' not in financial_columns:
-                conn.execute(text("""
-                    ALTER TABLE financial_overview 
-                    ADD COLUMN monthly_expenses_repeating FLOAT DEFAULT 0.0
-                """))
-                
-            if 'monthly_expenses_non_repeating' not in financial_columns:
-                conn.execute(text("""
-                    ALTER TABLE financial_overview 
-                    ADD COLUMN monthly_expenses_non_repeating FLOAT DEFAULT 0.0
-                """))
-            
-            # Inventory items table migrations
-            inventory_columns = {col['name'] for col in inspector.get_columns('inventory_items')}
-            
-            if 'category' not in inventory_columns:
-                conn.execute(text("""
-                    ALTER TABLE inventory_items 
-                    ADD COLUMN category TEXT
-                """))
-            
-            # Receipts table migrations
-            if 'receipts' in inspector.get_table_names():
-                receipts_columns = {col['name'] for col in inspector.get_columns('receipts')}
-                
-                if 'category' not in receipts_columns:
-                    conn.execute(text("""
-                        ALTER TABLE receipts 
-                        ADD COLUMN category TEXT DEFAULT 'Uncategorized'
-                    """))
-                    conn.commit()  # Commit this change immediately
-                
-                if 'timestamp' not in receipts_columns:
-                    conn.execute(text("""
-                        ALTER TABLE receipts 
-                        ADD COLUMN timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
-                    """))
-                
-                if 'vendor' not in receipts_columns:
-                    conn.execute(text("""
-                        ALTER TABLE receipts 
-                        ADD COLUMN vendor TEXT
-                    """))
-            
-            # Force recreate receipts table if needed
-            if 'receipts' in inspector.get_table_names():
-                if 'category' not in {col['name'] for col in inspector.get_columns('receipts')}:
-                    print("Receipts table is missing required columns. Trying to fix...")
-                    # First backup existing data
-                    receipts_backup = conn.execute(text("SELECT * FROM receipts")).fetchall()
-                    
-                    # Drop and recreate table with proper schema
-                    conn.execute(text("DROP TABLE IF EXISTS receipts_old"))
-                    conn.execute(text("ALTER TABLE receipts RENAME TO receipts_old"))
-                    
-                    # Create new table with proper schema
-                    Base.metadata.tables['receipts'].create(bind=engine)
-                    
-                    # Try to restore data that can be migrated
-                    if receipts_backup:
-                        print(f"Attempting to migrate {len(receipts_backup)} receipts to new schema")
-                        # Will implement data restoration based on available columns
-                
-            conn.commit()
-        
-        print("Database migration completed successfully")
-    except Exception as e:
-        print(f"Error during migration: {str(e)}")
-        raise
-
-# Create tables
-Base.metadata.create_all(bind=engine)
-
-# Run migration when file is executed directly or when imported
-migrate_database()
-
-if __name__ == "__main__":
-    print("Database setup completed")
+class SchedulerLease(Base):
+    __tablename__ = 'scheduler_leases'
+    name = Column(String, primary_key=True)
+    holder = Column(String)  # host:pid:nonce of the worker holding the lease
+    expires_at = Column(DateTime)
+
+class SchemaVersion(Base):
+    __tablename__ = 'schema_version'
+    version = Column(Integer, primary_key=True)  # A migrations.MIGRATIONS number
+    name = Column(String, nullable=False)
+    applied_at = Column(DateTime)
+
+class IdempotencyKey(Base):
+    __tablename__ = 'idempotency_keys'
+    # Written with Core statements only (see idempotency.py), so it never bumps data_version
+    username = Column(String, primary_key=True)
+    key = Column(String, primary_key=True)  # The client's Idempotency-Key header
+    method = Column(String, nullable=False)
+    path = Column(String, nullable=False)
+    fingerprint = Column(String, nullable=False)  # Hash of method, path, query and body
+    status_code = Column(Integer)  # NULL while the first request is still running
+    headers = Column(String)  # JSON list of [name, value] pairs
+    body = Column(LargeBinary)
+    created_at = Column(DateTime)
+    expires_at = Column(DateTime, index=True)  # Replay window end, or when an unfinished claim is abandoned
+
+class JobRun(Base):
+    __tablename__ = 'job_runs'
+    id = Column(Integer, primary_key=True, index=True)
+    job_id = Column(String, index=True)
+    holder = Column(String)
+    status = Column(String)  # running, success, failed
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
+    duration_seconds = Column(Float)
+    error = Column(String)
+
+def bump_data_versions(session, usernames=None):
+    """Bump the data version of the given users (all users when None) so cached reads are invalidated."""
+    stmt = update(Account).values(data_version=Account.data_version + 1)
+    if usernames is not None:
+        if not usernames:
+            return
+        stmt = stmt.where(Account.username.in_(usernames))
+    session.connection().execute(stmt)
+
+@event.listens_for(Session, "after_flush")
+def _bump_versions_after_flush(session, flush_context):
+    """Every flushed write to a user-owned row bumps that user's data version in the same transaction."""
+    usernames = {
+        obj.username
+        for obj in chain(session.new, session.dirty, session.deleted)
+        if getattr(obj, "username", None)
+    }
+    bump_data_versions(session, usernames)
+
+def backfill_expense_categories(conn, batch_size=1000) -> int:
+    """Categorize expenses written before Expense.category existed, in keyset batches."""
+    expenses = Expense.__table__
+    last_id = filled = 0
+    while True:
+        rows = conn.execute(
+            select(expenses.c.id, expenses.c.name)
+            .where(expenses.c.id > last_id, expenses.c.category.is_(None))
+            .order_by(expenses.c.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            return filled
+        last_id = rows[-1].id
+        conn.execute(
+            update(expenses).where(expenses.c.id == bindparam("expense_id")).values(category=bindparam("new_category")),
+            [{"expense_id": row.id, "new_category": determine_category(row.name or "", "")} for row in rows]
+        )
+        filled += len(rows)
+
+def rebuild_category_spend(conn, username=None) -> int:
+    """Recompute the category_spend rollups from expenses, bucketed by each user's local month."""
+    expenses, accounts, spend = Expense.__table__, Account.__table__, CategorySpend.__table__
+    query = select(expenses.c.username, expenses.c.category, expenses.c.price, expenses.c.timestamp,
+                   accounts.c.timezone).join(accounts, accounts.c.username == expenses.c.username)
+    clear = spend.delete()
+    if username is not None:
+        query = query.where(expenses.c.username == username)
+        clear = clear.where(spend.c.username == username)
+    conn.execute(clear)
+
+    totals = {}
+    for row in conn.execute(query.where(expenses.c.price.isnot(None), expenses.c.timestamp.isnot(None))):
+        month = timeframes.local_today(row.timezone, row.timestamp).replace(day=1)
+        entry = totals.setdefault((row.username, month, row.category), [0, 0.0])
+        entry[0] += 1
+        entry[1] += row.price
+    if totals:
+        conn.execute(spend.insert(), [
+            {"username": user, "month": month, "category": category, "count": count, "total": total}
+            for (user, month, category), (count, total) in totals.items()
+        ])
+    return len(totals)
@@ -1,6 +1,6 @@
 # Description: This file contains the Jinja2 environment setup for the backend.
 from builtins import round
-from jinja2 import Environment, FileSystemLoader
+from functools import lru_cache
 
 def round_env(value, precision=0):
 
@@ -10,6 +10,10 @@ def round_env(value, precision=0):
     except (ValueError, TypeError):
         return value
 
-# Create Jinja2 environment
-jinja_env = Environment(loader=FileSystemLoader("templates"))
-jinja_env.filters['round_env'] = round_env
\ No newline at end of file
+@lru_cache(maxsize=None)
+def get_jinja_env():
+    """The Jinja2 environment, created (and jinja2 imported) on first use rather than at startup."""
+    from jinja2 import Environment, FileSystemLoader
+    jinja_env = Environment(loader=FileSystemLoader("templates"))
+    jinja_env.filters['round_env'] = round_env
+    return jinja_env
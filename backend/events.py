@@ -0,0 +1,180 @@
+# This file contains the pub/sub bus behind the /events server-sent events stream.
+# Write routes publish small change events for a user after they commit, and every
+# open stream for that user receives them. Without a backend the bus only fans out
+# inside this worker; set EVENT_BUS_URL (e.g. redis://localhost:6379/0) to relay
+# events through Redis so streams on all gunicorn workers receive them (the redis
+# package is optional; without it the bus stays in-process). Dashboard deltas are
+# computed by the stream that delivers an event, so a write with nobody subscribed
+# anywhere never runs their queries.
+
+import asyncio
+import os
+import time
+from collections import defaultdict
+from typing import Optional
+
+import orjson
+from sqlalchemy.orm import Session
+
+import read_models
+import timeframes
+from responses import dumps_json
+from settings.db_settings import SessionLocal
+from singleflight import get_flight
+
+try:
+    import redis.asyncio as aioredis
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+
+# Events a slow client hasn't read yet before newer ones are dropped
+SUBSCRIBER_QUEUE_SIZE = 100
+
+class RedisBackend:
+    """Relays events through a Redis channel so every worker sees every event."""
+
+    channel = "budget-app:events"
+
+    def __init__(self, url: str):
+        self.url = url
+        self._redis = None
+        self._pubsub = None
+        self._task = None
+
+    async def start(self, deliver):
+        self._redis = aioredis.from_url(self.url)
+        self._pubsub = self._redis.pubsub()
+        await self._pubsub.subscribe(self.channel)
+        self._task = asyncio.create_task(self._listen(deliver))
+
+    async def _listen(self, deliver):
+        async for message in self._pubsub.listen():
+            if message["type"] == "message":
+                deliver(orjson.loads(message["data"]))
+
+    async def send(self, message: dict):
+        await self._redis.publish(self.channel, dumps_json(message))
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+        if self._pubsub:
+            await self._pubsub.unsubscribe(self.channel)
+            await self._pubsub.aclose()
+        if self._redis:
+            await self._redis.aclose()
+
+class EventBus:
+    """Per-user fan-out of change events to subscriber queues, optionally through a backend."""
+
+    def __init__(self, backend=None):
+        self.backend = backend
+        self._subscribers = defaultdict(set)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.published = 0
+        self.dropped = 0
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        if self.backend:
+            await self.backend.start(self._deliver)
+
+    async def stop(self):
+        if self.backend:
+            await self.backend.stop()
+        self._loop = None
+
+    def subscribe(self, username: str) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self._subscribers[username].add(queue)
+        return queue
+
+    def unsubscribe(self, username: str, queue: asyncio.Queue):
+        queues = self._subscribers.get(username)
+        if queues is not None:
+            queues.discard(queue)
+            if not queues:
+                del self._subscribers[username]
+
+    def has_listeners(self, username: str) -> bool:
+        """Whether anyone might receive this user's events (always true with a shared backend,
+        where publishing is one small Redis message)."""
+        return self._loop is not None and (self.backend is not None or username in self._subscribers)
+
+    def subscriber_count(self) -> int:
+        return sum(len(queues) for queues in self._subscribers.values())
+
+    def publish(self, username: str, event_type: str, data: dict, delta: Optional[str] = None):
+        """Publish an event for a user. Safe to call from the event loop or a worker thread."""
+        loop = self._loop
+        if loop is None:
+            return  # Bus not started (scripts, scheduler jobs outside the app)
+        message = {"username": username, "type": event_type, "data": data, "ts": time.time()}
+        if delta is not None:
+            message["delta"] = delta
+        self.published += 1
+        if self.backend:
+            asyncio.run_coroutine_threadsafe(self.backend.send(message), loop)
+        else:
+            loop.call_soon_threadsafe(self._deliver, message)
+
+    def _deliver(self, message: dict):
+        for queue in list(self._subscribers.get(message["username"], ())):
+            try:
+                queue.put_nowait(message)
+            except asyncio.QueueFull:
+                self.dropped += 1
+
+def _create_bus() -> EventBus:
+    url = os.environ.get("EVENT_BUS_URL")
+    if url and url.startswith(("redis://", "rediss://")):
+        if REDIS_AVAILABLE:
+            return EventBus(RedisBackend(url))
+        print("Warning: EVENT_BUS_URL is set but the redis package is not installed; using the in-process bus")
+    return EventBus()
+
+event_bus = _create_bus()
+
+def format_sse(message: dict) -> bytes:
+    """Encode a bus message as a server-sent event frame."""
+    payload = {"type": message["type"], "data": message["data"], "ts": message["ts"]}
+    return b"event: " + message["type"].encode("utf-8") + b"\ndata: " + dumps_json(payload) + b"\n\n"
+
+def expense_delta(db: Session, username: str, tz_name: Optional[str] = None) -> dict:
+    """Dashboard numbers that change when a user's expenses change."""
+    frame = timeframes.timeframe(tz_name)
+    return {
+        "date": frame.today.isoformat(),
+        "dailyTotal": read_models.sum_expenses(db, username, frame.day_start, frame.day_end),
+        "monthSpent": read_models.sum_expenses(db, username, frame.month_start, frame.day_end)
+    }
+
+DELTAS = {"expense": expense_delta}
+delta_flight = get_flight("event_delta")
+
+def publish_change(username: str, kind: str, action: str, data: Optional[dict] = None, delta: Optional[str] = None):
+    """Publish a '<kind>.<action>' change event, e.g. 'expense.created'.
+
+    delta names an entry of DELTAS; the streams that deliver the event fill in those
+    dashboard numbers (see attach_delta), so the writer never computes them.
+    """
+    if not event_bus.has_listeners(username):
+        return
+    event_bus.publish(username, f"{kind}.{action}", dict(data or {}), delta)
+
+async def attach_delta(message: dict, tz_name: Optional[str] = None) -> dict:
+    """Fill in a message's dashboard delta for a subscriber, once per event for all its streams here."""
+    name = message.get("delta")
+    if name is None:
+        return message
+
+    def compute():
+        db = SessionLocal()
+        try:
+            return DELTAS[name](db, message["username"], tz_name)
+        finally:
+            db.close()
+
+    key = (message["username"], name, message["ts"], tz_name)
+    return dict(message, data=dict(message["data"], delta=await delta_flight.do_async(key, compute)))
@@ -0,0 +1,50 @@
+# This file contains the gunicorn settings and server hooks used by the Docker image.
+# With preload_app the master imports the app once (main.create_app builds its routes,
+# compiled patterns, frontend manifest and OpenAPI schema) and forks the workers from
+# it, so they share that memory copy-on-write instead of each building a copy; the
+# post_fork hook then resets what a worker must not inherit (pooled DB connections,
+# the scheduler lease holder id). Set GUNICORN_PRELOAD=false to import per worker.
+# The master applies pending schema migrations once, before any worker starts, so
+# workers boot with only a schema version check (see migrations.py).
+# Workers write Prometheus samples to PROMETHEUS_MULTIPROC_DIR (see metrics.py); the
+# directory is emptied when the master starts and a dead worker's live gauges are
+# dropped when it exits, so /metrics only sums workers that are running.
+
+import gc
+import os
+import shutil
+
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:8000")
+workers = int(os.environ.get("WEB_CONCURRENCY", "4"))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = os.environ.get("GUNICORN_PRELOAD", "true").lower() == "true"
+
+# A preloaded app creates its metric files when it is imported, which is after this module
+# loads but before on_starting runs, so the directory is emptied here. The master reloads
+# this module on SIGHUP; the marker keeps that from wiping the running workers' files.
+if os.environ.get("PROMETHEUS_MULTIPROC_DIR") and not os.environ.get("PROMETHEUS_MULTIPROC_DIR_CLEARED"):
+    shutil.rmtree(os.environ["PROMETHEUS_MULTIPROC_DIR"], ignore_errors=True)
+    os.makedirs(os.environ["PROMETHEUS_MULTIPROC_DIR"], exist_ok=True)
+    os.environ["PROMETHEUS_MULTIPROC_DIR_CLEARED"] = "true"
+
+def on_starting(server):
+    from migrations import run_migrations
+    from settings.db_settings import engine
+    run_migrations()
+    # Don't hand the master's pooled connections to forked workers
+    engine.dispose()
+
+def pre_fork(server, worker):
+    # Move the master's objects to the permanent generation: the workers' garbage
+    # collector then never touches them, which would copy their pages into each worker
+    gc.freeze()
+
+def post_fork(server, worker):
+    if preload_app:
+        import main
+        main.after_fork()
+
+def child_exit(server, worker):
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
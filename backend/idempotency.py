@@ -0,0 +1,327 @@
+# This file implements Idempotency-Key support for mutating requests (POST, PUT, PATCH, DELETE).
+# A client that retries a request with the same Idempotency-Key header gets the stored
+# response back instead of running the handler again, so a retry on a flaky network
+# can't add a second expense or re-run OCR on a receipt. Responses are kept for
+# IDEMPOTENCY_TTL_SECONDS in the idempotency_keys table (shared by all workers) and in a
+# bounded in-process LRU in front of it. Keys are scoped to the user of the bearer
+# token; requests without a valid token are passed through untouched.
+# Duplicates that arrive while the first request is still running wait for it: in the
+# same worker they join its single-flight, in other workers they poll its claim row.
+# 5xx responses (and 408/409/425/429) are not stored, so those can be retried for real;
+# duplicates that were waiting on one run the request themselves instead of replaying it.
+# Responses are captured as uncompressed JSON and negotiated per send (MessagePack, br or
+# gzip), so a retry with different Accept headers still gets a body it can decode.
+# Reusing a key for a different request (method, path, query or body) is rejected with 422.
+
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+import orjson
+from jose import JWTError, jwt
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from starlette.concurrency import run_in_threadpool
+
+from auth import ALGORITHM, SECRET_KEY
+from db_env import IdempotencyKey
+from responses import JSON_MEDIA_TYPE, MSGPACK_MEDIA_TYPE, FastJSONResponse, compress, dumps_msgpack, negotiated_format
+from settings.db_settings import engine
+from singleflight import get_flight
+
+# How long a completed response is replayed for
+IDEMPOTENCY_TTL_SECONDS = int(os.environ.get("IDEMPOTENCY_TTL_SECONDS", "86400"))
+# Completed responses kept in memory per worker
+IDEMPOTENCY_CACHE_SIZE = int(os.environ.get("IDEMPOTENCY_CACHE_SIZE", "1024"))
+# How long a duplicate waits for the first request (in another worker) before a 409
+IDEMPOTENCY_WAIT_SECONDS = float(os.environ.get("IDEMPOTENCY_WAIT_SECONDS", "60"))
+# An unfinished claim older than this is treated as abandoned (its worker died)
+IDEMPOTENCY_LOCK_SECONDS = int(os.environ.get("IDEMPOTENCY_LOCK_SECONDS", "300"))
+
+METHODS = frozenset({"POST", "PUT", "PATCH", "DELETE"})
+HEADER = b"idempotency-key"
+MAX_KEY_LENGTH = 255
+POLL_SECONDS = 0.1
+# Outcomes a client is expected to retry; storing them would replay the failure
+RETRYABLE_STATUS = frozenset({408, 409, 425, 429})
+REPLAYED_HEADER = (b"idempotent-replayed", b"true")
+
+table = IdempotencyKey.__table__
+
+class StoredResponse:
+    """A captured response and the fingerprint of the request that produced it."""
+    __slots__ = ("fingerprint", "status", "headers", "body", "expires", "route")
+
+    def __init__(self, fingerprint: str, status: int, headers: list, body: bytes, expires: float, route=None):
+        self.fingerprint = fingerprint
+        self.status = status
+        self.headers = headers
+        self.body = body
+        self.expires = expires  # time.time() after which it is no longer replayed
+        self.route = route  # Matched route, so metrics label replays like the original (not persisted)
+
+    @property
+    def storable(self) -> bool:
+        return self.status < 500 and self.status not in RETRYABLE_STATUS
+
+    def render(self, wire_format: str, encoding: Optional[str]) -> tuple:
+        """Headers and body for a request's negotiated format and encoding.
+
+        Only FastJSONResponse bodies (which vary on Accept) are re-encoded; they are
+        captured as plain JSON. Anything else is sent as stored.
+        """
+        negotiated = any(name == b"vary" and b"accept" in value.lower() for name, value in self.headers)
+        if not negotiated or not self.body or (wire_format == "json" and encoding is None):
+            return self.headers, self.body
+        body, media_type = self.body, JSON_MEDIA_TYPE
+        if wire_format == "msgpack":
+            body, media_type = dumps_msgpack(orjson.loads(body)), MSGPACK_MEDIA_TYPE
+        body, used = compress(body, encoding)
+        headers = [(name, value) for name, value in self.headers
+                   if name not in (b"content-length", b"content-type", b"content-encoding")]
+        headers += [(b"content-type", media_type.encode("latin-1")), (b"content-length", str(len(body)).encode("latin-1"))]
+        if used:
+            headers.append((b"content-encoding", used.encode("latin-1")))
+        return headers, body
+
+    async def send(self, send, replayed: bool = False):
+        headers, body = self.render(*negotiated_format.get())
+        if replayed:
+            headers = headers + [REPLAYED_HEADER]
+        await send({"type": "http.response.start", "status": self.status, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
+
+class ResponseCache:
+    """Bounded LRU of stored responses keyed by (username, key); expired entries are dropped on read."""
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key) -> Optional[StoredResponse]:
+        with self._lock:
+            stored = self._entries.get(key)
+            if stored is None:
+                return None
+            if stored.expires <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return stored
+
+    def put(self, key, stored: StoredResponse) -> None:
+        with self._lock:
+            self._entries[key] = stored
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+response_cache = ResponseCache(IDEMPOTENCY_CACHE_SIZE)
+flight = get_flight("idempotency")
+
+def _utcnow():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+def token_subject(authorization: bytes) -> Optional[str]:
+    """The username of a valid bearer token, or None."""
+    scheme, _, token = authorization.decode("latin-1").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    try:
+        payload = jwt.decode(token.strip(), SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        return None
+    return payload.get("sub")
+
+def fingerprint(method: str, path: str, query: bytes, body: bytes) -> str:
+    digest = hashlib.blake2b(digest_size=16)
+    for part in (method.encode("latin-1"), path.encode("utf-8"), query, body):
+        digest.update(len(part).to_bytes(8, "big"))
+        digest.update(part)
+    return digest.hexdigest()
+
+def _from_row(row) -> StoredResponse:
+    expires = row.expires_at.replace(tzinfo=timezone.utc).timestamp()
+    headers = [(name.encode("latin-1"), value.encode("latin-1")) for name, value in json.loads(row.headers)]
+    return StoredResponse(row.fingerprint, row.status_code, headers, row.body, expires)
+
+def claim(username: str, key: str, method: str, path: str, request_fingerprint: str):
+    """Insert an unfinished row for the key. Returns (claimed, the existing row when not claimed)."""
+    now = _utcnow()
+    try:
+        with engine.begin() as conn:
+            conn.execute(insert(table).values(
+                username=username, key=key, method=method, path=path, fingerprint=request_fingerprint,
+                created_at=now, expires_at=now + timedelta(seconds=IDEMPOTENCY_LOCK_SECONDS),
+            ))
+        return True, None
+    except IntegrityError:
+        pass
+    with engine.connect() as conn:
+        return False, conn.execute(select(table).where(table.c.username == username, table.c.key == key)).first()
+
+def complete(username: str, key: str, stored: StoredResponse):
+    headers = json.dumps([[name.decode("latin-1"), value.decode("latin-1")] for name, value in stored.headers])
+    with engine.begin() as conn:
+        conn.execute(update(table).where(table.c.username == username, table.c.key == key).values(
+            status_code=stored.status, headers=headers, body=stored.body,
+            expires_at=datetime.fromtimestamp(stored.expires, timezone.utc).replace(tzinfo=None),
+        ))
+
+def release(username: str, key: str, expired_only: bool = False):
+    """Delete the key's row; with expired_only, only if it is (still) past its expiry."""
+    condition = [table.c.username == username, table.c.key == key]
+    if expired_only:
+        condition.append(table.c.expires_at <= _utcnow())
+    with engine.begin() as conn:
+        conn.execute(delete(table).where(*condition))
+
+def purge_expired() -> int:
+    """Delete expired responses and abandoned claims. Returns the number of rows removed."""
+    with engine.begin() as conn:
+        return conn.execute(delete(table).where(table.c.expires_at <= _utcnow())).rowcount
+
+def _error(status: int, detail: str) -> FastJSONResponse:
+    return FastJSONResponse({"detail": detail}, status_code=status)
+
+KEY_REUSED = "Idempotency-Key was already used for a different request"
+
+class IdempotencyMiddleware:
+    """Replay stored responses for repeated Idempotency-Key requests, in one pure ASGI layer."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in METHODS:
+            await self.app(scope, receive, send)
+            return
+
+        key = authorization = None
+        for name, value in scope["headers"]:
+            if name == HEADER:
+                key = value
+            elif name == b"authorization":
+                authorization = value
+        username = token_subject(authorization) if key and authorization else None
+        if username is None:
+            await self.app(scope, receive, send)
+            return
+        if len(key) > MAX_KEY_LENGTH:
+            await _error(400, f"Idempotency-Key must be at most {MAX_KEY_LENGTH} characters")(scope, receive, send)
+            return
+        key = key.decode("latin-1")
+
+        body = await _read_body(receive)
+        if body is None:
+            return  # The client went away before sending the whole request
+        request_fingerprint = fingerprint(scope["method"], scope["path"], scope["query_string"], body)
+
+        while True:
+            outcome = response_cache.get((username, key))
+            ran_here = False
+            if outcome is None:
+                (outcome, ran), leader = await flight.do_coroutine(
+                    (username, key), lambda: self.execute(scope, body, username, key, request_fingerprint))
+                ran_here = leader and ran
+                if isinstance(outcome, StoredResponse) and not outcome.storable and not ran_here:
+                    continue  # The run this joined failed and stored nothing, so run it again
+            break
+        if isinstance(outcome, tuple):
+            await _error(*outcome)(scope, receive, send)
+        elif outcome.fingerprint != request_fingerprint:
+            await _error(422, KEY_REUSED)(scope, receive, send)
+        else:
+            if outcome.route is not None:
+                scope["route"] = outcome.route
+            await outcome.send(send, replayed=not ran_here)
+
+    async def execute(self, scope, body: bytes, username: str, key: str, request_fingerprint: str):
+        """Claim the key and run the request, or load the response stored by whoever ran it.
+
+        Returns (StoredResponse or an error's (status, detail), whether the handler ran).
+        """
+        deadline = time.monotonic() + IDEMPOTENCY_WAIT_SECONDS
+        while True:
+            claimed, row = await run_in_threadpool(claim, username, key, scope["method"], scope["path"], request_fingerprint)
+            if claimed:
+                break
+            if row is None:
+                continue  # Released since the insert failed
+            if row.expires_at <= _utcnow():
+                # An expired response, or the claim of a worker that died mid-request
+                await run_in_threadpool(release, username, key, True)
+                continue
+            if row.status_code is not None:
+                stored = _from_row(row)
+                response_cache.put((username, key), stored)
+                return stored, False
+            if row.fingerprint != request_fingerprint:
+                return (422, KEY_REUSED), False
+            if time.monotonic() > deadline:
+                return (409, "A request with this Idempotency-Key is still in progress"), False
+            await asyncio.sleep(POLL_SECONDS)
+
+        try:
+            stored = await self.capture(scope, body, request_fingerprint)
+        except BaseException:
+            await run_in_threadpool(release, username, key)
+            raise
+        if stored.storable:
+            await run_in_threadpool(complete, username, key, stored)
+            response_cache.put((username, key), stored)
+        else:
+            await run_in_threadpool(release, username, key)
+        return stored, True
+
+    async def capture(self, scope, body: bytes, request_fingerprint: str) -> StoredResponse:
+        """Run the app with the buffered body and collect its response."""
+        sent = False
+
+        async def receive():
+            nonlocal sent
+            if not sent:
+                sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            # Nothing more to read; wait like a connected client would
+            await asyncio.Event().wait()
+
+        status, headers, chunks = 500, [], []
+
+        async def collect(message):
+            nonlocal status, headers
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = list(message.get("headers", []))
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+
+        # Captured un-negotiated; StoredResponse.render encodes it for each request it is sent to
+        token = negotiated_format.set(("json", None))
+        try:
+            await self.app(scope, receive, collect)
+        finally:
+            negotiated_format.reset(token)
+        return StoredResponse(request_fingerprint, status, headers, b"".join(chunks),
+                              time.time() + IDEMPOTENCY_TTL_SECONDS, scope.get("route"))
+
+async def _read_body(receive) -> Optional[bytes]:
+    chunks = []
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            return None
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body", False):
+            return b"".join(chunks)
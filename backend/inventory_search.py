@@ -0,0 +1,209 @@
+# This file contains full-text search over inventory items and receipt line items.
+# On SQLite an FTS5 table, inventory_fts, indexes item names and categories and is kept
+# in sync by triggers on inventory_items and receipts, so every write path (including
+# bulk and raw SQL ones) stays searchable without application code. Rows are keyed by
+# rowid: an inventory item uses its id and a receipt's Nth line item uses
+# -(receipt_id * RECEIPT_ITEM_SLOTS + N), so a receipt's rows are one rowid range.
+# Each row also carries its owner as one hex token, so a search only walks the
+# caller's postings. Other databases fall back to LIKE over inventory_items.
+# Nothing here imports db_env; migrations.py calls create_search_index.
+
+import json
+import re
+from typing import List
+
+from sqlalchemy import DateTime, text
+from sqlalchemy.orm import Session
+
+# Line items per receipt that get their own rowid (anything past this isn't indexed)
+RECEIPT_ITEM_SLOTS = 65536
+# bm25 column weights: a hit in the name counts more than one in the category
+NAME_WEIGHT = 10.0
+CATEGORY_WEIGHT = 2.0
+MAX_TERMS = 8
+
+_TERM_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+_RECEIPT_ITEMS = """
+    SELECT -({receipt}.id * {slots} + item.key), json_extract(item.value, '$.name'), {receipt}.category, hex({receipt}.username)
+    FROM {tables}json_each(CASE WHEN json_valid({receipt}.items) THEN {receipt}.items ELSE '[]' END) AS item
+    WHERE json_extract(item.value, '$.name') IS NOT NULL AND item.key < {slots}
+"""
+
+_RECEIPT_RANGE = "rowid BETWEEN -({receipt}.id * {slots} + {slots} - 1) AND -({receipt}.id * {slots})"
+
+SEARCH_DDL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS inventory_fts USING fts5(
+        name, category, owner,
+        tokenize = 'unicode61 remove_diacritics 2',
+        prefix = '2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS inventory_items_fts_insert AFTER INSERT ON inventory_items BEGIN
+        INSERT INTO inventory_fts (rowid, name, category, owner)
+        VALUES (new.id, new.name, new.category, hex(new.username));
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS inventory_items_fts_delete AFTER DELETE ON inventory_items BEGIN
+        DELETE FROM inventory_fts WHERE rowid = old.id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS inventory_items_fts_update AFTER UPDATE OF name, category, username ON inventory_items BEGIN
+        DELETE FROM inventory_fts WHERE rowid = old.id;
+        INSERT INTO inventory_fts (rowid, name, category, owner)
+        VALUES (new.id, new.name, new.category, hex(new.username));
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS receipts_fts_insert AFTER INSERT ON receipts BEGIN
+        INSERT INTO inventory_fts (rowid, name, category, owner)
+        {_RECEIPT_ITEMS.format(receipt="new", tables="", slots=RECEIPT_ITEM_SLOTS)};
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS receipts_fts_delete AFTER DELETE ON receipts BEGIN
+        DELETE FROM inventory_fts WHERE {_RECEIPT_RANGE.format(receipt="old", slots=RECEIPT_ITEM_SLOTS)};
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS receipts_fts_update AFTER UPDATE OF items, category, username ON receipts BEGIN
+        DELETE FROM inventory_fts WHERE {_RECEIPT_RANGE.format(receipt="old", slots=RECEIPT_ITEM_SLOTS)};
+        INSERT INTO inventory_fts (rowid, name, category, owner)
+        {_RECEIPT_ITEMS.format(receipt="new", tables="", slots=RECEIPT_ITEM_SLOTS)};
+    END
+    """,
+]
+
+def create_search_index(conn, rebuild: bool = False):
+    """Create the FTS table and its triggers (SQLite only), optionally reindexing existing rows."""
+    if conn.dialect.name != "sqlite":
+        return
+    for statement in SEARCH_DDL:
+        conn.execute(text(statement))
+    if rebuild:
+        conn.execute(text("DELETE FROM inventory_fts"))
+        conn.execute(text("""
+            INSERT INTO inventory_fts (rowid, name, category, owner)
+            SELECT id, name, category, hex(username) FROM inventory_items
+        """))
+        conn.execute(text(
+            "INSERT INTO inventory_fts (rowid, name, category, owner) "
+            + _RECEIPT_ITEMS.format(receipt="receipts", tables="receipts, ", slots=RECEIPT_ITEM_SLOTS)
+        ))
+        conn.execute(text("INSERT INTO inventory_fts (inventory_fts) VALUES ('optimize')"))
+
+def search_terms(query: str) -> List[str]:
+    return _TERM_PATTERN.findall(query.lower())[:MAX_TERMS]
+
+def match_expression(username: str, terms: List[str]) -> str:
+    """An FTS5 query matching every term as a prefix of a name or category word, for one owner."""
+    owner = username.encode("utf-8").hex().upper()
+    prefixes = " ".join(f'"{term}"*' for term in terms)
+    return f'owner : "{owner}" AND {{name category}} : ({prefixes})'
+
+def _fts_search(db: Session, username: str, terms: List[str], limit: int, offset: int) -> list:
+    conn = db.connection()
+    hits = conn.execute(text("""
+        SELECT rowid, name, category, bm25(inventory_fts, :name_weight, :category_weight, 0.0) AS score
+        FROM inventory_fts
+        WHERE inventory_fts MATCH :query
+        ORDER BY score, rowid
+        LIMIT :limit OFFSET :offset
+    """), {"query": match_expression(username, terms), "name_weight": NAME_WEIGHT,
+           "category_weight": CATEGORY_WEIGHT, "limit": limit, "offset": offset}).all()
+
+    item_ids = [hit.rowid for hit in hits if hit.rowid > 0]
+    receipt_ids = {-hit.rowid // RECEIPT_ITEM_SLOTS for hit in hits if hit.rowid < 0}
+    items, receipts = {}, {}
+    if item_ids:
+        items = {row.id: row for row in conn.execute(text(
+            "SELECT id, quantity, price, timestamp FROM inventory_items "
+            "WHERE username = :username AND id IN (SELECT value FROM json_each(:ids))"
+        ).columns(timestamp=DateTime), {"username": username, "ids": str(item_ids)})}
+    if receipt_ids:
+        receipts = {row.id: row for row in conn.execute(text(
+            "SELECT id, vendor, date, items FROM receipts "
+            "WHERE username = :username AND id IN (SELECT value FROM json_each(:ids))"
+        ).columns(date=DateTime), {"username": username, "ids": str(sorted(receipt_ids))})}
+
+    results = []
+    for hit in hits:
+        if hit.rowid > 0:
+            item = items.get(hit.rowid)
+            if item is None:
+                continue
+            results.append({
+                "source": "inventory",
+                "id": item.id,
+                "name": hit.name,
+                "category": hit.category,
+                "quantity": item.quantity,
+                "price": item.price,
+                "timestamp": item.timestamp,
+                "score": round(-hit.score, 4)
+            })
+        else:
+            receipt_id, index = divmod(-hit.rowid, RECEIPT_ITEM_SLOTS)
+            receipt = receipts.get(receipt_id)
+            if receipt is None:
+                continue
+            line = _line_item(receipt.items, index)
+            results.append({
+                "source": "receipt",
+                "receiptId": receipt.id,
+                "name": hit.name,
+                "category": hit.category,
+                "quantity": line.get("quantity"),
+                "price": line.get("price"),
+                "vendor": receipt.vendor,
+                "timestamp": receipt.date,
+                "score": round(-hit.score, 4)
+            })
+    return results
+
+def _line_item(items, index: int) -> dict:
+    if isinstance(items, str):
+        try:
+            items = json.loads(items)
+        except ValueError:
+            return {}
+    if isinstance(items, list) and index < len(items) and isinstance(items[index], dict):
+        return items[index]
+    return {}
+
+def _like_search(db: Session, username: str, terms: List[str], limit: int, offset: int) -> list:
+    clauses = []
+    params = {"username": username, "limit": limit, "offset": offset}
+    for i, term in enumerate(terms):
+        params[f"term{i}"] = f"%{term}%"
+        clauses.append(f"(lower(name) LIKE :term{i} OR lower(coalesce(category, '')) LIKE :term{i})")
+    rows = db.connection().execute(text(
+        "SELECT id, name, category, quantity, price, timestamp FROM inventory_items "
+        f"WHERE username = :username AND {' AND '.join(clauses)} "
+        "ORDER BY name, id LIMIT :limit OFFSET :offset"
+    ).columns(timestamp=DateTime), params)
+    return [
+        {"source": "inventory", "id": row.id, "name": row.name, "category": row.category,
+         "quantity": row.quantity, "price": row.price, "timestamp": row.timestamp, "score": None}
+        for row in rows
+    ]
+
+def search_inventory(db: Session, username: str, query: str, limit: int = 20, offset: int = 0) -> dict:
+    """Rank a user's inventory and receipt line items against a query, one page at a time."""
+    terms = search_terms(query)
+    results = []
+    if terms:
+        search = _fts_search if db.get_bind().dialect.name == "sqlite" else _like_search
+        # Fetch one extra row to know whether another page exists without counting
+        results = search(db, username, terms, limit + 1, offset)
+    return {
+        "query": query,
+        "limit": limit,
+        "offset": offset,
+        "hasMore": len(results) > limit,
+        "results": results[:limit]
+    }
@@ -1,95 +1,60 @@
 from fastapi import FastAPI, HTTPException, Request
-from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
 from contextlib import asynccontextmanager
 from pathlib import Path
-from starlette.middleware.base import BaseHTTPMiddleware
 
 # Import routes
 from routes import router
+from responses import FastJSONResponse
+from middleware import RequestMiddleware
+from idempotency import IdempotencyMiddleware
+import query_profiler
+from events import event_bus
+from scheduler import scheduler, scheduler_enabled, new_holder_id
+from metrics import metrics_flusher
+from commit_queue import commit_queue
+from migrations import MIGRATE_ON_STARTUP, run_migrations
+from settings.db_settings import engine
+from static_manifest import StaticManifest, build_frontend_manifest
+import singleflight
 
 # Define static file directories
 FRONTEND_DIR = Path(__file__).parent.parent / "frontend"
 NEXT_BUILD_DIR = FRONTEND_DIR / ".next"
 PUBLIC_DIR = FRONTEND_DIR / "public"
 
+# Route -> file manifest of the frontend, built by create_app
+frontend_assets = StaticManifest()
+
 # Define lifespan event handler
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Startup events
-    # Check .next directory (Next.js 12+ build output)
-    if NEXT_BUILD_DIR.exists():
-        static_dir = NEXT_BUILD_DIR / "static"
-        if static_dir.exists():
-            app.mount("/static", StaticFiles(directory=str(static_dir)), name="static")
-            print(f"\033[92mMounted Next.js static files from: {static_dir}\033[0m")
-        else:
-            print(f"Warning: Next.js static directory does not exist at {static_dir}")
-    
-    # Check for out directory (Next.js export output)
-    out_dir = FRONTEND_DIR / "out"
-    if out_dir.exists():
-        app.mount("/out", StaticFiles(directory=str(out_dir)), name="out")
-        print(f"Mounted Next.js export files from: {out_dir}")
-    
-    # Mount public directory for other static assets
-    if PUBLIC_DIR.exists():
-        app.mount("/public", StaticFiles(directory=str(PUBLIC_DIR)), name="public")
-        print(f"\033[92mMounted public files from: {PUBLIC_DIR}\033[0m")
+    # Startup events (in each worker; immutable state was built by create_app)
+    # Apply pending schema migrations; gunicorn's master already ran them, so workers
+    # only check the schema version
+    if MIGRATE_ON_STARTUP:
+        run_migrations()
+    
+    # Start the pub/sub bus behind /events
+    await event_bus.start()
+    
+    # Flush buffered request metrics to prometheus_client in the background
+    await metrics_flusher.start()
+    
+    # Start the job scheduler; only the worker holding the leader lease runs jobs
+    if scheduler_enabled():
+        scheduler.start()
     
     yield  # Yield control back to FastAPI
     
     # Shutdown events can be added here if needed
+    if scheduler_enabled():
+        scheduler.shutdown()
+    await metrics_flusher.stop()
+    await event_bus.stop()
+    # Commit any writes still queued for group commit
+    commit_queue.stop()
 
-# Create the FastAPI app with lifespan
-app = FastAPI(title="Budget App API", lifespan=lifespan)
-
-# Define all possible frontend origins
-allowed_origins = [
-    "https://pzqh821b-3000.usw2.devtunnels.ms",
-    "https://pzqh821b-8000.usw2.devtunnels.ms",
-    "http://localhost:3000",
-    "http://localhost:8000",
-    "http://127.0.0.1:3000",
-    "http://127.0.0.1:8000",
-    "http://10.0.0.31:3000",  
-    "http://10.0.0.31:8000",  
-    "http://76.121.92.139:8000"  
-]
-
-# Custom middleware to handle CORS with credentials properly
-class CustomCORSMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        origin = request.headers.get("origin")
-        
-        # Get the response from the next middleware or route handler
-        response = await call_next(request)
-        
-        # If the origin is in allowed_origins, set the specific origin
-        if origin in allowed_origins:
-            response.headers["Access-Control-Allow-Origin"] = origin
-            response.headers["Access-Control-Allow-Credentials"] = "true"
-            response.headers["Access-Control-Allow-Methods"] = "GET, POST, PUT, DELETE, OPTIONS"
-            response.headers["Access-Control-Allow-Headers"] = "Content-Type, Authorization, X-Requested-With"
-        
-        return response
-
-# Add the custom CORS middleware
-app.add_middleware(CustomCORSMiddleware)
-
-# Add FastAPI's CORS middleware with specific configurations
-# We're still using this but with no wildcard for credentials support
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=allowed_origins,
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-# Add a diagnostic endpoint to check data fetching
-@app.get("/api/debug/connection", tags=["Debug"])
+# Diagnostic endpoint to check data fetching
 async def check_connection():
     """
     Diagnostic endpoint to verify API connectivity
@@ -102,50 +67,91 @@ async def check_connection():
         "message": "API connection successful"
     }
 
-# Include our router
-app.include_router(router)
+# Report how many expensive computations were coalesced onto an in-flight run
+async def coalescing_stats():
+    """
+    Diagnostic endpoint for request coalescing
+    Returns per-computation call counts and how many calls were coalesced
+    """
+    return singleflight.stats()
 
 # Serve index.html from Next.js build or a fallback
-@app.get("/", include_in_schema=False)
-async def serve_index():
-    index_paths = [
-        NEXT_BUILD_DIR / "server" / "pages" / "index.html",
-        FRONTEND_DIR / "out" / "index.html",
-        PUBLIC_DIR / "index.html"
-    ]
-    
-    for path in index_paths:
-        if path.exists():
-            return FileResponse(path)
+async def serve_index(request: Request):
+    # Resolved at startup from .next/server/pages, out/ or public/, in that order
+    if frontend_assets.index is not None:
+        return frontend_assets.response(frontend_assets.index, request.headers)
     
     # Fallback response if no index file is found
     return {"message": "API server is running. Frontend is not built or configured correctly."}
 
-# Wildcard route to serve Next.js pages
-@app.get("/{full_path:path}", include_in_schema=False)
-async def serve_frontend(full_path: str):
+# Wildcard route to serve Next.js pages and static files
+async def serve_frontend(full_path: str, request: Request):
     # Skip API routes
     if full_path.startswith("api/"):
         raise HTTPException(status_code=404, detail="Not found")
     
-    # Check if file exists in out directory
-    if (FRONTEND_DIR / "out").exists():
-        file_path = FRONTEND_DIR / "out" / full_path
-        if file_path.exists() and file_path.is_file():
-            return FileResponse(file_path)
-        
-        # Try with .html extension
-        html_path = file_path.with_suffix(".html")
-        if html_path.exists():
-            return FileResponse(html_path)
-        
-        # Serve index.html for SPA navigation
-        index_path = FRONTEND_DIR / "out" / "index.html"
-        if index_path.exists():
-            return FileResponse(index_path)
-    
-    # Fallback for server-side rendering or when "out" directory doesn't exist
-    return {"message": "Page not found. Make sure your frontend is built correctly."}
+    # Exact file, page without its .html extension, or out/index.html for SPA navigation
+    asset = frontend_assets.lookup(full_path)
+    if asset is not None:
+        return frontend_assets.response(asset, request.headers)
+    
+    # A missing asset, or any page when the "out" directory doesn't exist
+    raise HTTPException(status_code=404, detail="Page not found. Make sure your frontend is built correctly.")
+
+def create_app() -> FastAPI:
+    """Build the app and its immutable state (routes, middleware, frontend manifest, OpenAPI schema).
+
+    Safe to run in a gunicorn master with preload_app: nothing here opens connections or
+    starts tasks, so forked workers share all of it copy-on-write. Per-worker resources
+    start in the lifespan, and after_fork() resets what a worker must not inherit.
+    """
+    global frontend_assets
+    application = FastAPI(title="Budget App API", lifespan=lifespan, default_response_class=FastJSONResponse)
+    
+    # Log (or, for tests, fail) requests over their query budget when QUERY_PROFILER is set;
+    # added first so it runs inside RequestMiddleware and its logs carry the request id
+    if query_profiler.ENABLED:
+        application.add_middleware(query_profiler.QueryProfilerMiddleware)
+    
+    # Replay the stored response for a retried Idempotency-Key request instead of running it again
+    application.add_middleware(IdempotencyMiddleware)
+    
+    # CORS (origins from CORS_ORIGINS), request ids, Server-Timing and MessagePack/brotli/gzip
+    # negotiation for FastJSONResponse, all in one pure ASGI layer (see middleware.py)
+    application.add_middleware(RequestMiddleware)
+    
+    application.add_api_route("/api/debug/connection", check_connection, methods=["GET"], tags=["Debug"])
+    application.add_api_route("/api/debug/coalescing", coalescing_stats, methods=["GET"], tags=["Debug"])
+    
+    # Include our router
+    application.include_router(router)
+    
+    # Frontend routes last, so the wildcard never shadows an API route
+    application.add_api_route("/", serve_index, methods=["GET"], include_in_schema=False)
+    application.add_api_route("/{full_path:path}", serve_frontend, methods=["GET"], include_in_schema=False)
+    
+    # Index the Next.js build (.next/static), export (out/) and public/ files once, so
+    # frontend requests are served from memory without touching the filesystem tree
+    frontend_assets = build_frontend_manifest(FRONTEND_DIR)
+    if len(frontend_assets):
+        print(f"\033[92mIndexed {len(frontend_assets)} frontend files from: {FRONTEND_DIR} "
+              f"({frontend_assets.inlined_bytes // 1024} KB held in memory)\033[0m")
+    else:
+        print(f"Warning: no frontend build output found under {FRONTEND_DIR}")
+    
+    # Generated lazily on the first /docs visit otherwise, separately in every worker
+    application.openapi()
+    return application
+
+def after_fork():
+    """Reset per-process state in a worker forked from a preloaded master (gunicorn's post_fork)."""
+    # Pooled connections opened in the master must not be shared between processes
+    engine.dispose(close=False)
+    commit_queue.after_fork()
+    # Each worker competes for the scheduler lease under its own holder id
+    scheduler.holder = new_holder_id()
+
+app = create_app()
 
 if __name__ == "__main__":
     import uvicorn
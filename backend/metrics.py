@@ -0,0 +1,216 @@
+# This file contains the Prometheus metrics served at /metrics.
+# Under gunicorn each worker writes its samples to the PROMETHEUS_MULTIPROC_DIR files
+# prometheus_client merges at scrape time, so any worker can answer for all of them.
+# Writing a sample there costs a microsecond or two, so the request path doesn't:
+# samples are added to process-local accumulators (plain dicts, only touched from the
+# event loop) and flushed to prometheus_client in batches every METRICS_FLUSH_SECONDS
+# and before each scrape. Work done in threadpool threads (DB queries, pool waits) is
+# added to the current request's RequestStats and recorded when the request finishes.
+
+import asyncio
+import os
+import time
+from contextvars import ContextVar
+from functools import wraps
+from typing import Optional
+
+from sqlalchemy.pool import QueuePool
+
+import singleflight
+
+try:
+    from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+    from prometheus_client import multiprocess
+    PROMETHEUS_AVAILABLE = True
+except ImportError:
+    PROMETHEUS_AVAILABLE = False
+    CONTENT_TYPE_LATEST = "text/plain; version=0.0.4; charset=utf-8"
+
+METRICS_FLUSH_SECONDS = float(os.environ.get("METRICS_FLUSH_SECONDS", "1"))
+MULTIPROCESS = bool(os.environ.get("PROMETHEUS_MULTIPROC_DIR"))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DB_TIME_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+POOL_WAIT_BUCKETS = (0.0001, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+OCR_BUCKETS = (0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0)
+
+# Requests that matched no route share one label so path scans can't blow up cardinality
+UNMATCHED_ROUTE = "<unmatched>"
+
+class RequestStats:
+    """Per-request DB counters, filled from whichever thread runs the request's queries."""
+    __slots__ = ("queries", "db_seconds", "pool_wait")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.pool_wait = 0.0
+
+request_stats: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+class _Histogram:
+    """Process-local buffer in front of a prometheus_client Histogram."""
+
+    def __init__(self, name, documentation, labelnames, buckets):
+        self.pending = {}
+        self.metric = Histogram(name, documentation, labelnames, buckets=buckets) if PROMETHEUS_AVAILABLE else None
+
+    def observe(self, labels: tuple, value: float):
+        values = self.pending.get(labels)
+        if values is None:
+            values = self.pending[labels] = []
+        values.append(value)
+
+    def flush(self):
+        pending, self.pending = self.pending, {}
+        if self.metric is None:
+            return
+        for labels, values in pending.items():
+            child = self.metric.labels(*labels) if labels else self.metric
+            for value in values:
+                child.observe(value)
+
+class _Counter:
+    """Process-local buffer in front of a prometheus_client Counter."""
+
+    def __init__(self, name, documentation, labelnames):
+        self.pending = {}
+        self.metric = Counter(name, documentation, labelnames) if PROMETHEUS_AVAILABLE else None
+
+    def inc(self, labels: tuple, amount: float = 1):
+        self.pending[labels] = self.pending.get(labels, 0) + amount
+
+    def flush(self):
+        pending, self.pending = self.pending, {}
+        if self.metric is None:
+            return
+        for labels, amount in pending.items():
+            (self.metric.labels(*labels) if labels else self.metric).inc(amount)
+
+class _Gauge:
+    """A process-local value published to a prometheus_client Gauge (summed over live workers)."""
+
+    def __init__(self, name, documentation):
+        self.value = 0
+        self.metric = Gauge(name, documentation, multiprocess_mode="livesum") if PROMETHEUS_AVAILABLE else None
+
+    def flush(self):
+        if self.metric is not None:
+            self.metric.set(self.value)
+
+request_duration = _Histogram(
+    "http_request_duration_seconds", "Time from receiving a request to sending its last byte",
+    ["method", "route", "status"], LATENCY_BUCKETS)
+requests_in_progress = _Gauge("http_requests_in_progress", "Requests being handled")
+request_queries = _Histogram(
+    "http_request_db_queries", "Database queries issued per request", ["method", "route"], QUERY_COUNT_BUCKETS)
+request_db_time = _Histogram(
+    "http_request_db_seconds", "Time spent executing database queries per request", ["method", "route"], DB_TIME_BUCKETS)
+pool_wait = _Histogram(
+    "http_request_db_pool_wait_seconds", "Time a request waited to check out pooled database connections", [],
+    POOL_WAIT_BUCKETS)
+ocr_queue_depth = _Gauge("ocr_queue_depth", "Receipt scans waiting for or running OCR")
+ocr_duration = _Histogram("ocr_duration_seconds", "Time to OCR one receipt image", [], OCR_BUCKETS)
+cache_requests = _Counter(
+    "response_cache_requests_total", "Cached reads by outcome (not_modified, hit or miss)", ["endpoint", "result"])
+coalesced_calls = _Counter(
+    "singleflight_calls_total", "Calls of coalesced computations by outcome (ran or coalesced)", ["name", "result"])
+
+_BUFFERS = (request_duration, requests_in_progress, request_queries, request_db_time, pool_wait,
+            ocr_queue_depth, ocr_duration, cache_requests, coalesced_calls)
+_flushed_flights = {}
+
+def record_request(method: str, route: str, status: int, seconds: float, stats: RequestStats):
+    request_duration.observe((method, route, str(status)), seconds)
+    request_queries.observe((method, route), stats.queries)
+    if stats.queries:
+        request_db_time.observe((method, route), stats.db_seconds)
+    if stats.pool_wait:
+        pool_wait.observe((), stats.pool_wait)
+
+def _collect_flights():
+    for name, counts in singleflight.stats().items():
+        calls, coalesced = _flushed_flights.get(name, (0, 0))
+        if counts["calls"] > calls:
+            coalesced_calls.inc((name, "ran"), (counts["calls"] - calls) - (counts["coalesced"] - coalesced))
+            coalesced_calls.inc((name, "coalesced"), counts["coalesced"] - coalesced)
+            _flushed_flights[name] = (counts["calls"], counts["coalesced"])
+
+def flush():
+    """Move buffered samples into prometheus_client. Call from the event loop thread."""
+    _collect_flights()
+    for buffer in _BUFFERS:
+        buffer.flush()
+
+def render() -> bytes:
+    """The exposition text for a scrape, merged over every worker in multiprocess mode."""
+    flush()
+    if MULTIPROCESS:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest(REGISTRY)
+
+class MetricsFlusher:
+    """Background task flushing the buffers every METRICS_FLUSH_SECONDS."""
+
+    def __init__(self):
+        self._task = None
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        flush()
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(METRICS_FLUSH_SECONDS)
+            try:
+                flush()
+            except Exception as e:
+                print(f"Error flushing metrics: {e}")
+
+metrics_flusher = MetricsFlusher()
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that adds the time spent waiting for a connection to the current request's stats."""
+
+    def _do_get(self):
+        stats = request_stats.get()
+        if stats is None:
+            return super()._do_get()
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            stats.pool_wait += time.perf_counter() - started
+
+def _timed(execute):
+    @wraps(execute)
+    def timed_execute(*args, **kwargs):
+        stats = request_stats.get()
+        if stats is None:
+            return execute(*args, **kwargs)
+        started = time.perf_counter()
+        try:
+            return execute(*args, **kwargs)
+        finally:
+            stats.queries += 1
+            stats.db_seconds += time.perf_counter() - started
+    return timed_execute
+
+def instrument_engine(engine):
+    """Count and time every statement an engine executes on behalf of a request.
+
+    This wraps the dialect's execute methods instead of listening for cursor events:
+    any engine event listener moves SQLAlchemy onto a slower path (~8 us per query).
+    """
+    dialect = engine.dialect
+    for name in ("do_execute", "do_execute_no_params", "do_executemany"):
+        setattr(dialect, name, _timed(getattr(dialect, name)))
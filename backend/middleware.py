@@ -0,0 +1,160 @@
+# This file contains the application's single pure-ASGI middleware layer.
+# One pass over the request headers handles CORS (the origin allow-list is a frozenset,
+# plus an optional regex, built once from configuration), request ids, response timing,
+# per-route metrics (see metrics.py) and content negotiation for FastJSONResponse. Being
+# pure ASGI it adds no per-request task or body buffering, so streaming responses such as
+# /events pass straight through.
+
+import os
+import re
+import time
+import uuid
+from contextvars import ContextVar
+
+import metrics
+from responses import negotiate, negotiated_format
+
+DEFAULT_CORS_ORIGINS = ",".join([
+    "https://pzqh821b-3000.usw2.devtunnels.ms",
+    "https://pzqh821b-8000.usw2.devtunnels.ms",
+    "http://localhost:3000",
+    "http://localhost:8000",
+    "http://127.0.0.1:3000",
+    "http://127.0.0.1:8000",
+    "http://10.0.0.31:3000",
+    "http://10.0.0.31:8000",
+    "http://76.121.92.139:8000",
+])
+
+# Comma separated origins allowed to make credentialed requests
+CORS_ORIGINS = frozenset(
+    origin.strip().rstrip("/") for origin in os.environ.get("CORS_ORIGINS", DEFAULT_CORS_ORIGINS).split(",")
+    if origin.strip()
+)
+# Optional pattern for origins that can't be listed (e.g. preview deployments)
+CORS_ORIGIN_REGEX = re.compile(os.environ["CORS_ORIGIN_REGEX"]) if os.environ.get("CORS_ORIGIN_REGEX") else None
+# Requests slower than this (to the first response byte) are logged; 0 disables
+SLOW_REQUEST_MS = float(os.environ.get("SLOW_REQUEST_MS", "1000"))
+
+CORS_ALLOW_METHODS = b"DELETE, GET, HEAD, OPTIONS, PATCH, POST, PUT"
+CORS_MAX_AGE = b"600"
+CORS_EXPOSE_HEADERS = b"X-Request-ID, Server-Timing, Idempotent-Replayed"
+REQUEST_ID_HEADER = b"x-request-id"
+MAX_REQUEST_ID_LENGTH = 128
+
+# The current request's id, for log lines
+request_id: ContextVar[str] = ContextVar("request_id", default="-")
+
+def is_allowed_origin(origin: str) -> bool:
+    return origin in CORS_ORIGINS or (CORS_ORIGIN_REGEX is not None and CORS_ORIGIN_REGEX.fullmatch(origin) is not None)
+
+def _valid_request_id(value: bytes) -> bool:
+    return 0 < len(value) <= MAX_REQUEST_ID_LENGTH and all(33 <= byte <= 126 for byte in value)
+
+class RequestMiddleware:
+    """CORS, request ids, Server-Timing, metrics and content negotiation in one pure ASGI layer."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        origin = accept = accept_encoding = ""
+        incoming_id = request_method = request_headers = None
+        for name, value in scope["headers"]:
+            if name == b"origin":
+                origin = value.decode("latin-1")
+            elif name == b"accept":
+                accept = value.decode("latin-1")
+            elif name == b"accept-encoding":
+                accept_encoding = value.decode("latin-1")
+            elif name == REQUEST_ID_HEADER:
+                incoming_id = value
+            elif name == b"access-control-request-method":
+                request_method = value
+            elif name == b"access-control-request-headers":
+                request_headers = value
+
+        rid = incoming_id.decode("latin-1") if incoming_id and _valid_request_id(incoming_id) else uuid.uuid4().hex
+        allowed = bool(origin) and is_allowed_origin(origin)
+
+        if scope["method"] == "OPTIONS" and origin and request_method is not None:
+            await self.preflight(send, origin, allowed, request_headers, rid, started)
+            return
+
+        extra_headers = [(b"x-request-id", rid.encode("latin-1"))]
+        if allowed:
+            extra_headers += [
+                (b"access-control-allow-origin", origin.encode("latin-1")),
+                (b"access-control-allow-credentials", b"true"),
+                (b"access-control-expose-headers", CORS_EXPOSE_HEADERS),
+            ]
+
+        response_status = 500
+
+        async def send_with_headers(message):
+            nonlocal response_status
+            if message["type"] == "http.response.start":
+                response_status = message["status"]
+                elapsed = (time.perf_counter() - started) * 1000
+                headers = list(message.get("headers", []))
+                if origin:
+                    _add_vary_origin(headers)
+                headers += extra_headers
+                headers.append((b"server-timing", f"app;dur={elapsed:.1f}".encode("latin-1")))
+                message["headers"] = headers
+                if SLOW_REQUEST_MS and elapsed > SLOW_REQUEST_MS:
+                    print(f"Slow request {rid}: {scope['method']} {scope['path']} took {elapsed:.0f} ms")
+            await send(message)
+
+        stats = metrics.RequestStats()
+        rid_token = request_id.set(rid)
+        format_token = negotiated_format.set(negotiate(accept, accept_encoding))
+        stats_token = metrics.request_stats.set(stats)
+        metrics.requests_in_progress.value += 1
+        try:
+            await self.app(scope, receive, send_with_headers)
+        finally:
+            metrics.requests_in_progress.value -= 1
+            route = scope.get("route")
+            metrics.record_request(scope["method"], route.path if route is not None else metrics.UNMATCHED_ROUTE,
+                                   response_status, time.perf_counter() - started, stats)
+            metrics.request_stats.reset(stats_token)
+            negotiated_format.reset(format_token)
+            request_id.reset(rid_token)
+
+    async def preflight(self, send, origin, allowed, request_headers, rid, started):
+        headers = [(b"vary", b"Origin"), (b"x-request-id", rid.encode("latin-1"))]
+        if allowed:
+            status, body = 200, b"OK"
+            headers += [
+                (b"access-control-allow-origin", origin.encode("latin-1")),
+                (b"access-control-allow-credentials", b"true"),
+                (b"access-control-allow-methods", CORS_ALLOW_METHODS),
+                (b"access-control-max-age", CORS_MAX_AGE),
+            ]
+            if request_headers:
+                # Any header may be sent; echo the requested ones since "*" doesn't cover credentials
+                headers.append((b"access-control-allow-headers", request_headers))
+        else:
+            status, body = 400, b"Disallowed CORS origin"
+        elapsed = (time.perf_counter() - started) * 1000
+        headers += [
+            (b"content-type", b"text/plain; charset=utf-8"),
+            (b"content-length", str(len(body)).encode("latin-1")),
+            (b"server-timing", f"app;dur={elapsed:.1f}".encode("latin-1")),
+        ]
+        await send({"type": "http.response.start", "status": status, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
+
+def _add_vary_origin(headers: list):
+    for i, (name, value) in enumerate(headers):
+        if name.lower() == b"vary":
+            if b"origin" not in value.lower():
+                headers[i] = (name, value + b", Origin")
+            return
+    headers.append((b"vary", b"Origin"))
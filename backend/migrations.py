@@ -0,0 +1,279 @@
+# This file contains the versioned schema migrations and the runner that applies them.
+# Each migration is a numbered function of a connection; the schema_version table
+# records which ones a database has had. run_migrations() applies the missing ones in
+# order, in one transaction, holding a database-wide lock (SQLite's write lock via
+# BEGIN IMMEDIATE, a transaction-level advisory lock on PostgreSQL) so workers starting
+# together never race on ALTER TABLE. It runs once per deploy: in the gunicorn master
+# before workers fork (gunicorn.conf.py) or as `python migrations.py`. The app's
+# lifespan calls it too, which costs a version check once the schema is current.
+# Append new migrations to MIGRATIONS; never edit one that has been released.
+
+import os
+import time
+from datetime import datetime, timezone
+
+from sqlalchemy import inspect, insert, select, text
+from sqlalchemy.orm import Session
+
+from settings.db_settings import Base, engine
+from db_env import SchemaVersion, IdempotencyKey, backfill_expense_categories, rebuild_category_spend
+from inventory_search import create_search_index
+import anomalies
+import sketches
+
+# Apply pending migrations when the app starts (false when deploys run them separately)
+MIGRATE_ON_STARTUP = os.environ.get("MIGRATE_ON_STARTUP", "true").lower() == "true"
+# Seconds to wait for another process's migrations before giving up (SQLite)
+MIGRATION_LOCK_TIMEOUT = int(os.environ.get("MIGRATION_LOCK_TIMEOUT", "600"))
+# Arbitrary app-wide key for pg_advisory_xact_lock
+ADVISORY_LOCK_KEY = 4207170301
+
+def baseline(conn):
+    """Create all tables, and bring databases from before versioned migrations up to date."""
+    Base.metadata.create_all(bind=conn)
+
+    # Check if columns exist before adding them
+    inspector = inspect(conn)
+
+    # Financial overview table migrations
+    financial_columns = {col['name'] for col in inspector.get_columns('financial_overview')}
+
+    if 'monthly_expenses_repeating' not in financial_columns:
+        conn.execute(text("""
+            ALTER TABLE financial_overview 
+            ADD COLUMN monthly_expenses_repeating FLOAT DEFAULT 0.0
+        """))
+
+    if 'monthly_expenses_non_repeating' not in financial_columns:
+        conn.execute(text("""
+            ALTER TABLE financial_overview 
+            ADD COLUMN monthly_expenses_non_repeating FLOAT DEFAULT 0.0
+        """))
+
+    # Accounts table migrations
+    account_columns = {col['name'] for col in inspector.get_columns('accounts')}
+
+    if 'data_version' not in account_columns:
+        conn.execute(text("""
+            ALTER TABLE accounts 
+            ADD COLUMN data_version INTEGER NOT NULL DEFAULT 0
+        """))
+
+    if 'timezone' not in account_columns:
+        conn.execute(text("""
+            ALTER TABLE accounts 
+            ADD COLUMN timezone VARCHAR
+        """))
+
+    # Indexes used by per-user range queries and batched aggregation
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_expenses_username_timestamp ON expenses (username, timestamp)"))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_daily_earnings_username_timestamp ON daily_earnings (username, timestamp)"))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_inventory_items_username_name ON inventory_items (username, name)"))
+
+    # Expenses table migrations
+    expense_columns = {col['name'] for col in inspector.get_columns('expenses')}
+
+    if 'category' not in expense_columns:
+        conn.execute(text("""
+            ALTER TABLE expenses 
+            ADD COLUMN category VARCHAR
+        """))
+        print(f"Categorized {backfill_expense_categories(conn)} existing expenses")
+        rebuild_category_spend(conn)
+
+    if 'receipt_id' not in expense_columns:
+        conn.execute(text("""
+            ALTER TABLE expenses 
+            ADD COLUMN receipt_id INTEGER REFERENCES receipts (id)
+        """))
+        # Link receipt expenses written before the column existed to their receipt
+        conn.execute(text("""
+            UPDATE expenses SET receipt_id = (
+                SELECT receipts.id FROM receipts
+                WHERE receipts.username = expenses.username
+                  AND receipts.date = expenses.timestamp
+                  AND receipts.total = expenses.price
+                ORDER BY receipts.id LIMIT 1
+            )
+            WHERE name LIKE 'Receipt: %'
+        """))
+
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_expenses_username_price ON expenses (username, price)"))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_expenses_username_category_timestamp ON expenses (username, category, timestamp)"))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_expenses_username_repeating_timestamp ON expenses (username, repeating, timestamp)"))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_expenses_username_name_lower ON expenses (username, lower(name))"))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_expenses_username_receipt_id ON expenses (username, receipt_id)"))
+
+    if 'recurrence' not in expense_columns:
+        conn.execute(text("""
+            ALTER TABLE expenses 
+            ADD COLUMN recurrence VARCHAR
+        """))
+
+    if 'recurrence_day' not in expense_columns:
+        conn.execute(text("""
+            ALTER TABLE expenses 
+            ADD COLUMN recurrence_day INTEGER
+        """))
+
+    if 'materialized_through' not in expense_columns:
+        conn.execute(text("""
+            ALTER TABLE expenses 
+            ADD COLUMN materialized_through DATE
+        """))
+
+    # Tasks table migrations
+    task_columns = {col['name'] for col in inspector.get_columns('tasks')}
+
+    if 'last_completed_on' not in task_columns:
+        conn.execute(text("""
+            ALTER TABLE tasks 
+            ADD COLUMN last_completed_on DATE
+        """))
+
+    # Inventory items table migrations
+    inventory_columns = {col['name'] for col in inspector.get_columns('inventory_items')}
+
+    if 'category' not in inventory_columns:
+        conn.execute(text("""
+            ALTER TABLE inventory_items 
+            ADD COLUMN category TEXT
+        """))
+
+    # Receipts table migrations
+    if 'receipts' in inspector.get_table_names():
+        receipts_columns = {col['name'] for col in inspector.get_columns('receipts')}
+
+        if 'category' not in receipts_columns:
+            conn.execute(text("""
+                ALTER TABLE receipts 
+                ADD COLUMN category TEXT DEFAULT 'Uncategorized'
+            """))
+
+        if 'timestamp' not in receipts_columns:
+            conn.execute(text("""
+                ALTER TABLE receipts 
+                ADD COLUMN timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+            """))
+
+        if 'vendor' not in receipts_columns:
+            conn.execute(text("""
+                ALTER TABLE receipts 
+                ADD COLUMN vendor TEXT
+            """))
+
+    if 'receipts' in inspector.get_table_names():
+        conn.execute(text("CREATE INDEX IF NOT EXISTS ix_receipts_username_vendor ON receipts (username, vendor)"))
+
+    # Force recreate receipts table if needed
+    if 'receipts' in inspector.get_table_names():
+        if 'category' not in {col['name'] for col in inspector.get_columns('receipts')}:
+            print("Receipts table is missing required columns. Trying to fix...")
+            # First backup existing data
+            receipts_backup = conn.execute(text("SELECT * FROM receipts")).fetchall()
+
+            # Drop and recreate table with proper schema
+            conn.execute(text("DROP TABLE IF EXISTS receipts_old"))
+            conn.execute(text("ALTER TABLE receipts RENAME TO receipts_old"))
+
+            # Create new table with proper schema
+            Base.metadata.tables['receipts'].create(bind=conn)
+
+            # Try to restore data that can be migrated
+            if receipts_backup:
+                print(f"Attempting to migrate {len(receipts_backup)} receipts to new schema")
+                # Will implement data restoration based on available columns
+
+    # Full-text search over inventory and receipt line items (SQLite only); the
+    # triggers keep it in sync, so existing rows are only indexed when it's created
+    create_search_index(conn, rebuild='inventory_fts' not in inspector.get_table_names())
+
+def idempotency_keys(conn):
+    """Stored responses for Idempotency-Key requests (see idempotency.py)."""
+    IdempotencyKey.__table__.create(bind=conn, checkfirst=True)
+
+def account_admin_flag(conn):
+    """Accounts.is_admin, which gates reading feedback; grant it with an UPDATE."""
+    if 'is_admin' not in {col['name'] for col in inspect(conn).get_columns('accounts')}:
+        conn.execute(text("""
+            ALTER TABLE accounts 
+            ADD COLUMN is_admin BOOLEAN NOT NULL DEFAULT false
+        """))
+
+def expense_rollups(conn):
+    """Fill the incrementally maintained expense rollups from existing expenses.
+
+    Expense writes keep category_spend, category_stats and the daily sketches current,
+    but databases that had expenses before those tables existed start with them empty.
+    """
+    print(f"Rebuilt {rebuild_category_spend(conn)} category spend rollups")
+    session = Session(bind=conn)
+    try:
+        print(f"Rebuilt category statistics from {anomalies.rebuild_stats(session)} expenses")
+        print(f"Rebuilt expense sketches from {sketches.rebuild_sketches(session)} expenses")
+        session.flush()
+    finally:
+        session.close()
+
+MIGRATIONS = [
+    (1, "baseline schema", baseline),
+    (2, "idempotency keys", idempotency_keys),
+    (3, "account admin flag", account_admin_flag),
+    (4, "expense rollups", expense_rollups),
+]
+
+def applied_versions(conn) -> set:
+    if not inspect(conn).has_table(SchemaVersion.__tablename__):
+        return set()
+    return set(conn.scalars(select(SchemaVersion.version)))
+
+def schema_version(bind=engine) -> int:
+    """The highest migration applied to the database (0 for a new one)."""
+    with bind.connect() as conn:
+        return max(applied_versions(conn), default=0)
+
+def _lock(conn):
+    """Take the migration lock; held until conn's transaction ends."""
+    if conn.dialect.name == "sqlite":
+        # Wait out a long migration (a backfill, say) instead of the usual 5 s busy timeout
+        conn.exec_driver_sql(f"PRAGMA busy_timeout = {MIGRATION_LOCK_TIMEOUT * 1000}")
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+    elif conn.dialect.name == "postgresql":
+        conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": ADVISORY_LOCK_KEY})
+
+def _unlock(conn):
+    if conn.dialect.name == "sqlite":
+        conn.exec_driver_sql("PRAGMA busy_timeout = 5000")  # pysqlite's default, for the pooled connection
+
+def run_migrations(bind=engine) -> list:
+    """Apply pending migrations in order. Returns the (version, name) pairs applied."""
+    with bind.connect() as conn:
+        if applied_versions(conn) >= {version for version, _, _ in MIGRATIONS}:
+            return []
+        conn.rollback()
+        ran = []
+        try:
+            _lock(conn)
+            # Another process may have applied them while we waited for the lock
+            applied = applied_versions(conn)
+            SchemaVersion.__table__.create(bind=conn, checkfirst=True)
+            for version, name, migrate in MIGRATIONS:
+                if version in applied:
+                    continue
+                started = time.perf_counter()
+                try:
+                    migrate(conn)
+                except Exception as e:
+                    print(f"Error applying migration {version} ({name}): {str(e)}")
+                    raise
+                conn.execute(insert(SchemaVersion).values(version=version, name=name, applied_at=datetime.now(timezone.utc)))
+                print(f"Applied migration {version} ({name}) in {time.perf_counter() - started:.2f} s")
+                ran.append((version, name))
+            conn.commit()
+        finally:
+            _unlock(conn)
+    return ran
+
+if __name__ == "__main__":
+    applied = run_migrations()
+    print(f"Database schema is at version {schema_version()} ({len(applied)} migration(s) applied)")
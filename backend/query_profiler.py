@@ -0,0 +1,157 @@
+# This file contains the SQL query profiler and N+1 detector for development and staging.
+# With QUERY_PROFILER=warn (or raise, for tests) every statement the engine runs is
+# attributed to the current request's route along with its time and "shape" (the SQL
+# with whitespace and IN-list placeholders collapsed). A request that runs more than
+# QUERY_BUDGET statements, or the same shape more than QUERY_REPEAT_LIMIT times (the
+# signature of a query issued per row or per day in a loop), is logged with its most
+# repeated shapes; in raise mode the offending statement fails with QueryBudgetExceeded
+# instead of running. The profiler is off by default: engine event listeners put
+# SQLAlchemy on a slower execution path, so they are only installed when it is enabled.
+
+import os
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import event
+
+from middleware import request_id
+
+# off, warn (log offending requests) or raise (fail the offending statement)
+QUERY_PROFILER = os.environ.get("QUERY_PROFILER", "off").lower()
+QUERY_BUDGET = int(os.environ.get("QUERY_BUDGET", "25"))
+QUERY_REPEAT_LIMIT = int(os.environ.get("QUERY_REPEAT_LIMIT", "5"))
+ENABLED = QUERY_PROFILER in ("warn", "raise")
+
+# "(?, ?, ?)" or "(%(x_1)s, %(x_2)s)" from an expanding IN parameter, whatever its length
+_PLACEHOLDER_LIST = re.compile(r"\(\s*(?:\?|%\(\w+\)s|:\w+)(?:\s*,\s*(?:\?|%\(\w+\)s|:\w+))+\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+class QueryBudgetExceeded(RuntimeError):
+    """Raised in QUERY_PROFILER=raise mode when a request goes over its query budget."""
+
+def statement_shape(statement: str) -> str:
+    return _WHITESPACE.sub(" ", _PLACEHOLDER_LIST.sub("(?)", statement)).strip()
+
+class QueryProfile:
+    """The statements one request (or profiled block) ran, by shape."""
+
+    def __init__(self, label: str, budget: int = QUERY_BUDGET, repeat_limit: int = QUERY_REPEAT_LIMIT):
+        self.label = label
+        self.budget = budget
+        self.repeat_limit = repeat_limit
+        self.count = 0
+        self.seconds = 0.0
+        self.shapes = Counter()
+        self.shape_seconds = Counter()
+
+    def record(self, shape: str, seconds: float, statements: int = 1):
+        self.count += statements
+        self.seconds += seconds
+        self.shapes[shape] += statements
+        self.shape_seconds[shape] += seconds
+
+    def repeated(self) -> list:
+        """(count, shape) for shapes run more than repeat_limit times, most repeated first."""
+        return [(count, shape) for shape, count in self.shapes.most_common() if count > self.repeat_limit]
+
+    def problems(self) -> list:
+        found = []
+        if self.count > self.budget:
+            found.append(f"{self.count} queries (budget {self.budget})")
+        found += [f"{count}x {shape[:200]}" for count, shape in self.repeated()]
+        return found
+
+    def summary(self) -> str:
+        return f"{self.label}: {self.count} queries in {self.seconds * 1000:.1f} ms"
+
+    def report(self):
+        problems = self.problems()
+        if problems:
+            print(f"Query profiler: {self.summary()}")
+            for problem in problems:
+                print(f"    {problem}")
+
+current_profile: ContextVar[Optional[QueryProfile]] = ContextVar("current_profile", default=None)
+
+@contextmanager
+def profile(label: str, budget: int = QUERY_BUDGET, repeat_limit: int = QUERY_REPEAT_LIMIT):
+    """Profile the queries run inside the block (in this context and threadpool calls made from it)."""
+    query_profile = QueryProfile(label, budget, repeat_limit)
+    token = current_profile.set(query_profile)
+    try:
+        yield query_profile
+    finally:
+        current_profile.reset(token)
+
+def install(engine):
+    """Attribute the engine's statements to the current profile; a no-op unless QUERY_PROFILER is on."""
+    if not ENABLED:
+        return
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        query_profile = current_profile.get()
+        if query_profile is None:
+            return
+        pending = conn.info.setdefault("query_profiler", [])
+        if context is not None and conn.info.get("query_profiler_context") is context:
+            # A further batch of one "insertmanyvalues" INSERT (a flush of many new rows
+            # runs one per row on SQLite); time it, but count the statement once
+            pending.append((statement_shape(statement), time.perf_counter(), 0))
+            return
+        conn.info["query_profiler_context"] = context
+        shape = statement_shape(statement)
+        if QUERY_PROFILER == "raise" and (query_profile.count >= query_profile.budget
+                                          or query_profile.shapes[shape] >= query_profile.repeat_limit):
+            query_profile.record(shape, 0.0)
+            raise QueryBudgetExceeded(f"{query_profile.summary()}; " + "; ".join(query_profile.problems()))
+        pending.append((shape, time.perf_counter(), 1))
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        query_profile = current_profile.get()
+        pending = conn.info.get("query_profiler")
+        if query_profile is None or not pending:
+            return
+        shape, started, statements = pending.pop()
+        query_profile.record(shape, time.perf_counter() - started, statements)
+
+    @event.listens_for(engine, "handle_error")
+    def _handle_error(exception_context):
+        connection = exception_context.connection
+        if connection is not None and connection.info.get("query_profiler"):
+            connection.info["query_profiler"].pop()
+
+class QueryProfilerMiddleware:
+    """Profiles each HTTP request's queries and reports the ones over budget, labeled by route.
+
+    Responses carry X-Query-Count and X-Query-Time-MS (queries run before the response started).
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        with profile(f"{scope['method']} {scope['path']}") as query_profile:
+            async def send_with_counts(message):
+                if message["type"] == "http.response.start":
+                    message["headers"] = list(message.get("headers", [])) + [
+                        (b"x-query-count", str(query_profile.count).encode("latin-1")),
+                        (b"x-query-time-ms", f"{query_profile.seconds * 1000:.1f}".encode("latin-1")),
+                    ]
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_with_counts)
+            finally:
+                route = scope.get("route")
+                path = route.path if route is not None else scope["path"]
+                query_profile.label = f"{scope['method']} {path} (request {request_id.get()})"
+                query_profile.report()
@@ -0,0 +1,217 @@
+# This file contains the lightweight read path used by list and aggregate endpoints.
+# Queries select only the columns a response needs with Core select() and map rows
+# straight into slotted dataclasses, skipping the ORM identity map and Pydantic
+# from_attributes validation. FastJSONResponse serializes the dataclasses natively.
+
+from dataclasses import dataclass
+from datetime import datetime, date
+from typing import List, Optional, Sequence
+
+from sqlalchemy import select, func, case
+from sqlalchemy.orm import Session
+
+from db_env import Expense, ExpenseOccurrence, DailyEarning, InventoryItem, Task, Feedback, Receipt
+
+@dataclass(slots=True)
+class ExpenseRow:
+    id: int
+    username: str
+    name: str
+    price: float
+    category: Optional[str]
+    repeating: bool
+    recurrence: Optional[str]
+    recurrence_day: Optional[int]
+    receipt_id: Optional[int]
+    timestamp: datetime
+
+@dataclass(slots=True)
+class InventoryRow:
+    id: int
+    username: str
+    name: str
+    category: Optional[str]
+    quantity: float
+    price: float
+    timestamp: datetime
+
+@dataclass(slots=True)
+class TaskRow:
+    id: int
+    username: str
+    title: str
+    is_complete: bool
+    repeat_daily: bool
+    timestamp: datetime
+
+@dataclass(slots=True)
+class FeedbackRow:
+    id: int
+    username: str
+    message: str
+    type: str
+    rating: int
+    timestamp: datetime
+
+EXPENSE_COLUMNS = (Expense.id, Expense.username, Expense.name, Expense.price, Expense.category, Expense.repeating,
+                   Expense.recurrence, Expense.recurrence_day, Expense.receipt_id, Expense.timestamp)
+INVENTORY_COLUMNS = (InventoryItem.id, InventoryItem.username, InventoryItem.name, InventoryItem.category,
+                     InventoryItem.quantity, InventoryItem.price, InventoryItem.timestamp)
+TASK_COLUMNS = (Task.id, Task.username, Task.title, Task.is_complete, Task.repeat_daily, Task.timestamp)
+FEEDBACK_COLUMNS = (Feedback.id, Feedback.username, Feedback.message, Feedback.type, Feedback.rating,
+                    Feedback.timestamp)
+
+def fetch_rows(db: Session, stmt, row_type) -> list:
+    """Execute a Core select on the session's connection and build one row_type per row."""
+    result = db.connection().execute(stmt)
+    return [row_type(*row) for row in result]
+
+# Sort keys for GET /expenses; each is the second column of an index leading with username
+EXPENSE_SORT_KEYS = {
+    "timestamp": Expense.timestamp,
+    "price": Expense.price,
+    "name": func.lower(Expense.name),
+}
+
+@dataclass(frozen=True, slots=True)
+class ExpenseQuery:
+    """Filters and sort order for listing expenses. Unset filters don't constrain."""
+    start: Optional[datetime] = None  # Naive UTC, inclusive
+    end: Optional[datetime] = None  # Naive UTC, exclusive
+    min_price: Optional[float] = None
+    max_price: Optional[float] = None
+    category: Optional[str] = None
+    repeating: Optional[bool] = None
+    name_prefix: Optional[str] = None  # Case-insensitive
+    vendor: Optional[str] = None  # Vendor of the receipt the expense was created from
+    sort: str = "timestamp"  # A key of EXPENSE_SORT_KEYS, prefixed with "-" for descending
+
+def expense_conditions(username: str, query: ExpenseQuery) -> list:
+    """WHERE clauses for a query, written as ranges the expense indexes can seek on."""
+    conditions = [Expense.username == username]
+    if query.start is not None:
+        conditions.append(Expense.timestamp >= query.start)
+    if query.end is not None:
+        conditions.append(Expense.timestamp < query.end)
+    if query.min_price is not None:
+        conditions.append(Expense.price >= query.min_price)
+    if query.max_price is not None:
+        conditions.append(Expense.price <= query.max_price)
+    if query.category is not None:
+        conditions.append(Expense.category == query.category)
+    if query.repeating is not None:
+        conditions.append(Expense.repeating == query.repeating)
+    if query.name_prefix and query.name_prefix.isascii():
+        # A range on lower(name) instead of LIKE, so the expression index applies. Only for
+        # ASCII prefixes: SQLite's lower() folds ASCII only, unlike str.lower()
+        prefix = query.name_prefix.lower()
+        conditions.append(func.lower(Expense.name) >= prefix)
+        conditions.append(func.lower(Expense.name) < prefix[:-1] + chr(ord(prefix[-1]) + 1))
+    elif query.name_prefix:
+        # Left to the database's own case folding
+        pattern = query.name_prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        conditions.append(Expense.name.ilike(pattern + "%", escape="\\"))
+    if query.vendor is not None:
+        conditions += [Receipt.username == username, Receipt.vendor == query.vendor]
+    return conditions
+
+def expense_order(sort: str) -> list:
+    """ORDER BY for a sort key, breaking ties by id so pages are stable (ids are the rowids
+    every SQLite index ends with, so the tie-break doesn't defeat the index order)."""
+    keys = [EXPENSE_SORT_KEYS[sort.lstrip("-")], Expense.id]
+    return [key.desc() for key in keys] if sort.startswith("-") else keys
+
+def expense_statement(username: str, skip: int = 0, limit: int = 100, query: Optional[ExpenseQuery] = None):
+    query = query or ExpenseQuery()
+    stmt = select(*EXPENSE_COLUMNS)
+    if query.vendor is not None:
+        # A join rather than IN (subquery), so the planner can start from the vendor's receipts
+        stmt = stmt.join(Receipt, Receipt.id == Expense.receipt_id)
+    return (
+        stmt
+        .where(*expense_conditions(username, query))
+        .order_by(*expense_order(query.sort))
+        .offset(skip)
+        .limit(limit)
+    )
+
+def list_expenses(db: Session, username: str, skip: int = 0, limit: int = 100,
+                  query: Optional[ExpenseQuery] = None) -> List[ExpenseRow]:
+    return fetch_rows(db, expense_statement(username, skip, limit, query), ExpenseRow)
+
+def list_inventory(db: Session, username: str) -> List[InventoryRow]:
+    stmt = select(*INVENTORY_COLUMNS).where(InventoryItem.username == username)
+    return fetch_rows(db, stmt, InventoryRow)
+
+def list_tasks(db: Session, username: str, today: Optional[date] = None) -> List[TaskRow]:
+    """List a user's tasks. With today set, repeating tasks count as complete only if completed today."""
+    columns = TASK_COLUMNS
+    if today is not None:
+        is_complete = case(
+            (Task.repeat_daily == True, func.coalesce(Task.last_completed_on == today, False)),
+            else_=Task.is_complete
+        )
+        columns = (Task.id, Task.username, Task.title, is_complete, Task.repeat_daily, Task.timestamp)
+    stmt = select(*columns).where(Task.username == username)
+    return fetch_rows(db, stmt, TaskRow)
+
+def list_feedback(db: Session) -> List[FeedbackRow]:
+    stmt = select(*FEEDBACK_COLUMNS).order_by(Feedback.timestamp.desc())
+    return fetch_rows(db, stmt, FeedbackRow)
+
+def sum_expenses(db: Session, username: str, start: datetime, end: datetime) -> float:
+    """Total expense price for a user with start <= timestamp < end (naive UTC bounds)."""
+    stmt = select(func.coalesce(func.sum(Expense.price), 0.0)).where(
+        Expense.username == username,
+        Expense.timestamp >= start,
+        Expense.timestamp < end
+    )
+    return db.connection().execute(stmt).scalar()
+
+def _bucket_totals(db: Session, amount, timestamp, edges: Sequence[datetime], *filters) -> List[float]:
+    bucket = case(
+        *((timestamp < edge, i) for i, edge in enumerate(edges[1:]))
+    )
+    stmt = select(bucket, func.sum(amount)).where(
+        *filters,
+        timestamp >= edges[0],
+        timestamp < edges[-1]
+    ).group_by(bucket)
+    totals = [0.0] * (len(edges) - 1)
+    for index, total in db.connection().execute(stmt):
+        totals[index] = total or 0.0
+    return totals
+
+def daily_expense_totals(db: Session, username: str, edges: Sequence[datetime], repeating: Optional[bool] = None) -> List[float]:
+    """Expense totals per local day, where day i spans edges[i] <= timestamp < edges[i + 1].
+
+    Rows are bucketed with a CASE over the precomputed UTC edges, so the filter stays a
+    plain range on (username, timestamp) and no per-row timezone conversion is needed.
+    """
+    filters = [Expense.username == username]
+    if repeating is not None:
+        filters.append(Expense.repeating == repeating)
+    return _bucket_totals(db, Expense.price, Expense.timestamp, edges, *filters)
+
+def daily_earning_totals(db: Session, username: str, edges: Sequence[datetime]) -> List[float]:
+    """Tips plus hourly earnings per local day, bucketed like daily_expense_totals."""
+    amount = (func.coalesce(DailyEarning.cash_tips, 0.0)
+              + func.coalesce(DailyEarning.hourly_rate, 0.0) * func.coalesce(DailyEarning.hours, 0.0))
+    return _bucket_totals(db, amount, DailyEarning.timestamp, edges, DailyEarning.username == username)
+
+def latest_salary(db: Session, username: str) -> float:
+    """The most recently recorded yearly salary, or 0."""
+    stmt = select(DailyEarning.salary).where(
+        DailyEarning.username == username,
+        DailyEarning.salary > 0
+    ).order_by(DailyEarning.timestamp.desc()).limit(1)
+    return db.connection().execute(stmt).scalar() or 0.0
+
+def occurrence_totals(db: Session, username: str, start: date, end: date) -> dict:
+    """Recurring expense totals per local day (date -> total) for start <= day <= end."""
+    stmt = select(ExpenseOccurrence.occurs_on, func.sum(ExpenseOccurrence.amount)).where(
+        ExpenseOccurrence.username == username,
+        ExpenseOccurrence.occurs_on >= start,
+        ExpenseOccurrence.occurs_on <= end
+    ).group_by(ExpenseOccurrence.occurs_on)
+    return dict(db.connection().execute(stmt).all())
@@ -0,0 +1,123 @@
+# This file contains the recurring expense engine.
+# A repeating Expense carries a rule (weekly, monthly or yearly on a given day) and its
+# occurrences are materialized into expense_occurrences for a rolling horizon, so the
+# recurring spend on any range of days is an indexed lookup on (username, occurs_on).
+# Expenses that were only flagged repeating before rules existed recur monthly on the
+# day they were created. The nightly job in scheduler_tasks extends the horizon.
+
+import os
+from calendar import monthrange
+from datetime import date, timedelta
+from typing import Iterator, Optional, Tuple
+
+from sqlalchemy import case, delete, insert
+from sqlalchemy.orm import Session
+
+from db_env import Expense, ExpenseOccurrence
+import timeframes
+
+RECURRENCES = ("weekly", "monthly", "yearly")
+
+# Days ahead occurrences are generated for (a year, so forecasts can look that far)
+RECURRENCE_HORIZON_DAYS = int(os.environ.get("RECURRENCE_HORIZON_DAYS", "366"))
+# Days of history generated for a new rule, enough for the rolling 30-day figures
+RECURRENCE_LOOKBACK_DAYS = 31
+
+def normalize_rule(recurrence: Optional[str], recurrence_day: Optional[int], anchor: date) -> Tuple[Optional[str], Optional[int]]:
+    """Validate a rule, defaulting the day from the anchor date. Raises ValueError if invalid."""
+    if recurrence is None:
+        return None, None
+    recurrence = recurrence.lower()
+    if recurrence not in RECURRENCES:
+        raise ValueError(f"recurrence must be one of: {', '.join(RECURRENCES)}")
+    if recurrence == "weekly":
+        day = anchor.weekday() if recurrence_day is None else recurrence_day
+        if not 0 <= day <= 6:
+            raise ValueError("recurrence_day must be 0 (Monday) to 6 (Sunday) for weekly expenses")
+    else:
+        day = anchor.day if recurrence_day is None else recurrence_day
+        if not 1 <= day <= 31:
+            raise ValueError("recurrence_day must be a day of the month (1-31)")
+    return recurrence, day
+
+def anchor_date(expense: Expense, tz_name: Optional[str] = None) -> date:
+    """The local day an expense was created on; rules never fire before it."""
+    return timeframes.local_today(tz_name, expense.timestamp)
+
+def effective_rule(expense: Expense, anchor: date) -> Optional[Tuple[str, int]]:
+    if expense.recurrence:
+        return normalize_rule(expense.recurrence, expense.recurrence_day, anchor)
+    if expense.repeating:
+        return "monthly", anchor.day
+    return None
+
+def _clamped(year: int, month: int, day: int) -> date:
+    # Day 31 falls on the last day of shorter months
+    return date(year, month, min(day, monthrange(year, month)[1]))
+
+def occurrence_dates(recurrence: str, day: int, anchor: date, start: date, end: date) -> Iterator[date]:
+    """Days in [start, end] on which a rule fires, never before its anchor."""
+    start = max(start, anchor)
+    if start > end:
+        return
+    if recurrence == "weekly":
+        current = start + timedelta(days=(day - start.weekday()) % 7)
+        while current <= end:
+            yield current
+            current += timedelta(days=7)
+    elif recurrence == "monthly":
+        year, month = start.year, start.month
+        while True:
+            current = _clamped(year, month, day)
+            if current > end:
+                break
+            if current >= start:
+                yield current
+            year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    else:
+        for year in range(start.year, end.year + 1):
+            current = _clamped(year, anchor.month, day)
+            if start <= current <= end:
+                yield current
+
+def monthly_amount():
+    """SQL expression normalizing a repeating expense's price to a monthly amount."""
+    return case(
+        (Expense.recurrence == "weekly", Expense.price * 52 / 12),
+        (Expense.recurrence == "yearly", Expense.price / 12),
+        else_=Expense.price
+    )
+
+def materialize(session: Session, expense: Expense, tz_name: Optional[str] = None, through: Optional[date] = None) -> int:
+    """Generate an expense's missing occurrences up to `through` (the horizon by default)."""
+    anchor = anchor_date(expense, tz_name)
+    rule = effective_rule(expense, anchor)
+    if rule is None:
+        return 0
+    today = timeframes.local_today(tz_name)
+    through = through or today + timedelta(days=RECURRENCE_HORIZON_DAYS)
+    if expense.materialized_through is not None:
+        start = expense.materialized_through + timedelta(days=1)
+    else:
+        start = today - timedelta(days=RECURRENCE_LOOKBACK_DAYS)
+
+    rows = [
+        {"expense_id": expense.id, "username": expense.username, "occurs_on": day, "amount": expense.price}
+        for day in occurrence_dates(*rule, anchor, start, through)
+    ]
+    if rows:
+        session.execute(insert(ExpenseOccurrence), rows)
+    if expense.materialized_through is None or through > expense.materialized_through:
+        expense.materialized_through = through
+    return len(rows)
+
+def clear_occurrences(session: Session, expense_id: int):
+    session.execute(delete(ExpenseOccurrence).where(ExpenseOccurrence.expense_id == expense_id))
+
+def sync_expense(session: Session, expense: Expense, tz_name: Optional[str] = None) -> int:
+    """Regenerate an expense's occurrences after it was created or its rule or price changed."""
+    if expense.id is None:
+        session.flush()
+    clear_occurrences(session, expense.id)
+    expense.materialized_through = None
+    return materialize(session, expense, tz_name)
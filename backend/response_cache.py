@@ -0,0 +1,121 @@
+# This file contains the per-user versioned response cache for polled read endpoints.
+# Every write bumps Account.data_version (see db_env.bump_data_versions), so a user's
+# version number identifies the state of their data. It drives strong ETags for
+# If-None-Match -> 304 responses and keys a bounded in-process payload cache.
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+from fastapi import Request
+from starlette.responses import Response
+
+from db_env import Account
+from responses import FastJSONResponse, negotiated_format
+from singleflight import get_flight
+import metrics
+
+# Bump when the shape of a cached payload changes so clients don't keep a stale 304
+ETAG_SCHEMA = 5
+
+CACHE_CONTROL = "private, no-cache"
+
+class VersionedCache:
+    """Bounded LRU of computed payloads keyed by (user, endpoint, params) and tagged with a version.
+
+    Only the latest version of each entry is kept, so a write replaces the old payload
+    instead of leaving it behind until eviction.
+    """
+
+    def __init__(self, max_entries: int = 512):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, version: int) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != version:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: Hashable, version: int, payload: Any) -> None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > version:
+                return  # A newer payload landed while this one was being built
+            self._entries[key] = (version, payload)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0
+            }
+
+response_cache = VersionedCache(int(os.environ.get("RESPONSE_CACHE_SIZE", "512")))
+
+def make_etag(username: str, endpoint: str, params: Hashable, version: int) -> str:
+    """Strong ETag for a user's endpoint at a data version, per negotiated wire format."""
+    wire_format, encoding = negotiated_format.get()
+    raw = repr((ETAG_SCHEMA, username, endpoint, params, version, wire_format, encoding))
+    return '"' + hashlib.blake2b(raw.encode("utf-8"), digest_size=12).hexdigest() + '"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+async def cached_response(
+    request: Request,
+    user: Account,
+    endpoint: str,
+    params: Hashable,
+    build: Callable[[], Any]
+) -> Response:
+    """Answer a read with 304, a cached payload, or a freshly built one, in that order.
+
+    build runs in the threadpool, and concurrent misses for the same key share one build.
+    """
+    version = user.data_version or 0
+    etag = make_etag(user.username, endpoint, params, version)
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        headers["Vary"] = "Accept, Accept-Encoding"
+        metrics.cache_requests.inc((endpoint, "not_modified"))
+        return Response(status_code=304, headers=headers)
+
+    key = (user.username, endpoint, params)
+    payload = response_cache.get(key, version)
+    metrics.cache_requests.inc((endpoint, "hit" if payload is not None else "miss"))
+    if payload is None:
+        payload = await get_flight(endpoint).do_async((key, version), build)
+        response_cache.put(key, version, payload)
+    return FastJSONResponse(payload, headers=headers)
@@ -0,0 +1,150 @@
+# This file defines the fast response class used by every API route.
+# It serializes with orjson, negotiates MessagePack through the Accept header,
+# and compresses large bodies with brotli or gzip when the client allows it.
+
+import gzip
+from contextvars import ContextVar
+from dataclasses import fields, is_dataclass
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Optional
+
+import orjson
+from pydantic import BaseModel
+from sqlalchemy import inspect as sa_inspect
+from sqlalchemy.engine import Row
+from starlette.responses import Response
+
+try:
+    import msgpack
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    MSGPACK_AVAILABLE = False
+
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    BROTLI_AVAILABLE = False
+
+JSON_MEDIA_TYPE = "application/json"
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+MSGPACK_ACCEPT_TYPES = ("application/msgpack", "application/x-msgpack", "application/vnd.msgpack")
+
+# Bodies smaller than this are sent uncompressed; the framing overhead isn't worth it
+COMPRESSION_THRESHOLD = 1024
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 4
+
+# (wire format, content encoding) negotiated for the current request
+negotiated_format: ContextVar[tuple] = ContextVar("negotiated_format", default=("json", None))
+
+# Column names per mapped class, so ORM rows are dumped without re-inspecting the mapper
+_column_keys = {}
+
+def _orm_columns(obj) -> Optional[tuple]:
+    cls = type(obj)
+    keys = _column_keys.get(cls)
+    if keys is None:
+        try:
+            mapper = sa_inspect(cls)
+        except Exception:
+            return None
+        keys = tuple(attr.key for attr in mapper.column_attrs)
+        _column_keys[cls] = keys
+    return keys
+
+def to_builtin(obj: Any) -> Any:
+    """Convert models, ORM instances and rows into types orjson/msgpack understand."""
+    if isinstance(obj, BaseModel):
+        return obj.model_dump()
+    if isinstance(obj, Row):
+        return obj._asdict()
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if hasattr(obj, "_sa_instance_state"):
+        keys = _orm_columns(obj)
+        if keys is not None:
+            return {key: getattr(obj, key) for key in keys}
+    raise TypeError(f"Type is not serializable: {type(obj).__name__}")
+
+def _msgpack_default(obj: Any) -> Any:
+    # msgpack has no native datetime/dataclass support, so send them as the JSON path would
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    if is_dataclass(obj) and not isinstance(obj, type):
+        return {f.name: getattr(obj, f.name) for f in fields(obj)}
+    return to_builtin(obj)
+
+def dumps_json(content: Any) -> bytes:
+    return orjson.dumps(content, default=to_builtin, option=orjson.OPT_NON_STR_KEYS)
+
+def dumps_msgpack(content: Any) -> bytes:
+    return msgpack.packb(content, default=_msgpack_default, use_bin_type=True)
+
+def compress(body: bytes, encoding: Optional[str]) -> tuple:
+    """Compress a body with the negotiated encoding. Returns (body, encoding used)."""
+    if encoding is None or len(body) < COMPRESSION_THRESHOLD:
+        return body, None
+    if encoding == "br" and BROTLI_AVAILABLE:
+        return brotli.compress(body, quality=BROTLI_QUALITY), "br"
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=GZIP_LEVEL), "gzip"
+    return body, None
+
+def accepts_encoding(header: str, token: str) -> bool:
+    """Whether an Accept-Encoding header allows a coding (q=0 refuses it)."""
+    for part in header.split(","):
+        name, _, params = part.partition(";")
+        if name.strip().lower() != token:
+            continue
+        params = params.replace(" ", "")
+        if params.startswith("q="):
+            try:
+                return float(params[2:]) > 0
+            except ValueError:
+                return False
+        return True
+    return False
+
+def negotiate(accept: str, accept_encoding: str) -> tuple:
+    """Pick the wire format and content encoding for a request's Accept headers."""
+    wire_format = "json"
+    if MSGPACK_AVAILABLE and accept:
+        accept = accept.lower()
+        if any(media in accept for media in MSGPACK_ACCEPT_TYPES):
+            wire_format = "msgpack"
+
+    encoding = None
+    if accept_encoding:
+        if BROTLI_AVAILABLE and accepts_encoding(accept_encoding, "br"):
+            encoding = "br"
+        elif accepts_encoding(accept_encoding, "gzip"):
+            encoding = "gzip"
+    return wire_format, encoding
+
+class FastJSONResponse(Response):
+    """JSON response rendered with orjson, or MessagePack when the client asked for it.
+
+    Routes can return this directly with ORM instances, rows or Pydantic models to skip
+    FastAPI's jsonable_encoder pass entirely.
+    """
+    media_type = JSON_MEDIA_TYPE
+
+    def __init__(self, content: Any = None, status_code: int = 200, headers=None, media_type=None, background=None):
+        self.wire_format, self.accept_encoding = negotiated_format.get()
+        self.content_encoding = None
+        if media_type is None and self.wire_format == "msgpack":
+            media_type = MSGPACK_MEDIA_TYPE
+        super().__init__(content, status_code, headers, media_type, background)
+        self.headers["vary"] = "Accept, Accept-Encoding"
+        if self.content_encoding:
+            self.headers["content-encoding"] = self.content_encoding
+
+    def render(self, content: Any) -> bytes:
+        if self.wire_format == "msgpack":
+            body = dumps_msgpack(content)
+        else:
+            body = dumps_json(content)
+        body, self.content_encoding = compress(body, self.accept_encoding)
+        return body
@@ -11,6 +11,12 @@ from .tasks_routes import router as tasks_router
 from .earnings_routes import router as earnings_router
 from .expenses_routes import router as expenses_router
 from .feedback_routes import router as feedback_router
+from .events_routes import router as events_router
+from .forecast_routes import router as forecast_router
+from .notifications_routes import router as notifications_router
+from .stats_routes import router as stats_router
+from .budgets_routes import router as budgets_router
+from .metrics_routes import router as metrics_router
 
 router = APIRouter()
 router.include_router(auth_router, tags=["Authentication"])
@@ -20,4 +26,10 @@ router.include_router(inventory_router, tags=["Inventory"])
 router.include_router(tasks_router, tags=["Tasks"])
 router.include_router(earnings_router, tags=["Earnings"])
 router.include_router(expenses_router, tags=["Expenses"])
-router.include_router(feedback_router, tags=["Feedback"])
\ No newline at end of file
+router.include_router(feedback_router, tags=["Feedback"])
+router.include_router(events_router, tags=["Events"])
+router.include_router(forecast_router, tags=["Forecast"])
+router.include_router(notifications_router, tags=["Notifications"])
+router.include_router(stats_router, tags=["Statistics"])
+router.include_router(budgets_router, tags=["Budgets"])
+router.include_router(metrics_router, tags=["Metrics"])
\ No newline at end of file
@@ -7,8 +7,11 @@ from typing import Optional
 from logging import getLogger
 
 # Local imports
-from db_env import Account
+from db_env import Account, Expense, rebuild_category_spend
 from settings.db_settings import get_db
+import recurring
+import sketches
+import timeframes
 from auth import get_current_user, ACCESS_TOKEN_EXPIRE_MINUTES, create_access_token, pwd_context, authenticate_user, SECRET_KEY, ALGORITHM
 # Use PyJWT instead of jwt
 import jwt
@@ -21,6 +24,10 @@ class UserCreate(BaseModel):
     username: str
     password: str
     email: EmailStr
+    timezone: Optional[str] = None
+
+class TimezoneUpdate(BaseModel):
+    timezone: str
 
 class Token(BaseModel):
     access_token: str
@@ -39,11 +46,17 @@ async def register(user: UserCreate, db: Session = Depends(get_db)):
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Email already exists"
         )
+    if user.timezone and not timeframes.is_valid_timezone(user.timezone):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Unknown timezone"
+        )
     hashed_password = pwd_context.hash(user.password)
     new_user = Account(
         username=user.username,
         password=hashed_password,
-        email=user.email
+        email=user.email,
+        timezone=user.timezone
     )
     db.add(new_user)
     try:
@@ -152,6 +165,25 @@ async def refresh_token(authorization: Optional[str] = Header(None), db: Session
 async def get_username(current_user: Account = Depends(get_current_user)):
     return {"username": current_user.username}
 
+@router.put("/account/timezone")
+async def update_timezone(data: TimezoneUpdate, current_user: Account = Depends(get_current_user), db: Session = Depends(get_db)):
+    """Set the IANA timezone (e.g. "Europe/Berlin") used for the user's days, weeks and months"""
+    if not timeframes.is_valid_timezone(data.timezone):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Unknown timezone"
+        )
+    current_user.timezone = data.timezone
+    db.flush()
+    # Everything bucketed by local day or month was computed in the old timezone; redo it in this transaction
+    repeating = db.query(Expense).filter(Expense.username == current_user.username, Expense.repeating == True).all()
+    for expense in repeating:
+        recurring.sync_expense(db, expense, data.timezone)
+    sketches.rebuild_sketches(db, current_user.username)
+    rebuild_category_spend(db.connection(), current_user.username)
+    db.commit()
+    return {"timezone": current_user.timezone}
+
 @router.get("/validate-token")
 async def validate_token(current_user: Account = Depends(get_current_user)):
     """Endpoint to validate if the current token is still valid"""
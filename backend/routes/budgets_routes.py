@@ -0,0 +1,96 @@
+# Description: Budget routes for the FastAPI application
+from datetime import date, datetime
+from typing import Optional
+from fastapi import Depends, HTTPException, status, APIRouter, Request
+from sqlalchemy.orm import Session
+from pydantic import BaseModel
+
+# Local imports
+from db_env import Account, Budget
+from settings.db_settings import get_db
+from auth import get_current_user
+from response_cache import cached_response
+from categories import CATEGORIES
+from events import publish_change
+import budgets
+import timeframes
+
+router = APIRouter()
+
+class BudgetUpdate(BaseModel):
+    category: str
+    amount: float
+    month: Optional[str] = None  # YYYY-MM, the current local month by default
+
+def parse_month(month: Optional[str], current_user: Account) -> date:
+    if month is None:
+        return timeframes.local_today(current_user.timezone).replace(day=1)
+    try:
+        return datetime.strptime(month, "%Y-%m").date()
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="month must be formatted as YYYY-MM"
+        )
+
+@router.get("/budgets")
+async def get_budgets(
+    request: Request,
+    month: Optional[str] = None,
+    current_user: Account = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Budgeted vs. spent per category for a local month"""
+    first_day = parse_month(month, current_user)
+    return await cached_response(
+        request, current_user, "budgets", (first_day.isoformat(),),
+        lambda: {
+            "month": first_day.strftime("%Y-%m"),
+            "budgetCategories": budgets.budget_rollup(db, current_user.username, first_day)
+        }
+    )
+
+@router.put("/budgets")
+async def set_budget(
+    budget: BudgetUpdate,
+    current_user: Account = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    if budget.category not in CATEGORIES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"category must be one of: {', '.join(CATEGORIES)}"
+        )
+    if budget.amount < 0:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="amount must not be negative"
+        )
+    first_day = parse_month(budget.month, current_user)
+    existing = db.query(Budget).filter_by(
+        username=current_user.username, category=budget.category, month=first_day
+    ).first()
+    if existing:
+        existing.amount = budget.amount
+    else:
+        db.add(Budget(username=current_user.username, category=budget.category, month=first_day, amount=budget.amount))
+    db.commit()
+    publish_change(current_user.username, "budget", "updated",
+                   {"category": budget.category, "month": first_day.strftime("%Y-%m"), "amount": budget.amount})
+    return {"category": budget.category, "month": first_day.strftime("%Y-%m"), "amount": budget.amount}
+
+@router.delete("/budgets/{category}")
+async def delete_budget(
+    category: str,
+    month: Optional[str] = None,
+    current_user: Account = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    first_day = parse_month(month, current_user)
+    budget = db.query(Budget).filter_by(username=current_user.username, category=category, month=first_day).first()
+    if not budget:
+        raise HTTPException(status_code=404, detail="Budget not found")
+    db.delete(budget)
+    db.commit()
+    publish_change(current_user.username, "budget", "deleted", {"category": category, "month": first_day.strftime("%Y-%m")})
+    return {"detail": "Budget deleted successfully"}
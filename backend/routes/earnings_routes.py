@@ -9,6 +9,7 @@ from typing import Optional
 from db_env import Account, DailyEarning
 from settings.db_settings import get_db
 from auth import get_current_user
+from events import publish_change
 
 router = APIRouter()
 
@@ -33,6 +34,7 @@ async def create_earnings(earnings: EarningsCreate, current_user: Account = Depe
     db.add(new_earning)
     db.commit()
     db.refresh(new_earning)
+    publish_change(current_user.username, "earning", "created", {"id": new_earning.id})
     return new_earning
 
 @router.get("/earnings")
@@ -85,6 +87,7 @@ async def update_earning(
             setattr(earning, key, value)
     db.commit()
     db.refresh(earning)
+    publish_change(current_user.username, "earning", "updated", {"id": earning.id})
     return earning
 
 @router.delete("/earnings/{earning_id}")
@@ -100,4 +103,5 @@ async def delete_earning(
         raise HTTPException(status_code=404, detail="Earning not found")
     db.delete(earning)
     db.commit()
+    publish_change(current_user.username, "earning", "deleted", {"id": earning_id})
     return {"detail": "Earning deleted successfully"}
\ No newline at end of file
@@ -0,0 +1,42 @@
+# Description: Server-sent events stream for live dashboard and budget updates
+import asyncio
+from fastapi import Depends, APIRouter, Request
+from fastapi.responses import StreamingResponse
+
+# Local imports
+from db_env import Account
+from auth import get_current_user
+from events import attach_delta, event_bus, format_sse
+
+router = APIRouter()
+
+# Comment frames keep proxies and mobile radios from dropping an idle stream
+KEEPALIVE_SECONDS = 15
+
+@router.get("/events")
+async def stream_events(request: Request, current_user: Account = Depends(get_current_user)):
+    """Stream change events for the current user as text/event-stream"""
+    username = current_user.username
+    tz_name = current_user.timezone
+    queue = event_bus.subscribe(username)
+
+    async def event_stream():
+        try:
+            yield b"retry: 5000\n: connected\n\n"
+            while True:
+                try:
+                    message = await asyncio.wait_for(queue.get(), timeout=KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    yield b": keepalive\n\n"
+                    continue
+                yield format_sse(await attach_delta(message, tz_name))
+        finally:
+            event_bus.unsubscribe(username, queue)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
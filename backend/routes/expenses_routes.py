@@ -1,6 +1,6 @@
 # Description: Expense routes for the FastAPI application
-from datetime import datetime, timezone
-from fastapi import Depends, HTTPException, status, APIRouter
+from datetime import date, datetime, timezone
+from fastapi import Depends, HTTPException, status, APIRouter, Request
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
 from typing import Optional, List
@@ -9,6 +9,16 @@ from typing import Optional, List
 from db_env import Account, Expense
 from settings.db_settings import get_db
 from auth import get_current_user
+from response_cache import cached_response
+import read_models
+import timeframes
+import recurring
+import anomalies
+import sketches
+import budgets
+import commit_queue
+from categories import CATEGORIES, determine_category
+from events import publish_change
 
 router = APIRouter()
 
@@ -16,24 +26,56 @@ router = APIRouter()
 class ExpenseCreate(BaseModel):
     name: str
     price: float
+    category: Optional[str] = None  # Guessed from the name when not given
     repeating: bool = False
+    recurrence: Optional[str] = None  # weekly, monthly or yearly; monthly when only repeating is set
+    recurrence_day: Optional[int] = None
 
 class ExpenseUpdate(BaseModel):
     name: Optional[str] = None
     price: Optional[float] = None
+    category: Optional[str] = None
     repeating: Optional[bool] = None
+    recurrence: Optional[str] = None
+    recurrence_day: Optional[int] = None
 
 class ExpenseResponse(BaseModel):
     id: int
     username: str
     name: str
     price: float
+    category: Optional[str] = None
     repeating: bool
+    recurrence: Optional[str] = None
+    recurrence_day: Optional[int] = None
+    receipt_id: Optional[int] = None
     timestamp: datetime
     
     class Config:
         from_attributes = True
 
+def apply_recurrence(expense: Expense, repeating: bool, recurrence: Optional[str], recurrence_day: Optional[int], tz_name: Optional[str]):
+    """Set an expense's recurrence rule, keeping the repeating flag in sync with it."""
+    if repeating and recurrence is None:
+        recurrence = "monthly"
+    if not repeating:
+        recurrence = recurrence_day = None
+    try:
+        rule, day = recurring.normalize_rule(recurrence, recurrence_day, recurring.anchor_date(expense, tz_name))
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    expense.recurrence = rule
+    expense.recurrence_day = day
+    expense.repeating = rule is not None
+
+def validate_category(category: str) -> str:
+    if category not in CATEGORIES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"category must be one of: {', '.join(CATEGORIES)}"
+        )
+    return category
+
 # Expense Routes
 @router.post("/expenses", response_model=ExpenseResponse)
 async def create_expense(expense: ExpenseCreate, current_user: Account = Depends(get_current_user), db: Session = Depends(get_db)):
@@ -41,25 +83,77 @@ async def create_expense(expense: ExpenseCreate, current_user: Account = Depends
         username=current_user.username,
         name=expense.name,
         price=expense.price,
-        repeating=expense.repeating,
+        category=validate_category(expense.category) if expense.category else determine_category(expense.name, ""),
         timestamp=datetime.now(timezone.utc)
     )
-    db.add(new_expense)
-    db.commit()
-    db.refresh(new_expense)
+    apply_recurrence(new_expense, expense.repeating or expense.recurrence is not None,
+                     expense.recurrence, expense.recurrence_day, current_user.timezone)
+    tz_name = current_user.timezone
+    
+    def write(session: Session):
+        session.add(new_expense)
+        if new_expense.repeating:
+            recurring.sync_expense(session, new_expense, tz_name)
+        notification = anomalies.record_expense(session, new_expense)
+        sketches.record_expense(session, new_expense, tz_name)
+        budgets.record_expense(session, new_expense, tz_name)
+        return notification
+    
+    # Committed on its own, or with concurrent writes when SQLITE_GROUP_COMMIT is on
+    notification = await commit_queue.run(write, db)
+    publish_change(current_user.username, "expense", "created", {"id": new_expense.id, "price": new_expense.price},
+                   delta="expense")
+    if notification:
+        publish_change(current_user.username, "notification", "created", {"id": notification.id, "message": notification.message})
     return new_expense
 
 @router.get("/expenses", response_model=List[ExpenseResponse])
 async def get_expenses(
+    request: Request,
     current_user: Account = Depends(get_current_user),
     db: Session = Depends(get_db),
     skip: int = 0,
-    limit: int = 100
+    limit: int = 100,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    category: Optional[str] = None,
+    repeating: Optional[bool] = None,
+    name_prefix: Optional[str] = None,
+    vendor: Optional[str] = None,
+    sort: str = "timestamp"
 ):
-    expenses = db.query(Expense).filter(
-        Expense.username == current_user.username
-    ).offset(skip).limit(limit).all()
-    return expenses
+    """List expenses, optionally filtered by local date range (inclusive), price range, category,
+    repeating, case-insensitive name prefix or receipt vendor, sorted by timestamp, price or name
+    ("-" prefix for descending)"""
+    if sort.lstrip("-") not in read_models.EXPENSE_SORT_KEYS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"sort must be one of: {', '.join(read_models.EXPENSE_SORT_KEYS)} (prefix with - for descending)"
+        )
+    if start and end and start > end:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="start must not be after end"
+        )
+    if category is not None:
+        validate_category(category)
+    query = read_models.ExpenseQuery(
+        start=timeframes.timeframe(current_user.timezone, today=start).day_start if start else None,
+        end=timeframes.timeframe(current_user.timezone, today=end).day_end if end else None,
+        min_price=min_price,
+        max_price=max_price,
+        category=category,
+        repeating=repeating,
+        name_prefix=name_prefix or None,
+        vendor=vendor,
+        sort=sort
+    )
+    return await cached_response(
+        request, current_user, "expenses", (skip, limit, query),
+        lambda: read_models.list_expenses(db, current_user.username, skip, limit, query)
+    )
 
 @router.get("/expenses/{expense_id}", response_model=ExpenseResponse)
 async def get_expense(
@@ -84,21 +178,53 @@ async def update_expense(
     current_user: Account = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    expense = db.query(Expense).filter(
-        Expense.id == expense_id, 
-        Expense.username == current_user.username
-    ).first()
-    
-    if not expense:
-        raise HTTPException(status_code=404, detail="Expense not found")
-    
-    # Update only provided fields
+    username, tz_name = current_user.username, current_user.timezone
     update_data = expense_data.dict(exclude_unset=True)
-    for key, value in update_data.items():
-        setattr(expense, key, value)
+    if update_data.get("category") is not None:
+        validate_category(update_data["category"])
+    rule_fields = {"repeating", "recurrence", "recurrence_day"}
+    
+    def write(session: Session):
+        # Looked up on the session that commits the change (the writer's in group commit mode)
+        expense = session.query(Expense).filter(Expense.id == expense_id, Expense.username == username).first()
+        if not expense:
+            raise HTTPException(status_code=404, detail="Expense not found")
+        
+        # Update only provided fields
+        previous_sample = anomalies.expense_sample(expense)
+        previous_sketch = sketches.expense_sample(expense, tz_name)
+        previous_spend = budgets.expense_sample(expense, tz_name)
+        changes = dict(update_data)
+        if "category" in changes and changes["category"] is None:
+            # An explicit null re-derives the category from the (possibly new) name
+            changes["category"] = determine_category(changes.get("name", expense.name) or "", "")
+        for key, value in changes.items():
+            if key not in rule_fields:
+                setattr(expense, key, value)
+        
+        if rule_fields & changes.keys():
+            recurrence = changes.get("recurrence", expense.recurrence)
+            repeating = changes.get("repeating", expense.repeating or recurrence is not None)
+            # A changed rule without a day falls back to the day the expense was created on
+            default_day = expense.recurrence_day if recurrence == expense.recurrence else None
+            apply_recurrence(expense, repeating, recurrence, changes.get("recurrence_day", default_day), tz_name)
+        
+        # The occurrence calendar carries the rule and the price, so rebuild it when either changes
+        if (rule_fields | {"price"}) & changes.keys():
+            recurring.sync_expense(session, expense, tz_name)
+        
+        notification = None
+        if anomalies.expense_sample(expense) != previous_sample:
+            notification = anomalies.record_expense(session, expense, previous=previous_sample)
+        sketches.record_expense(session, expense, tz_name, previous=previous_sketch)
+        budgets.record_expense(session, expense, tz_name, previous=previous_spend)
+        return expense, notification
     
-    db.commit()
-    db.refresh(expense)
+    expense, notification = await commit_queue.run(write, db)
+    publish_change(current_user.username, "expense", "updated", {"id": expense.id, "price": expense.price},
+                   delta="expense")
+    if notification:
+        publish_change(current_user.username, "notification", "created", {"id": notification.id, "message": notification.message})
     return expense
 
 @router.delete("/expenses/{expense_id}")
@@ -107,14 +233,19 @@ async def delete_expense(
     current_user: Account = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    expense = db.query(Expense).filter(
-        Expense.id == expense_id, 
-        Expense.username == current_user.username
-    ).first()
+    username, tz_name = current_user.username, current_user.timezone
     
-    if not expense:
-        raise HTTPException(status_code=404, detail="Expense not found")
+    def write(session: Session):
+        expense = session.query(Expense).filter(Expense.id == expense_id, Expense.username == username).first()
+        if not expense:
+            raise HTTPException(status_code=404, detail="Expense not found")
+        recurring.clear_occurrences(session, expense.id)
+        anomalies.forget_expense(session, expense)
+        sketches.forget_expense(session, expense, tz_name)
+        budgets.forget_expense(session, expense, tz_name)
+        session.delete(expense)
     
-    db.delete(expense)
-    db.commit()
+    await commit_queue.run(write, db)
+    publish_change(current_user.username, "expense", "deleted", {"id": expense_id},
+                   delta="expense")
     return {"detail": "Expense deleted successfully"}
\ No newline at end of file
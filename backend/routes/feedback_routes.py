@@ -8,6 +8,9 @@ from typing import Optional
 from db_env import Account, Feedback
 from settings.db_settings import get_db
 from auth import get_current_user
+from responses import FastJSONResponse
+import read_models
+import commit_queue
 
 router = APIRouter()
 
@@ -51,9 +54,7 @@ async def submit_feedback(
             timestamp=datetime.now(timezone.utc)
         )
         
-        db.add(new_feedback)
-        db.commit()
-        db.refresh(new_feedback)
+        await commit_queue.run(lambda session: session.add(new_feedback), db)
         
         return new_feedback
         
@@ -77,16 +78,4 @@ async def get_feedback(
             detail="Not authorized to view feedback"
         )
         
-    feedback_items = db.query(Feedback).order_by(Feedback.timestamp.desc()).all()
-    
-    return [
-        {
-            "id": feedback.id,
-            "username": feedback.username,
-            "message": feedback.message,
-            "type": feedback.type,
-            "rating": feedback.rating,
-            "timestamp": feedback.timestamp
-        }
-        for feedback in feedback_items
-    ]
+    return FastJSONResponse(read_models.list_feedback(db))
@@ -0,0 +1,38 @@
+# Description: Cash-flow forecast routes for the FastAPI application
+from fastapi import Depends, HTTPException, status, APIRouter, Request
+from sqlalchemy.orm import Session
+
+# Local imports
+from db_env import Account
+from settings.db_settings import get_db
+from auth import get_current_user
+from response_cache import cached_response
+import forecast
+import timeframes
+
+router = APIRouter()
+
+@router.get("/forecast")
+async def get_forecast(
+    request: Request,
+    horizon: int = 90,
+    paths: int = forecast.DEFAULT_PATHS,
+    current_user: Account = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Projected income, expenses and balance plus a Monte Carlo savings-goal estimate"""
+    if horizon not in forecast.HORIZONS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"horizon must be one of {', '.join(map(str, forecast.HORIZONS))}"
+        )
+    if not 1 <= paths <= forecast.MAX_PATHS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"paths must be between 1 and {forecast.MAX_PATHS}"
+        )
+    frame = timeframes.timeframe(current_user.timezone)
+    return await cached_response(
+        request, current_user, "forecast", (frame.timezone, frame.today.isoformat(), horizon, paths),
+        lambda: forecast.forecast_user(db, current_user, frame, horizon, paths)
+    )
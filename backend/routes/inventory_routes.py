@@ -1,6 +1,6 @@
 # Description: Inventory routes for the FastAPI application
 from datetime import datetime, timezone
-from fastapi import Depends, HTTPException, status, APIRouter
+from fastapi import Depends, HTTPException, status, APIRouter, Request
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
 
@@ -8,6 +8,10 @@ from pydantic import BaseModel
 from db_env import Account, InventoryItem
 from settings.db_settings import get_db
 from auth import get_current_user
+from response_cache import cached_response
+import read_models
+import inventory_search
+from events import publish_change
 import env
 
 router = APIRouter()
@@ -32,6 +36,7 @@ async def create_inventory_item(item: InventoryCreate, current_user: Account = D
     try:
         db.commit()
         db.refresh(new_item)
+        publish_change(current_user.username, "inventory", "created", {"id": new_item.id})
         return new_item
     except Exception as e:
         db.rollback()
@@ -41,9 +46,36 @@ async def create_inventory_item(item: InventoryCreate, current_user: Account = D
         )
 
 @router.get("/inventory")
-async def get_inventory(current_user: Account = Depends(get_current_user), db: Session = Depends(get_db)):
-    items = db.query(InventoryItem).filter_by(username=current_user.username).all()
-    return items
+async def get_inventory(request: Request, current_user: Account = Depends(get_current_user), db: Session = Depends(get_db)):
+    return await cached_response(
+        request, current_user, "inventory", None,
+        lambda: read_models.list_inventory(db, current_user.username)
+    )
+
+@router.get("/inventory/search")
+async def search_inventory(
+    request: Request,
+    q: str,
+    limit: int = 20,
+    offset: int = 0,
+    current_user: Account = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Search inventory items and receipt line items by name or category prefix, best matches first"""
+    if not 1 <= limit <= 100:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="limit must be between 1 and 100"
+        )
+    if offset < 0:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="offset must not be negative"
+        )
+    return await cached_response(
+        request, current_user, "inventory-search", (q, limit, offset),
+        lambda: inventory_search.search_inventory(db, current_user.username, q, limit, offset)
+    )
 
 @router.put("/inventory/{item_id}")
 async def update_inventory_item(item_id: int, item: InventoryCreate, current_user: Account = Depends(get_current_user), db: Session = Depends(get_db)):
@@ -62,6 +94,7 @@ async def update_inventory_item(item_id: int, item: InventoryCreate, current_use
     try:
         db.commit()
         db.refresh(db_item)
+        publish_change(current_user.username, "inventory", "updated", {"id": db_item.id})
         return db_item
     except Exception as e:
         db.rollback()
@@ -83,6 +116,7 @@ async def delete_inventory_item(item_id: int, current_user: Account = Depends(ge
     try:
         db.delete(item)
         db.commit()
+        publish_change(current_user.username, "inventory", "deleted", {"id": item_id})
         return {"message": "Item deleted successfully"}
     except Exception as e:
         db.rollback()
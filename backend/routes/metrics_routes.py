@@ -0,0 +1,16 @@
+# Description: Prometheus scrape endpoint for the request, database, OCR and cache metrics
+from fastapi import APIRouter, HTTPException, status
+from starlette.responses import Response
+
+import metrics
+
+router = APIRouter()
+
+@router.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    if not metrics.PROMETHEUS_AVAILABLE:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Metrics are not available. Please install prometheus_client."
+        )
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE_LATEST)
@@ -0,0 +1,31 @@
+# Description: Notification routes for the FastAPI application
+from fastapi import Depends, HTTPException, APIRouter
+from sqlalchemy.orm import Session
+
+# Local imports
+from db_env import Account, Notification
+from settings.db_settings import get_db
+from auth import get_current_user
+
+router = APIRouter()
+
+@router.get("/notifications")
+async def get_notifications(
+    unread_only: bool = False,
+    limit: int = 50,
+    current_user: Account = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    query = db.query(Notification).filter(Notification.username == current_user.username)
+    if unread_only:
+        query = query.filter(Notification.is_read == False)
+    return query.order_by(Notification.timestamp.desc()).limit(limit).all()
+
+@router.put("/notifications/{notification_id}/read")
+async def mark_notification_read(notification_id: int, current_user: Account = Depends(get_current_user), db: Session = Depends(get_db)):
+    notification = db.query(Notification).filter_by(id=notification_id, username=current_user.username).first()
+    if not notification:
+        raise HTTPException(status_code=404, detail="Notification not found")
+    notification.is_read = True
+    db.commit()
+    return {"id": notification.id, "is_read": True}
@@ -1,14 +1,38 @@
 from fastapi import APIRouter, UploadFile, HTTPException, Depends, status, File
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 from datetime import datetime, timezone
+import asyncio
 import io
 import re
-from PIL import Image, ImageOps
+import time
 import os
 import sys
+from functools import lru_cache
 
-try:
-    import pytesseract
+from auth import get_current_user
+from settings.db_settings import get_db
+from db_env import Receipt, Account, Expense, InventoryItem
+from events import publish_change
+from categories import determine_category
+import anomalies
+import sketches
+import budgets
+import metrics
+
+router = APIRouter()
+
+@lru_cache(maxsize=None)
+def load_tesseract():
+    """Import pytesseract and check for the tesseract binary on first use; None if OCR is unavailable.
+
+    Done lazily so importing the app doesn't pay for pytesseract (and numpy) or shell out
+    to `tesseract --version` in every worker.
+    """
+    try:
+        import pytesseract
+    except ImportError:
+        return None
     if sys.platform.startswith('win'):
         tesseract_paths = [
             r'C:\Program Files\Tesseract-OCR\tesseract.exe',
@@ -18,15 +42,17 @@ try:
         pytesseract.pytesseract.tesseract_cmd = next(
             (path for path in tesseract_paths if os.path.exists(path)), None
         )
-    TESSERACT_AVAILABLE = pytesseract.get_tesseract_version() is not None
-except ImportError:
-    TESSERACT_AVAILABLE = False
+    try:
+        return pytesseract if pytesseract.get_tesseract_version() is not None else None
+    except (pytesseract.TesseractNotFoundError, OSError):
+        return None
 
-from auth import get_current_user
-from settings.db_settings import get_db
-from db_env import Receipt, Account, Expense, InventoryItem
+def tesseract_available() -> bool:
+    return load_tesseract() is not None
 
-router = APIRouter()
+# Receipt images OCR'd at once per worker; further scans wait their turn (ocr_queue_depth in /metrics)
+OCR_CONCURRENCY = int(os.environ.get("OCR_CONCURRENCY", "2"))
+ocr_slots = asyncio.Semaphore(OCR_CONCURRENCY)
 
 # Precompile regex patterns for efficiency
 TOTAL_PATTERNS = [re.compile(p, re.IGNORECASE) for p in [
@@ -48,18 +74,6 @@ ALT_ITEM_PATTERN = re.compile(r'([A-Za-z\s]+)\s+(\d+\.\d{2})')
 # New pattern for "Item - qty @ $price" format
 NEW_ITEM_PATTERN = re.compile(r'([A-Za-z\s\d&]+)\s*-\s*(\d+)\s*@\s*\$\s*(\d+\.\d{2})')
 
-CATEGORY_KEYWORDS = {
-    "Groceries": ["grocery", "market", "food", "supermarket", "walmart", "kroger", "safeway", "aldi", "costco", "trader joe", "produce", "bakery", "deli", "organic", "fruits", "vegetables"],
-    "Dining": ["restaurant", "cafe", "diner", "bistro", "bar", "grill", "eatery", "pizzeria", "sushi", "takeout", "delivery", "fast food", "mcdonald", "starbucks", "chipotle", "taco", "burger"],
-    "Entertainment": ["cinema", "theater", "movie", "game", "entertainment", "concert", "festival", "amusement", "netflix", "spotify", "disney", "hulu", "ticket", "park", "event", "bowling"],
-    "Transportation": ["gas", "fuel", "taxi", "uber", "lyft", "transport", "parking", "toll", "bus", "train", "subway", "airline", "flight", "rental car", "metro", "transit", "exxon", "shell"],
-    "Utilities": ["electric", "water", "gas", "internet", "phone", "utility", "cable", "broadband", "wireless", "sewage", "trash", "waste", "at&t", "verizon", "comcast", "xfinity", "power"],
-    "Healthcare": ["doctor", "pharmacy", "hospital", "clinic", "health", "medical", "dental", "vision", "prescription", "insurance", "walgreens", "cvs", "therapy", "urgent care", "laboratory"],
-    "Shopping": ["mall", "store", "amazon", "target", "retail", "clothing", "electronics", "furniture", "department", "online", "purchase", "ebay", "best buy", "home depot", "walmart"],
-    "Education": ["tuition", "school", "college", "university", "textbook", "course", "class", "education", "student", "loan", "supplies", "books", "academic"],
-    "Personal Care": ["salon", "spa", "haircut", "beauty", "cosmetics", "barber", "gym", "fitness", "wellness", "makeup", "skincare"]
-}
-
 def extract_amount(text):
     for pattern in TOTAL_PATTERNS:
         match = pattern.search(text)
@@ -80,13 +94,6 @@ def extract_date(lines):
                         continue
     return datetime.now()
 
-def determine_category(text, vendor):
-    text_lower = text.lower()
-    for cat, keywords in CATEGORY_KEYWORDS.items():
-        if any(keyword in text_lower or keyword in vendor.lower() for keyword in keywords):
-            return cat
-    return "Uncategorized"
-
 def normalize_text(text):
     """Pre-process text to improve OCR accuracy and pattern matching"""
     # Replace common OCR errors
@@ -192,6 +199,83 @@ def extract_payment_method(text):
             return method.capitalize()
     return "Unknown"
 
+def read_receipt_text(contents: bytes) -> str:
+    """Decode, clean up and OCR a receipt image. Blocking; run it in the threadpool."""
+    from PIL import Image, ImageOps
+    
+    image = Image.open(io.BytesIO(contents))
+    image = ImageOps.grayscale(image)  # Convert to grayscale for better OCR
+    
+    # Enhanced image preprocessing for better OCR results
+    image = ImageOps.autocontrast(image)  # Improve contrast
+    
+    return load_tesseract().image_to_string(image)
+
+async def ocr_receipt(contents: bytes) -> str:
+    """OCR a receipt off the event loop, at most OCR_CONCURRENCY at a time."""
+    metrics.ocr_queue_depth.value += 1
+    try:
+        async with ocr_slots:
+            started = time.perf_counter()
+            text = await run_in_threadpool(read_receipt_text, contents)
+            metrics.ocr_duration.observe((), time.perf_counter() - started)
+            return text
+    finally:
+        metrics.ocr_queue_depth.value -= 1
+
+def add_items_to_inventory(db: Session, username: str, items: list, category: str) -> tuple:
+    """Add a receipt's line items to the user's inventory, bumping quantities of items they already have.
+
+    Existing items are fetched in one query and new ones flushed together, instead of a
+    lookup (and a flush) per line item. Returns (inventory entries, low confidence item names).
+    """
+    # Skip items with truly empty quantities (not just zero)
+    items = [item for item in items if item["quantity"] is not None]
+    names = {item["name"] for item in items}
+    # Newest first, so each name maps to its oldest item as the per-item .first() lookup did
+    existing = {
+        inventory_item.name: inventory_item
+        for inventory_item in db.query(InventoryItem).filter(
+            InventoryItem.username == username,
+            InventoryItem.name.in_(names)
+        ).order_by(InventoryItem.id.desc())
+    } if names else {}
+    
+    entries = []
+    low_confidence_items = []
+    for item in items:
+        if item.get("confidence") == "low":
+            low_confidence_items.append(item["name"])
+        
+        inventory_item = existing.get(item["name"])
+        if inventory_item is not None:
+            inventory_item.quantity += item["quantity"]
+            entries.append((inventory_item, item, inventory_item.quantity, "updated"))
+        else:
+            inventory_item = existing[item["name"]] = InventoryItem(
+                username=username,
+                name=item["name"],
+                category=category,
+                quantity=item["quantity"],
+                price=item["price"],
+                timestamp=datetime.now(timezone.utc)
+            )
+            db.add(inventory_item)
+            entries.append((inventory_item, item, inventory_item.quantity, "created"))
+    db.flush()  # Assigns ids to the new items
+    
+    return [
+        {
+            "id": inventory_item.id,
+            "name": inventory_item.name,
+            "quantity": quantity,
+            "price": inventory_item.price,
+            "confidence": item.get("confidence", "medium"),
+            change: True
+        }
+        for inventory_item, item, quantity, change in entries
+    ], low_confidence_items
+
 @router.post("/upload-receipt")
 async def upload_receipt(
     receipt: UploadFile = File(...),
@@ -199,7 +283,7 @@ async def upload_receipt(
     db: Session = Depends(get_db),
     add_to_inventory: bool = True
 ):
-    if not TESSERACT_AVAILABLE:
+    if not await run_in_threadpool(tesseract_available):
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
             detail="OCR service is not available. Please install Tesseract OCR."
@@ -207,13 +291,7 @@ async def upload_receipt(
 
     try:
         contents = await receipt.read()
-        image = Image.open(io.BytesIO(contents))
-        image = ImageOps.grayscale(image)  # Convert to grayscale for better OCR
-        
-        # Enhanced image preprocessing for better OCR results
-        image = ImageOps.autocontrast(image)  # Improve contrast
-        
-        text = pytesseract.image_to_string(image)
+        text = await ocr_receipt(contents)
 
         lines = [line.strip() for line in text.split('\n') if line.strip()]
         vendor, address = extract_vendor_and_address(lines)
@@ -256,63 +334,38 @@ async def upload_receipt(
             timestamp=datetime.now(timezone.utc)
         )
         db.add(new_receipt)
+        db.flush()  # Assigns new_receipt.id for the expense to link to
 
         new_expense = Expense(
             username=current_user.username,
             name=f"Receipt: {vendor}",
             price=amount,
+            category=category,
+            receipt_id=new_receipt.id,
             repeating=False,
             timestamp=receipt_date
         )
         db.add(new_expense)
+        notification = anomalies.record_expense(db, new_expense)
+        sketches.record_expense(db, new_expense, current_user.timezone)
+        budgets.record_expense(db, new_expense, current_user.timezone)
 
         inventory_items = []
         low_confidence_items = []
         
         if add_to_inventory and items:
-            for item in items:
-                # Skip items with truly empty quantities (not just zero)
-                if item["quantity"] is None:
-                    continue
-                    
-                if item.get("confidence") == "low":
-                    low_confidence_items.append(item["name"])
-                
-                existing_item = db.query(InventoryItem).filter(
-                    InventoryItem.username == current_user.username,
-                    InventoryItem.name == item["name"]
-                ).first()
-                if existing_item:
-                    existing_item.quantity += item["quantity"]
-                    inventory_items.append({
-                        "id": existing_item.id,
-                        "name": existing_item.name,
-                        "quantity": existing_item.quantity,
-                        "price": existing_item.price,
-                        "confidence": item.get("confidence", "medium"),
-                        "updated": True
-                    })
-                else:
-                    new_item = InventoryItem(
-                        username=current_user.username,
-                        name=item["name"],
-                        category=category,
-                        quantity=item["quantity"],
-                        price=item["price"],
-                        timestamp=datetime.now(timezone.utc)
-                    )
-                    db.add(new_item)
-                    db.flush()
-                    inventory_items.append({
-                        "id": new_item.id,
-                        "name": new_item.name,
-                        "quantity": new_item.quantity,
-                        "price": new_item.price,
-                        "confidence": item.get("confidence", "medium"),
-                        "created": True
-                    })
+            inventory_items, low_confidence_items = add_items_to_inventory(db, current_user.username, items, category)
 
         db.commit()
+        publish_change(
+            current_user.username, "receipt", "scanned",
+            {"receipt_id": new_receipt.id, "expense_id": new_expense.id, "amount": amount,
+             "category": category, "inventory_items": len(inventory_items)},
+            delta="expense"
+        )
+        if notification:
+            publish_change(current_user.username, "notification", "created",
+                           {"id": notification.id, "message": notification.message})
         
         # Include confidence information and warnings in the response
         warnings = []
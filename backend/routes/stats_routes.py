@@ -0,0 +1,42 @@
+# Description: Spending statistics routes for the FastAPI application
+from datetime import date, timedelta
+from typing import Optional
+from fastapi import Depends, HTTPException, status, APIRouter, Request
+from sqlalchemy.orm import Session
+
+# Local imports
+from db_env import Account
+from settings.db_settings import get_db
+from auth import get_current_user
+from response_cache import cached_response
+import sketches
+import timeframes
+
+router = APIRouter()
+
+@router.get("/stats/expenses")
+async def get_expense_stats(
+    request: Request,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    top: int = 10,
+    current_user: Account = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Percentiles, a histogram and top merchants for expenses between two local days (inclusive)"""
+    end = end or timeframes.local_today(current_user.timezone)
+    start = start or end - timedelta(days=29)
+    if start > end:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="start must not be after end"
+        )
+    if not 1 <= top <= 100:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="top must be between 1 and 100"
+        )
+    return await cached_response(
+        request, current_user, "stats-expenses", (start.isoformat(), end.isoformat(), top),
+        lambda: sketches.expense_stats(db, current_user.username, start, end, top)
+    )
@@ -1,6 +1,6 @@
 # Description: Task routes for the FastAPI application
 from datetime import datetime, timezone
-from fastapi import Depends, HTTPException, status, APIRouter
+from fastapi import Depends, HTTPException, status, APIRouter, Request
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
 
@@ -8,6 +8,11 @@ from pydantic import BaseModel
 from db_env import Account, Task
 from settings.db_settings import get_db
 from auth import get_current_user
+from response_cache import cached_response
+import read_models
+from events import publish_change
+import commit_queue
+from calculations import TASK_RESET_MODE, get_local_today
 
 router = APIRouter()
 
@@ -22,32 +27,59 @@ class TaskUpdate(BaseModel):
     is_complete: bool = False
     repeat_daily: bool = False
 
+def is_task_complete(task: Task, today) -> bool:
+    """In lazy mode a repeating task only counts as complete on the day it was completed."""
+    if TASK_RESET_MODE == "lazy" and task.repeat_daily:
+        return task.last_completed_on == today
+    return bool(task.is_complete)
+
+def set_task_complete(task: Task, is_complete: bool, today):
+    task.is_complete = is_complete
+    task.last_completed_on = today if is_complete else None
+
 # Task Routes
 @router.post("/tasks")
 async def create_task(task: TaskCreate, current_user: Account = Depends(get_current_user), db: Session = Depends(get_db)):
     new_task = Task(
         username=current_user.username,
         title=task.title,
-        is_complete=task.is_complete,
         repeat_daily=task.repeat_daily,
         timestamp=datetime.now(timezone.utc)
     )
-    db.add(new_task)
-    db.commit()
-    db.refresh(new_task)
+    set_task_complete(new_task, task.is_complete, get_local_today(tz_name=current_user.timezone))
+    await commit_queue.run(lambda session: session.add(new_task), db)
+    publish_change(current_user.username, "task", "created", {"id": new_task.id, "is_complete": new_task.is_complete})
     return new_task
 
 @router.get("/tasks")
-async def get_tasks(current_user: Account = Depends(get_current_user), db: Session = Depends(get_db)):
-    return db.query(Task).filter_by(username=current_user.username).all()
+async def get_tasks(request: Request, current_user: Account = Depends(get_current_user), db: Session = Depends(get_db)):
+    if TASK_RESET_MODE == "lazy":
+        # Completion depends on the day, so the day is part of the cache key
+        today = get_local_today(tz_name=current_user.timezone)
+        return await cached_response(
+            request, current_user, "tasks", today.isoformat(),
+            lambda: read_models.list_tasks(db, current_user.username, today)
+        )
+    return await cached_response(
+        request, current_user, "tasks", None,
+        lambda: read_models.list_tasks(db, current_user.username)
+    )
 
 @router.post("/complete_task/{task_id}")
 async def complete_task(task_id: int, current_user: Account = Depends(get_current_user), db: Session = Depends(get_db)):
-    task = db.query(Task).filter_by(id=task_id, username=current_user.username).first()
-    if not task:
-        raise HTTPException(status_code=404, detail="Task not found")
-    task.is_complete = not task.is_complete
-    db.commit()
+    username, tz_name = current_user.username, current_user.timezone
+    
+    def toggle(session: Session) -> Task:
+        # Looked up on the session that commits the change (the writer's in group commit mode)
+        task = session.query(Task).filter_by(id=task_id, username=username).first()
+        if not task:
+            raise HTTPException(status_code=404, detail="Task not found")
+        today = get_local_today(tz_name=tz_name)
+        set_task_complete(task, not is_task_complete(task, today), today)
+        return task
+    
+    task = await commit_queue.run(toggle, db)
+    publish_change(current_user.username, "task", "updated", {"id": task.id, "is_complete": task.is_complete})
     return task
 
 @router.put("/tasks/{task_id}")
@@ -57,12 +89,13 @@ async def update_task(task_id: int, task_data: TaskUpdate, current_user: Account
         raise HTTPException(status_code=404, detail="Task not found")
     
     task.title = task_data.title
-    task.is_complete = task_data.is_complete
     task.repeat_daily = task_data.repeat_daily
+    set_task_complete(task, task_data.is_complete, get_local_today(tz_name=current_user.timezone))
     
     try:
         db.commit()
         db.refresh(task)
+        publish_change(current_user.username, "task", "updated", {"id": task.id, "is_complete": task.is_complete})
         return task
     except Exception as e:
         db.rollback()
@@ -78,6 +111,7 @@ async def delete_task(task_id: int, current_user: Account = Depends(get_current_
         raise HTTPException(status_code=404, detail="Task not found")
     db.delete(task)
     db.commit()
+    publish_change(current_user.username, "task", "deleted", {"id": task_id})
     return {"message": "Task deleted"}
 
 # Add a new route to edit a task's title and completion status in one request
@@ -91,11 +125,12 @@ async def edit_task(task_id: int, task_data: TaskUpdate, current_user: Account =
     if task_data.title is not None:
         task.title = task_data.title
     if task_data.is_complete is not None:
-        task.is_complete = task_data.is_complete
+        set_task_complete(task, task_data.is_complete, get_local_today(tz_name=current_user.timezone))
 
     try:
         db.commit()
         db.refresh(task)
+        publish_change(current_user.username, "task", "updated", {"id": task.id, "is_complete": task.is_complete})
         return task
     except Exception as e:
         db.rollback()
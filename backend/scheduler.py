@@ -0,0 +1,212 @@
+# This file runs the background jobs from scheduler_tasks.py inside the app process.
+# Every gunicorn worker starts a scheduler from the lifespan hook, but only the worker
+# holding the leader lease (a row in scheduler_leases with an expiry) actually runs
+# jobs, so each job runs once across workers and hosts. Leases are renewed on a timer
+# and taken over when the holder stops renewing. Every run is recorded in job_runs.
+
+import os
+import socket
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Callable
+
+from apscheduler.schedulers.background import BackgroundScheduler
+from apscheduler.triggers.cron import CronTrigger
+from sqlalchemy import update, or_
+from sqlalchemy.exc import IntegrityError
+
+import scheduler_tasks
+from calculations import TASK_RESET_MODE
+from db_env import SchedulerLease, JobRun
+from settings.db_settings import SessionLocal
+
+LEADER_LEASE = "scheduler-leader"
+LEASE_SECONDS = int(os.environ.get("SCHEDULER_LEASE_SECONDS", "90"))
+RENEW_SECONDS = max(5, LEASE_SECONDS // 3)
+SCHEDULER_TIMEZONE = os.environ.get("SCHEDULER_TIMEZONE", "UTC")
+
+def new_holder_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+HOLDER_ID = new_holder_id()
+
+@dataclass
+class JobSpec:
+    id: str
+    func: Callable
+    cron: str  # "minute hour day month day_of_week"
+    jitter: int = 0  # seconds of random delay, to spread heavy jobs out
+    misfire_grace_time: int = 3600  # run late rather than skip if the process was busy or asleep
+    min_interval: int = 3600  # never run the same job twice within this window
+
+JOBS = [
+    JobSpec(
+        id="extend_recurring_expenses",
+        func=scheduler_tasks.extend_recurring_expenses,
+        cron=os.environ.get("RECURRENCE_CRON", "15 0 * * *"),
+        jitter=300,
+    ),
+    JobSpec(
+        id="financial_snapshot",
+        func=scheduler_tasks.update_spending_limit,
+        cron=os.environ.get("SNAPSHOT_CRON", "30 3 * * *"),  # Off-peak, after the task reset
+        jitter=900,
+    ),
+    JobSpec(
+        id="purge_idempotency_keys",
+        func=scheduler_tasks.purge_idempotency_keys,
+        cron=os.environ.get("IDEMPOTENCY_PURGE_CRON", "45 * * * *"),
+        jitter=300,
+        min_interval=1800,
+    ),
+]
+
+# Lazy mode derives task completion at read time, so there's nothing to reset at midnight
+if TASK_RESET_MODE != "lazy":
+    JOBS.insert(0, JobSpec(
+        id="reset_repeating_tasks",
+        func=scheduler_tasks.reset_repeating_tasks,
+        cron=os.environ.get("RESET_TASKS_CRON", "0 0 * * *"),
+        jitter=60,
+    ))
+
+def _utcnow():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+def try_acquire_lease(name: str, holder: str, ttl_seconds: int) -> bool:
+    """Take or renew a lease. Succeeds if it's free, expired, or already ours."""
+    session = SessionLocal()
+    now = _utcnow()
+    expires_at = now + timedelta(seconds=ttl_seconds)
+    try:
+        result = session.execute(
+            update(SchedulerLease)
+            .where(
+                SchedulerLease.name == name,
+                or_(SchedulerLease.holder == holder, SchedulerLease.expires_at < now)
+            )
+            .values(holder=holder, expires_at=expires_at)
+        )
+        if result.rowcount == 0:
+            session.add(SchedulerLease(name=name, holder=holder, expires_at=expires_at))
+            session.flush()
+        session.commit()
+        return True
+    except IntegrityError:
+        session.rollback()  # Someone else holds an unexpired lease
+        return False
+    except Exception as e:
+        session.rollback()
+        print(f"Error acquiring lease {name}: {str(e)}")
+        return False
+    finally:
+        session.close()
+
+def release_lease(name: str, holder: str):
+    session = SessionLocal()
+    try:
+        session.execute(
+            update(SchedulerLease)
+            .where(SchedulerLease.name == name, SchedulerLease.holder == holder)
+            .values(expires_at=_utcnow())
+        )
+        session.commit()
+    except Exception as e:
+        session.rollback()
+        print(f"Error releasing lease {name}: {str(e)}")
+    finally:
+        session.close()
+
+class LeaderScheduler:
+    """APScheduler wrapper that only executes jobs while holding the leader lease."""
+
+    def __init__(self, jobs=JOBS, holder=HOLDER_ID):
+        self.jobs = {job.id: job for job in jobs}
+        self.holder = holder
+        self._leader_until = 0.0
+        self._lock = threading.Lock()
+        self._scheduler = BackgroundScheduler(timezone=SCHEDULER_TIMEZONE)
+
+    @property
+    def is_leader(self) -> bool:
+        return time.monotonic() < self._leader_until
+
+    def renew(self) -> bool:
+        """Renew (or try to take) the leader lease and remember until when we hold it."""
+        requested = time.monotonic()
+        if try_acquire_lease(LEADER_LEASE, self.holder, LEASE_SECONDS):
+            # Leave a safety margin so we stop acting as leader before the row expires
+            self._leader_until = requested + LEASE_SECONDS - RENEW_SECONDS
+            return True
+        self._leader_until = 0.0
+        return False
+
+    def start(self):
+        for job in self.jobs.values():
+            self._scheduler.add_job(
+                self._run,
+                CronTrigger.from_crontab(job.cron, timezone=SCHEDULER_TIMEZONE),
+                args=[job.id],
+                id=job.id,
+                jitter=job.jitter or None,
+                misfire_grace_time=job.misfire_grace_time,
+                coalesce=True,
+                max_instances=1,
+                replace_existing=True,
+            )
+        self._scheduler.add_job(self.renew, "interval", seconds=RENEW_SECONDS, id="leader_lease",
+                                next_run_time=datetime.now(timezone.utc), max_instances=1, coalesce=True)
+        self._scheduler.start()
+        print(f"Scheduler started as {self.holder} with jobs: {', '.join(self.jobs)}")
+
+    def shutdown(self):
+        self._scheduler.shutdown(wait=False)
+        if self.is_leader:
+            release_lease(LEADER_LEASE, self.holder)
+        self._leader_until = 0.0
+
+    def _recently_ran(self, session, job: JobSpec) -> bool:
+        cutoff = _utcnow() - timedelta(seconds=job.min_interval)
+        return session.query(JobRun.id).filter(
+            JobRun.job_id == job.id,
+            JobRun.status.in_(["running", "success"]),
+            JobRun.started_at >= cutoff
+        ).first() is not None
+
+    def _run(self, job_id: str):
+        job = self.jobs[job_id]
+        # The leader may have died since the last renewal; whoever fires first takes over
+        if not (self.is_leader or self.renew()):
+            return
+
+        with self._lock:
+            session = SessionLocal()
+            try:
+                if self._recently_ran(session, job):
+                    return
+                run = JobRun(job_id=job.id, holder=self.holder, status="running", started_at=_utcnow())
+                session.add(run)
+                session.commit()
+
+                started = time.perf_counter()
+                try:
+                    job.func()
+                    run.status = "success"
+                except Exception as e:
+                    run.status = "failed"
+                    run.error = str(e)
+                    print(f"Scheduled job {job.id} failed: {str(e)}")
+                run.finished_at = _utcnow()
+                run.duration_seconds = time.perf_counter() - started
+                session.commit()
+                print(f"Scheduled job {job.id} finished with status {run.status} in {run.duration_seconds:.2f}s")
+            finally:
+                session.close()
+
+def scheduler_enabled() -> bool:
+    return os.environ.get("SCHEDULER_ENABLED", "true").lower() in ("1", "true", "yes")
+
+scheduler = LeaderScheduler()
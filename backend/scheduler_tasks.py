@@ -1,67 +1,158 @@
 # This file contains the functions that are used by the scheduler to run tasks at a specific time. 
-# The update_spending_limit function updates the spending limit for all users in the database. 
-# While the reset_repeating_tasks function resets all repeating tasks to incomplete. 
+# The update_spending_limit function snapshots every user's FinancialOverview metrics in batched chunks. 
+# While the reset_repeating_tasks function resets all repeating tasks to incomplete (unless TASK_RESET_MODE is lazy). 
+# The extend_recurring_expenses function rolls the recurring expense occurrence calendar forward. 
+# The purge_idempotency_keys function deletes stored Idempotency-Key responses past their TTL. 
 # These functions are run at midnight every day using the BackgroundScheduler class from the apscheduler library.
-from datetime import datetime, timezone
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone, timedelta
+from itertools import repeat
+from sqlalchemy import select, insert, update
 import calculations as calculations
-from calculations import calculate_daily_limit as calculated
 import db_env as db_env
-from settings.db_settings import SessionLocal
+import recurring
+import idempotency
+from settings.db_settings import SessionLocal, engine
 
-def update_spending_limit():
+# Users per set-based pass and per snapshot transaction
+SNAPSHOT_CHUNK_SIZE = int(os.environ.get("SNAPSHOT_CHUNK_SIZE", "500"))
+# Processes to fan chunks out to; 0 or 1 computes in-process
+SNAPSHOT_WORKERS = int(os.environ.get("SNAPSHOT_WORKERS", "0"))
+
+def iter_username_chunks(chunk_size):
+    """Yield lists of usernames in id order, one keyset-paginated query per chunk."""
     session = SessionLocal()
     try:
-        users = session.query(db_env.Account).all()
-
-        for user in users:
-            account = session.query(db_env.Account).filter_by(username=user.username).first()
-            calc = calculated(user.username, account)
-
-            savings = calc.monthly_earnings - calc.monthly_expenses - account.monthly_savings_goal
-            Finances = db_env.FinancialOverview(
-                monthly_savings_goal=account.monthly_savings_goal,
-                daily_limit=calc.daily_limit,
-                total_income=calc.total_income,
-                daily_earnings=calc.daily_earnings,
-                weekly_earnings=calc.weekly_earnings,
-                monthly_expenses=calc.monthly_expenses,
-                total_money_spent_today=calc.total_money_spent_today,
-                daily_expenses_total=calc.daily_expenses_total,
-                monthly_earnings=calc.monthly_earnings,
-                savings_rate=calc.savings_rate,
-                savings_forecast=savings,
-                average_daily_expenses=calc.average_daily_expenses,
-                total_expenses=calc.total_expenses,
-                start_of_month=calc.start_of_month,
-                end_of_month=calc.end_of_month,
-                start_of_week=calc.start_of_week,
-                end_of_week=calc.end_of_week,
-                timestamp=datetime.now(timezone.utc),
-                username=user.username
-            )
+        last_id = 0
+        while True:
+            rows = session.execute(
+                select(db_env.Account.id, db_env.Account.username)
+                .where(db_env.Account.id > last_id)
+                .order_by(db_env.Account.id)
+                .limit(chunk_size)
+            ).all()
+            if not rows:
+                break
+            last_id = rows[-1].id
+            yield [row.username for row in rows]
+    finally:
+        session.close()
 
-            session.add(Finances)
-            session.commit()
-            print("New entry created successfully.")
+def snapshot_chunk(usernames, current_date):
+    """Compute and bulk insert FinancialOverview snapshots for one chunk in one transaction.
 
+    Returns the number of snapshots written, or None if the chunk failed and was rolled back.
+    """
+    session = SessionLocal()
+    try:
+        overviews = calculations.calculate_financial_overviews(session, usernames, current_date)
+        if overviews:
+            session.execute(insert(db_env.FinancialOverview), overviews)
+        session.commit()
+        return len(overviews)
     except Exception as e:
         session.rollback()
-        print(f"Error updating spending limit: {str(e)}")
+        print(f"Error snapshotting chunk starting at {usernames[0]}: {str(e)}")
+        return None
     finally:
         session.close()
 
+def _init_snapshot_worker():
+    # Forked processes must not reuse the parent's pooled connections
+    engine.dispose(close=False)
+
+def update_spending_limit(chunk_size=None, workers=None):
+    """Snapshot every user's FinancialOverview metrics with batched, set-based queries."""
+    chunk_size = chunk_size or SNAPSHOT_CHUNK_SIZE
+    workers = SNAPSHOT_WORKERS if workers is None else workers
+    current_date = datetime.now(timezone.utc)
+    started = time.perf_counter()
+    users = chunks = failed = 0
+
+    chunk_iter = iter_username_chunks(chunk_size)
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_snapshot_worker) as pool:
+            counts = list(pool.map(snapshot_chunk, chunk_iter, repeat(current_date)))
+    else:
+        counts = (snapshot_chunk(usernames, current_date) for usernames in chunk_iter)
+    for count in counts:
+        chunks += 1
+        if count is None:
+            failed += 1
+        else:
+            users += count
+
+    elapsed = time.perf_counter() - started
+    rate = users / elapsed if elapsed > 0 else 0
+    print(f"Snapshotted {users} users in {chunks} chunks in {elapsed:.2f}s ({rate:.0f} users/s)")
+    if failed:
+        # The other chunks are committed; failing the run keeps job_runs honest about the gap
+        raise RuntimeError(f"{failed} of {chunks} snapshot chunks failed")
+    return {"users": users, "chunks": chunks, "seconds": elapsed, "users_per_second": rate}
+
 def reset_repeating_tasks():
+    """Mark every completed repeating task incomplete with one set-based UPDATE."""
     session = SessionLocal()
     try:
-        tasks = session.query(db_env.Task).filter_by(repeat_daily=True).all()
-        
-        for task in tasks:
-            task.is_complete = False
-        
+        Task = db_env.Task
+        completed_repeating = (Task.repeat_daily == True, Task.is_complete == True)
+
+        # Invalidate cached task lists for the affected users before their rows change
+        session.execute(
+            update(db_env.Account)
+            .where(db_env.Account.username.in_(select(Task.username).where(*completed_repeating)))
+            .values(data_version=db_env.Account.data_version + 1)
+        )
+        result = session.execute(
+            update(Task).where(*completed_repeating).values(is_complete=False)
+        )
         session.commit()
-        print("Successfully reset repeating tasks")
+        print(f"Successfully reset {result.rowcount} repeating tasks")
     except Exception as e:
         session.rollback()
         print(f"An error occurred while resetting tasks: {e}")
+        raise  # So the scheduler records the run as failed
     finally:
         session.close()
+
+def extend_recurring_expenses(chunk_size=None):
+    """Generate occurrences for repeating expenses whose calendar ends before the rolling horizon."""
+    chunk_size = chunk_size or SNAPSHOT_CHUNK_SIZE
+    # Users' local days differ from UTC by at most a day, so this catches every stale calendar
+    cutoff = datetime.now(timezone.utc).date() + timedelta(days=recurring.RECURRENCE_HORIZON_DAYS - 1)
+    session = SessionLocal()
+    expenses = occurrences = 0
+    try:
+        last_id = 0
+        while True:
+            rows = session.query(db_env.Expense, db_env.Account.timezone).join(
+                db_env.Account, db_env.Account.username == db_env.Expense.username
+            ).filter(
+                db_env.Expense.id > last_id,
+                db_env.Expense.repeating == True,
+                (db_env.Expense.materialized_through == None) | (db_env.Expense.materialized_through < cutoff)
+            ).order_by(db_env.Expense.id).limit(chunk_size).all()
+            if not rows:
+                break
+            last_id = rows[-1][0].id
+            for expense, tz_name in rows:
+                occurrences += recurring.materialize(session, expense, tz_name)
+            expenses += len(rows)
+            session.commit()
+            session.expunge_all()
+        print(f"Extended {expenses} recurring expenses with {occurrences} occurrences")
+        return {"expenses": expenses, "occurrences": occurrences}
+    except Exception as e:
+        session.rollback()
+        print(f"An error occurred while extending recurring expenses: {e}")
+        raise  # So the scheduler records the run as failed
+    finally:
+        session.close()
+
+def purge_idempotency_keys():
+    """Delete Idempotency-Key responses past their TTL and claims abandoned by dead workers."""
+    removed = idempotency.purge_expired()
+    print(f"Purged {removed} expired idempotency keys")
+    return {"removed": removed}
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Benchmark filtered GET /expenses queries at scale.
+Seeds one user with N expenses (1M by default, a tenth of them linked to receipts from
+a handful of vendors) plus a few smaller users into a throwaway SQLite file, runs
+ANALYZE, then reports p50/p95 latency of the read_models query for representative
+filter and sort combinations, along with the index each one uses.
+Run this from the root of your backend directory.
+"""
+
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+DB_PATH = os.path.join(tempfile.mkdtemp(prefix="bench_expense_queries_"), "bench.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+
+from sqlalchemy import insert, text
+
+from settings.db_settings import SessionLocal, engine
+from db_env import Account, Expense, Receipt
+from migrations import run_migrations
+from categories import CATEGORIES
+from responses import FastJSONResponse
+import read_models
+
+VENDORS = ["Kroger", "Walmart", "Target", "Costco", "Shell", "Trader Joe's", "Safeway", "CVS"]
+NAMES = ["Coffee", "Groceries", "Gas", "Rent", "Lunch", "Dinner", "Movie", "Pharmacy", "Parking", "Books"]
+BATCH = 50000
+
+def seed(username, expenses):
+    rng = random.Random(hash(username) & 0xFFFF)
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    session = SessionLocal()
+    session.add(Account(username=username, email=f"{username}@example.com", password="x"))
+    session.flush()
+    receipts = expenses // 10
+    session.execute(insert(Receipt), [
+        {"username": username, "vendor": rng.choice(VENDORS), "total": 20.0, "category": "Groceries",
+         "date": now, "timestamp": now}
+        for _ in range(receipts)
+    ])
+    first_receipt = session.execute(text("SELECT min(id) FROM receipts WHERE username = :u"), {"u": username}).scalar()
+    for start in range(0, expenses, BATCH):
+        session.execute(insert(Expense), [
+            {"username": username, "name": f"{rng.choice(NAMES)} {i}", "price": round(rng.uniform(1, 300), 2),
+             "category": rng.choice(CATEGORIES), "repeating": i % 50 == 0,
+             "receipt_id": first_receipt + i // 10 if i % 10 == 0 else None,
+             "timestamp": now - timedelta(minutes=rng.randrange(0, 60 * 24 * 365 * 5))}
+            for i in range(start, min(expenses, start + BATCH))
+        ])
+    session.commit()
+    session.close()
+
+def scenarios(now):
+    month_ago = now - timedelta(days=30)
+    return {
+        "no filters": read_models.ExpenseQuery(),
+        "newest first": read_models.ExpenseQuery(sort="-timestamp"),
+        "last 30 days": read_models.ExpenseQuery(start=month_ago, end=now, sort="-timestamp"),
+        "price 100-101": read_models.ExpenseQuery(min_price=100, max_price=101),
+        "price >= 10, by price desc": read_models.ExpenseQuery(min_price=10, sort="-price"),
+        "category": read_models.ExpenseQuery(category="Dining", sort="-timestamp"),
+        "category + 30 days": read_models.ExpenseQuery(category="Dining", start=month_ago, end=now),
+        "repeating": read_models.ExpenseQuery(repeating=True),
+        "name prefix 'coffee 12'": read_models.ExpenseQuery(name_prefix="coffee 12"),
+        "name prefix, by name": read_models.ExpenseQuery(name_prefix="park", sort="name"),
+        "vendor": read_models.ExpenseQuery(vendor="Costco", sort="-timestamp"),
+        "vendor + price": read_models.ExpenseQuery(vendor="Costco", min_price=250, sort="-price"),
+        "unknown vendor": read_models.ExpenseQuery(vendor="Nowhere"),
+        "everything": read_models.ExpenseQuery(start=now - timedelta(days=365), end=now, min_price=5, max_price=200,
+                                               category="Groceries", repeating=False, name_prefix="g", sort="-price"),
+    }
+
+def main():
+    expenses = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    run_migrations()
+    started = time.perf_counter()
+    seed("bench", expenses)
+    for u in range(5):
+        seed(f"other{u}", expenses // 20)
+    with engine.begin() as conn:
+        conn.execute(text("ANALYZE"))
+    print(f"Seeded {expenses} expenses in {time.perf_counter() - started:.1f} s")
+
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    session = SessionLocal()
+    for label, query in scenarios(now).items():
+        stmt = read_models.expense_statement("bench", 0, 100, query)
+        compiled = stmt.compile(dialect=engine.dialect)
+        params = tuple(
+            value.isoformat(" ") if isinstance(value, datetime) else value
+            for value in (compiled.params[name] for name in compiled.positiontup)
+        )
+        plan = [row[-1] for row in session.connection().exec_driver_sql("EXPLAIN QUERY PLAN " + str(compiled), params)]
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            rows = read_models.list_expenses(session, "bench", 0, 100, query)
+            FastJSONResponse(rows)
+            timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+        p95 = timings[max(0, int(len(timings) * 0.95) - 1)]
+        print(f"{label:<28} rows={len(rows):>3} p50 {statistics.median(timings):7.2f} ms, p95 {p95:7.2f} ms")
+        print(f"    {' | '.join(plan)}")
+    session.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Benchmark the /forecast build (queries, projection, Monte Carlo and serialization).
+Seeds one user with 90 days of expenses, earnings and recurring expenses into a
+throwaway SQLite file and reports p50/p95 latency of an uncached forecast for each
+horizon. The target is a p95 under 50 ms at 10k paths.
+Run this from the root of your backend directory.
+"""
+
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+DB_PATH = os.path.join(tempfile.mkdtemp(prefix="bench_forecast_"), "bench.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+
+from sqlalchemy import insert
+
+from settings.db_settings import SessionLocal
+from db_env import Account, Expense, DailyEarning
+from migrations import run_migrations
+from responses import FastJSONResponse
+import forecast
+import recurring
+import timeframes
+
+def seed():
+    rng = random.Random(42)
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    session = SessionLocal()
+    session.add(Account(username="bench", email="bench@example.com", password="x",
+                        monthly_savings_goal=400.0, timestamp=now - timedelta(days=120)))
+    session.execute(insert(Expense), [
+        {"username": "bench", "name": "Expense", "price": round(rng.uniform(2, 60), 2), "repeating": False,
+         "timestamp": now - timedelta(hours=rng.uniform(0, 24 * 90))}
+        for _ in range(400)
+    ])
+    session.execute(insert(DailyEarning), [
+        {"username": "bench", "cash_tips": round(rng.uniform(0, 80), 2), "hours": rng.choice([4.0, 6.0, 8.0]),
+         "hourly_rate": 15.0, "salary": 0.0, "timestamp": now - timedelta(days=day)}
+        for day in range(0, 90, 2)
+    ])
+    for name, price, rule, day in [("Rent", 1200.0, "monthly", 1), ("Gym", 12.0, "weekly", 0), ("Insurance", 600.0, "yearly", 15)]:
+        expense = Expense(username="bench", name=name, price=price, repeating=True, recurrence=rule,
+                          recurrence_day=day, timestamp=now - timedelta(days=100))
+        session.add(expense)
+        recurring.sync_expense(session, expense)
+    session.commit()
+    session.close()
+
+def main():
+    paths = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    run_migrations()
+    seed()
+
+    session = SessionLocal()
+    account = session.query(Account).filter_by(username="bench").one()
+    frame = timeframes.timeframe(account.timezone)
+    for horizon in forecast.HORIZONS:
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            FastJSONResponse(forecast.forecast_user(session, account, frame, horizon, paths))
+            timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+        p95 = timings[int(len(timings) * 0.95) - 1]
+        print(f"horizon={horizon:>3}d paths={paths}: p50 {statistics.median(timings):.1f} ms, p95 {p95:.1f} ms")
+    result = forecast.forecast_user(session, account, frame, 90, paths)
+    print(f"Savings goal: {result['savingsGoal']}")
+    session.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Benchmark write throughput with and without group commit (SQLITE_GROUP_COMMIT).
+Seeds one throwaway SQLite database with scripts/synthetic_data.py, then starts several
+processes against it, like gunicorn workers sharing a database file. Each drives the
+app through httpx's ASGI transport with CONCURRENCY writes in flight, cycling through
+the routes that go through commit_queue: POST /expenses, POST /tasks,
+POST /complete_task/{id} and POST /api/feedback. The processes start together and
+run the same number of writes in both modes.
+Reports writes/second over all processes, p50/p95/p99 latency, errors, and in group
+commit mode how many writes each transaction carried on average.
+
+    python scripts/bench_group_commit.py [--processes 4] [--concurrency 10] [--writes 500]
+
+Run this from the root of your backend directory.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPTS_DIR = os.path.join(BACKEND_DIR, "scripts")
+sys.path.insert(0, SCRIPTS_DIR)
+
+from loadtest import run_scenario, format_result
+
+USERS = 20
+EXPENSES_PER_USER = 50
+SEED = 42
+
+async def drive(writes: int, concurrency: int, start_at: float, index: int) -> dict:
+    """Run this process's share of writes once the shared start time is reached."""
+    import httpx
+
+    import synthetic_data
+    import main
+    import commit_queue
+    from auth import create_access_token
+
+    rng = random.Random(SEED + index)
+    auth = [{"Authorization": f"Bearer {create_access_token({'sub': synthetic_data.username_for(i)})}"}
+            for i in range(USERS)]
+    transport = httpx.ASGITransport(app=main.app)
+    async with main.app.router.lifespan_context(main.app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+            # One task per user to toggle, created before the clock starts
+            task_ids = []
+            for headers in auth:
+                response = await client.post("/tasks", headers=headers, json={"title": f"bench {index}"})
+                task_ids.append(response.json()["id"])
+
+            def make_request(i):
+                user = rng.randrange(USERS)
+                headers = auth[user]
+                kind = i % 4
+                if kind == 0:
+                    merchant = rng.choice(synthetic_data.MERCHANTS)[0]
+                    return {"method": "POST", "url": "/expenses", "headers": headers,
+                            "json": {"name": merchant, "price": round(rng.uniform(2, 80), 2)}}
+                if kind == 1:
+                    return {"method": "POST", "url": "/tasks", "headers": headers,
+                            "json": {"title": rng.choice(synthetic_data.TASKS)}}
+                if kind == 2:
+                    return {"method": "POST", "url": f"/complete_task/{task_ids[user]}", "headers": headers}
+                return {"method": "POST", "url": "/api/feedback", "headers": headers,
+                        "json": {"message": "Group commit benchmark", "type": "general", "rating": 5}}
+
+            await asyncio.sleep(max(0.0, start_at - time.time()))
+            started = time.time()
+            result = await run_scenario(client, make_request, writes, concurrency)
+            finished = time.time()
+    result.update(started=started, finished=finished, **commit_queue.commit_queue.stats())
+    return result
+
+def bench_worker(args):
+    """Entry point of a benchmark process; DATABASE_URL and SQLITE_GROUP_COMMIT come from the parent."""
+    sys.path.insert(0, BACKEND_DIR)
+    result = asyncio.run(drive(args.writes, args.concurrency, args.start_at, args.index))
+    with open(args.result_file, "w") as f:
+        json.dump(result, f)
+
+def run_mode(group_commit: bool, args, database_url: str, directory: str) -> dict:
+    env = dict(os.environ, DATABASE_URL=database_url, SQLITE_GROUP_COMMIT=str(group_commit).lower(),
+               SCHEDULER_ENABLED="false", MIGRATE_ON_STARTUP="false", QUERY_PROFILER="off")
+    # Leaves time for every process to import the app and log in before the clock starts
+    start_at = time.time() + 5 + args.processes
+    processes, paths = [], []
+    for index in range(args.processes):
+        path = os.path.join(directory, f"{'group' if group_commit else 'direct'}_{index}.json")
+        paths.append(path)
+        processes.append(subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), "--bench-worker", "--index", str(index),
+             "--result-file", path, "--start-at", str(start_at),
+             "--writes", str(args.writes), "--concurrency", str(args.concurrency)],
+            cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL,
+        ))
+    for process in processes:
+        if process.wait() != 0:
+            sys.exit(f"A benchmark process exited with code {process.returncode}")
+
+    results = []
+    for path in paths:
+        with open(path) as f:
+            results.append(json.load(f))
+    # Latencies are only kept as percentiles per process; the worst process's are reported
+    count = sum(result["requests"] for result in results)
+    seconds = max(result["finished"] for result in results) - min(result["started"] for result in results)
+    combined = {
+        "requests": count,
+        "errors": sum(result["errors"] for result in results),
+        "throughput": round(count / seconds, 1),
+        "mean_ms": round(sum(result["mean_ms"] * result["requests"] for result in results) / count, 2),
+        "p50_ms": max(result["p50_ms"] for result in results),
+        "p95_ms": max(result["p95_ms"] for result in results),
+        "p99_ms": max(result["p99_ms"] for result in results),
+    }
+    batches = sum(result["batches"] for result in results)
+    combined["average_batch"] = round(sum(result["operations"] for result in results) / batches, 2) if batches else 1.0
+    return combined
+
+def main():
+    parser = argparse.ArgumentParser(description="Write throughput with and without group commit")
+    parser.add_argument("--processes", type=int, default=4, help="worker processes sharing the database")
+    # Keep this within the connection pool (5 + 10 overflow): each request holds a connection
+    parser.add_argument("--concurrency", type=int, default=10, help="writes in flight per process")
+    parser.add_argument("--writes", type=int, default=500, help="writes per process")
+    parser.add_argument("--bench-worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--index", type=int, default=0, help=argparse.SUPPRESS)
+    parser.add_argument("--result-file", help=argparse.SUPPRESS)
+    parser.add_argument("--start-at", type=float, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.bench_worker:
+        bench_worker(args)
+        return
+
+    directory = tempfile.mkdtemp(prefix="bench_group_commit_")
+    try:
+        database_url = f"sqlite:///{os.path.join(directory, 'bench.db')}"
+        os.environ["DATABASE_URL"] = database_url
+        os.environ["SCHEDULER_ENABLED"] = "false"
+        sys.path.insert(0, BACKEND_DIR)
+        import synthetic_data
+        synthetic_data.seed(USERS, EXPENSES_PER_USER, SEED)
+
+        print(f"{args.processes} processes x {args.concurrency} concurrent writes, {args.writes} writes each\n")
+        results = {}
+        for group_commit in (False, True):
+            label = "group" if group_commit else "direct"
+            results[label] = run_mode(group_commit, args, database_url, directory)
+            print(f"{label:<8}{format_result(results[label])}  {results[label]['average_batch']:>5.1f} writes/commit")
+        speedup = results["group"]["throughput"] / results["direct"]["throughput"]
+        print(f"\nGroup commit: {speedup:.2f}x the write throughput")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Benchmark /inventory/search against a large inventory.
+Seeds one user with N inventory items (100k by default) plus receipts with line items,
+and a second user with the same number of items, into a throwaway SQLite file. The
+FTS index is filled by its triggers as the rows are inserted. Reports p50/p95 latency
+of an uncached search for a few query shapes. Every word in the seeded vocabulary
+appears in about 10% of item names, so one-word and two-letter queries are a worst case.
+Run this from the root of your backend directory.
+"""
+
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+DB_PATH = os.path.join(tempfile.mkdtemp(prefix="bench_inventory_search_"), "bench.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+
+from sqlalchemy import insert
+
+from settings.db_settings import SessionLocal
+from db_env import Account, InventoryItem, Receipt
+from migrations import run_migrations
+from categories import CATEGORIES
+from responses import FastJSONResponse
+import inventory_search
+
+WORDS = ["organic", "milk", "whole", "wheat", "bread", "greek", "yogurt", "chicken", "breast", "apple",
+         "banana", "coffee", "beans", "olive", "oil", "pasta", "tomato", "sauce", "cheddar", "cheese",
+         "spinach", "almond", "butter", "orange", "juice", "brown", "rice", "black", "pepper", "honey"]
+
+QUERIES = ["milk", "gre yog", "org whole milk", "ch", "zzz"]
+
+def seed(items):
+    rng = random.Random(42)
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    session = SessionLocal()
+    for username in ("bench", "other"):
+        session.add(Account(username=username, email=f"{username}@example.com", password="x"))
+        session.flush()
+        session.execute(insert(InventoryItem), [
+            {"username": username, "name": " ".join(rng.sample(WORDS, 3)) + f" {i}",
+             "category": rng.choice(CATEGORIES), "quantity": 1.0, "price": 2.5, "timestamp": now}
+            for i in range(items)
+        ])
+        session.execute(insert(Receipt), [
+            {"username": username, "vendor": "Kroger", "category": "Groceries", "date": now, "timestamp": now,
+             "items": [{"name": " ".join(rng.sample(WORDS, 2)), "price": 3.0, "quantity": 1} for _ in range(10)]}
+            for _ in range(items // 100)
+        ])
+    session.commit()
+    session.close()
+
+def main():
+    items = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    run_migrations()
+    started = time.perf_counter()
+    seed(items)
+    print(f"Seeded {items} items per user in {time.perf_counter() - started:.1f} s")
+
+    session = SessionLocal()
+    for query in QUERIES:
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            result = inventory_search.search_inventory(session, "bench", query, limit=20, offset=0)
+            FastJSONResponse(result)
+            timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+        p95 = timings[int(len(timings) * 0.95) - 1]
+        print(f"q={query!r:<18} results={len(result['results']):>2} hasMore={result['hasMore']!s:<5} "
+              f"p50 {statistics.median(timings):.2f} ms, p95 {p95:.2f} ms")
+    session.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Benchmark the per-request cost of the /metrics instrumentation.
+Times, in microseconds per request:
+- the work RequestMiddleware does for metrics (request stats context, in-progress
+  gauge, recording duration and query histograms) against buffered accumulators
+- the same samples written straight to prometheus_client, for comparison
+- the amortized cost of flushing the buffers once a second at the given request rate
+- the query timing wrapper, as the extra cost of one SELECT on the instrumented engine
+Run with PROMETHEUS_MULTIPROC_DIR set to measure the multiprocess (gunicorn) mode.
+Run this from the root of your backend directory.
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='bench_metrics_'), 'bench.db')}")
+
+from sqlalchemy import create_engine, text
+
+import metrics
+from settings.db_settings import engine
+
+ROUTES = [("GET", f"/route{i}") for i in range(30)]
+
+def per_request(n):
+    """Seconds per request for the metrics work RequestMiddleware does."""
+    started = time.perf_counter()
+    for i in range(n):
+        method, route = ROUTES[i % len(ROUTES)]
+        began = time.perf_counter()
+        stats = metrics.RequestStats()
+        token = metrics.request_stats.set(stats)
+        metrics.requests_in_progress.value += 1
+        stats.queries += 2
+        stats.db_seconds += 0.0004
+        metrics.requests_in_progress.value -= 1
+        metrics.record_request(method, route, 200, time.perf_counter() - began, stats)
+        metrics.request_stats.reset(token)
+    return (time.perf_counter() - started) / n
+
+def unbuffered(n):
+    """Seconds per request writing the same samples directly to prometheus_client."""
+    duration = metrics.request_duration.metric
+    queries = metrics.request_queries.metric
+    db_time = metrics.request_db_time.metric
+    in_progress = metrics.requests_in_progress.metric
+    started = time.perf_counter()
+    for i in range(n):
+        method, route = ROUTES[i % len(ROUTES)]
+        began = time.perf_counter()
+        in_progress.inc()
+        in_progress.dec()
+        duration.labels(method, route, "200").observe(time.perf_counter() - began)
+        queries.labels(method, route).observe(2)
+        db_time.labels(method, route).observe(0.0004)
+    return (time.perf_counter() - started) / n
+
+def flush_cost(rate):
+    """Seconds per request spent flushing, for one flush per second at rate requests/sec."""
+    per_request(rate)
+    started = time.perf_counter()
+    metrics.flush()
+    return (time.perf_counter() - started) / rate
+
+def query_cost(n, rounds=5):
+    """Extra seconds per query for the timing wrapper, with a request's stats in context.
+
+    The engines take turns over several rounds and the fastest round of each is compared,
+    since the difference is small next to run-to-run noise.
+    """
+    plain = create_engine(str(engine.url), connect_args={"check_same_thread": False})
+    timings = {"plain": [], "instrumented": []}
+    token = metrics.request_stats.set(metrics.RequestStats())
+    with plain.connect() as plain_conn, engine.connect() as instrumented_conn:
+        connections = {"plain": plain_conn, "instrumented": instrumented_conn}
+        for conn in connections.values():
+            for _ in range(1000):
+                conn.execute(text("SELECT 1"))
+        for _ in range(rounds):
+            for label, conn in connections.items():
+                started = time.perf_counter()
+                for _ in range(n):
+                    conn.execute(text("SELECT 1"))
+                timings[label].append((time.perf_counter() - started) / n)
+    metrics.request_stats.reset(token)
+    return min(timings["instrumented"]) - min(timings["plain"])
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    rate = int(sys.argv[2]) if len(sys.argv) > 2 else 5000
+    mode = "multiprocess" if metrics.MULTIPROCESS else "single process"
+    print(f"prometheus_client {'available' if metrics.PROMETHEUS_AVAILABLE else 'missing'}, {mode} mode")
+    per_request(1000)
+    metrics.flush()
+    print(f"Buffered instrumentation: {per_request(n) * 1e6:.2f} us/request")
+    metrics.flush()
+    if metrics.PROMETHEUS_AVAILABLE:
+        print(f"Direct prometheus_client: {unbuffered(n // 4) * 1e6:.2f} us/request")
+    print(f"Flush at {rate} req/s:     {flush_cost(rate) * 1e6:.2f} us/request")
+    print(f"Query timing:             {query_cost(n // 20) * 1e6:.2f} us/query")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Benchmark requests/sec through the middleware stack, before and after middleware.py.
+Builds the same FastAPI app (all API routers plus a small JSON endpoint) three ways:
+with no middleware, with the previous stack (a BaseHTTPMiddleware CORS layer inside
+Starlette's CORSMiddleware inside the negotiation middleware) and with the single
+pure-ASGI RequestMiddleware. Each is driven in-process through raw ASGI calls, so
+the numbers are the framework and middleware cost without a server or network.
+Run this from the root of your backend directory.
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='bench_middleware_'), 'bench.db')}")
+
+from fastapi import FastAPI, Request
+from fastapi.middleware.cors import CORSMiddleware
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from middleware import RequestMiddleware, CORS_ORIGINS
+from responses import FastJSONResponse, negotiate, negotiated_format
+from routes import router
+
+ORIGIN = "http://localhost:3000"
+
+class LegacyCORSMiddleware(BaseHTTPMiddleware):
+    """The CustomCORSMiddleware main.py used before RequestMiddleware."""
+    async def dispatch(self, request: Request, call_next):
+        origin = request.headers.get("origin")
+        response = await call_next(request)
+        if origin in CORS_ORIGINS:
+            response.headers["Access-Control-Allow-Origin"] = origin
+            response.headers["Access-Control-Allow-Credentials"] = "true"
+            response.headers["Access-Control-Allow-Methods"] = "GET, POST, PUT, DELETE, OPTIONS"
+            response.headers["Access-Control-Allow-Headers"] = "Content-Type, Authorization, X-Requested-With"
+        return response
+
+class LegacyNegotiationMiddleware:
+    """The negotiation middleware main.py used before RequestMiddleware."""
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        accept = accept_encoding = ""
+        for name, value in scope["headers"]:
+            if name == b"accept":
+                accept = value.decode("latin-1")
+            elif name == b"accept-encoding":
+                accept_encoding = value.decode("latin-1")
+        token = negotiated_format.set(negotiate(accept, accept_encoding))
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            negotiated_format.reset(token)
+
+def build_app(stack):
+    app = FastAPI(default_response_class=FastJSONResponse)
+
+    @app.get("/ping")
+    async def ping():
+        return {"status": "ok", "items": list(range(20))}
+
+    app.include_router(router)
+    if stack == "before":
+        app.add_middleware(LegacyCORSMiddleware)
+        app.add_middleware(CORSMiddleware, allow_origins=sorted(CORS_ORIGINS), allow_credentials=True,
+                           allow_methods=["*"], allow_headers=["*"])
+        app.add_middleware(LegacyNegotiationMiddleware)
+    elif stack == "after":
+        app.add_middleware(RequestMiddleware)
+    return app
+
+def make_scope(method, headers):
+    return {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": method,
+        "scheme": "http", "path": "/ping", "raw_path": b"/ping", "query_string": b"", "root_path": "",
+        "headers": headers, "client": ("127.0.0.1", 12345), "server": ("127.0.0.1", 8000),
+    }
+
+async def run(app, scope, requests):
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    statuses = []
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            statuses.append(message["status"])
+
+    for _ in range(200):  # Warm up
+        await app(dict(scope), receive, send)
+    started = time.perf_counter()
+    for _ in range(requests):
+        await app(dict(scope), receive, send)
+    elapsed = time.perf_counter() - started
+    assert set(statuses) == {200}, statuses[:5]
+    return requests / elapsed
+
+async def main():
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    cases = {
+        "GET with Origin": make_scope("GET", [(b"origin", ORIGIN.encode()), (b"accept-encoding", b"gzip")]),
+        "GET without Origin": make_scope("GET", []),
+        "CORS preflight": make_scope("OPTIONS", [(b"origin", ORIGIN.encode()),
+                                                  (b"access-control-request-method", b"GET"),
+                                                  (b"access-control-request-headers", b"authorization")]),
+    }
+    apps = {stack: build_app(stack) for stack in ("none", "before", "after")}
+    for label, scope in cases.items():
+        rates = {}
+        for stack, app in apps.items():
+            if stack == "none" and scope["method"] == "OPTIONS":
+                continue
+            rates[stack] = await run(app, scope, requests)
+        summary = ", ".join(f"{stack} {rate:,.0f} req/s" for stack, rate in rates.items())
+        print(f"{label:<20} {summary} (after/before: {rates['after'] / rates['before']:.2f}x)")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Benchmark the lightweight read path against ORM hydration for large list responses.
+Seeds an in-memory SQLite database with N rows per table, then compares latency and
+peak memory (tracemalloc) of building the /expenses, /inventory and /tasks responses
+through the ORM versus read_models' Core select() path.
+Run this from the root of your backend directory.
+"""
+
+import os
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+from typing import List
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from pydantic import TypeAdapter
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from settings.db_settings import Base
+from db_env import Expense, InventoryItem, Task
+from responses import FastJSONResponse
+from routes.expenses_routes import ExpenseResponse
+import read_models
+
+def seed(session_factory, rows):
+    now = datetime.now(timezone.utc)
+    session = session_factory()
+    session.execute(insert(Expense), [
+        {"username": "bench", "name": f"Expense {i}", "price": 3.5 + i % 97,
+         "repeating": i % 10 == 0, "timestamp": now - timedelta(minutes=i)}
+        for i in range(rows)
+    ])
+    session.execute(insert(InventoryItem), [
+        {"username": "bench", "name": f"Item {i}", "category": "Groceries",
+         "quantity": float(i % 7), "price": 1.25 + i % 31, "timestamp": now}
+        for i in range(rows)
+    ])
+    session.execute(insert(Task), [
+        {"username": "bench", "title": f"Task {i}", "is_complete": i % 2 == 0,
+         "repeat_daily": i % 3 == 0, "timestamp": now}
+        for i in range(rows)
+    ])
+    session.commit()
+    session.close()
+
+def orm_expenses(db, rows):
+    # What get_expenses did before: ORM instances validated through the response model
+    expenses = db.query(Expense).filter(Expense.username == "bench").limit(rows).all()
+    adapter = TypeAdapter(List[ExpenseResponse])
+    return FastJSONResponse(adapter.dump_python(adapter.validate_python(expenses, from_attributes=True))).body
+
+def orm_inventory(db, rows):
+    return FastJSONResponse(db.query(InventoryItem).filter_by(username="bench").all()).body
+
+def orm_tasks(db, rows):
+    return FastJSONResponse(db.query(Task).filter_by(username="bench").all()).body
+
+def core_expenses(db, rows):
+    return FastJSONResponse(read_models.list_expenses(db, "bench", 0, rows)).body
+
+def core_inventory(db, rows):
+    return FastJSONResponse(read_models.list_inventory(db, "bench")).body
+
+def core_tasks(db, rows):
+    return FastJSONResponse(read_models.list_tasks(db, "bench")).body
+
+def measure(session_factory, fn, rows, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        db = session_factory()
+        start = time.perf_counter()
+        fn(db, rows)
+        best = min(best, time.perf_counter() - start)
+        db.close()
+
+    db = session_factory()
+    tracemalloc.start()
+    fn(db, rows)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    db.close()
+    return best, peak
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    seed(session_factory, rows)
+
+    cases = [
+        ("/expenses", orm_expenses, core_expenses),
+        ("/inventory", orm_inventory, core_inventory),
+        ("/tasks", orm_tasks, core_tasks),
+    ]
+    print(f"{rows} rows per response, best of {repeat}")
+    print(f"{'endpoint':<12} {'path':<6} {'time (ms)':>10} {'peak (KiB)':>11} {'speedup':>8} {'memory':>7}")
+    for name, orm_fn, core_fn in cases:
+        orm_time, orm_peak = measure(session_factory, orm_fn, rows, repeat)
+        core_time, core_peak = measure(session_factory, core_fn, rows, repeat)
+        print(f"{name:<12} {'orm':<6} {orm_time * 1000:>10.2f} {orm_peak / 1024:>11.0f}")
+        print(f"{'':<12} {'core':<6} {core_time * 1000:>10.2f} {core_peak / 1024:>11.0f} "
+              f"{orm_time / core_time:>7.1f}x {core_peak / orm_peak:>6.0%}")
+
+if __name__ == "__main__":
+    main()
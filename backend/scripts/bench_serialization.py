@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Benchmark response serialization for /financial-dashboard, /expenses and /inventory.
+Compares the stock FastAPI path (jsonable_encoder + json.dumps) with FastJSONResponse
+and reports serialization time and bytes on the wire for each negotiated format.
+Run this from the root of your backend directory.
+"""
+
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from typing import List
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+from db_env import Expense, InventoryItem
+from responses import FastJSONResponse, negotiated_format, compress, MSGPACK_AVAILABLE, BROTLI_AVAILABLE
+from routes.expenses_routes import ExpenseResponse
+
+def make_dashboard():
+    today = datetime.now().date()
+    return {
+        "dailyScore": -42.17,
+        "financialData": [
+            {
+                "date": (today + timedelta(days=i)).strftime("%Y-%m-%d"),
+                "income": 120.0 + i,
+                "expenses": 80.25 + i,
+                "balance": 39.75,
+                "projected": 39.75,
+            }
+            for i in range(-30, 31)
+        ],
+        "budgetCategories": [
+            {"category": name, "budgeted": 500.0, "spent": 123.45, "remaining": 376.55, "percentage": 24.69}
+            for name in ["Groceries", "Dining", "Entertainment", "Transportation", "Utilities", "Healthcare"]
+        ],
+    }
+
+def make_expenses(count):
+    now = datetime.now(timezone.utc)
+    return [
+        Expense(id=i, username="bench", name=f"Expense {i}", price=round(3.5 + i % 97, 2),
+                category="Groceries", repeating=i % 10 == 0, timestamp=now - timedelta(minutes=i))
+        for i in range(count)
+    ]
+
+def make_inventory(count):
+    now = datetime.now(timezone.utc)
+    return [
+        InventoryItem(id=i, username="bench", name=f"Item {i}", category="Groceries",
+                      quantity=float(i % 7), price=round(1.25 + i % 31, 2), timestamp=now)
+        for i in range(count)
+    ]
+
+def stock_dump(content, response_model=None):
+    # Mirrors FastAPI's serialize_response followed by JSONResponse.render
+    if response_model is not None:
+        adapter = TypeAdapter(response_model)
+        content = adapter.dump_python(adapter.validate_python(content, from_attributes=True), mode="json")
+    else:
+        content = jsonable_encoder(content)
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+def fast_dump(content, wire_format="json", encoding=None):
+    token = negotiated_format.set((wire_format, encoding))
+    try:
+        return FastJSONResponse(content).body
+    finally:
+        negotiated_format.reset(token)
+
+def timed(fn, repeat):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+
+    cases = [
+        ("/financial-dashboard", make_dashboard(), None),
+        (f"/expenses ({rows} rows)", make_expenses(rows), List[ExpenseResponse]),
+        (f"/inventory ({rows} rows)", make_inventory(rows), None),
+    ]
+    variants = [("json", None), ("json", "gzip")]
+    if BROTLI_AVAILABLE:
+        variants.append(("json", "br"))
+    if MSGPACK_AVAILABLE:
+        variants.extend([("msgpack", None), ("msgpack", "br" if BROTLI_AVAILABLE else "gzip")])
+
+    print(f"{'endpoint':<26} {'path':<22} {'time (ms)':>10} {'bytes':>10} {'speedup':>8}")
+    for name, content, response_model in cases:
+        stock_time, stock_body = timed(lambda: stock_dump(content, response_model), repeat)
+        print(f"{name:<26} {'stock json':<22} {stock_time * 1000:>10.3f} {len(stock_body):>10} {'1.0x':>8}")
+
+        stock_gzip_time, stock_gzip = timed(lambda: compress(stock_dump(content, response_model), "gzip")[0], repeat)
+        print(f"{'':<26} {'stock json + gzip':<22} {stock_gzip_time * 1000:>10.3f} {len(stock_gzip):>10} "
+              f"{stock_time / stock_gzip_time:>7.1f}x")
+
+        for wire_format, encoding in variants:
+            fast_time, fast_body = timed(lambda: fast_dump(content, wire_format, encoding), repeat)
+            label = f"fast {wire_format}" + (f" + {encoding}" if encoding else "")
+            print(f"{'':<26} {label:<22} {fast_time * 1000:>10.3f} {len(fast_body):>10} "
+                  f"{stock_time / fast_time:>7.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Benchmark the nightly FinancialOverview snapshot job on a synthetic database.
+Seeds N users with expenses and earnings into a throwaway SQLite file, runs
+scheduler_tasks.update_spending_limit and reports its throughput. A sample of users
+is cross-checked against the per-user calculate_* functions.
+Run this from the root of your backend directory.
+"""
+
+import os
+import random
+import sys
+import tempfile
+from datetime import datetime, timedelta, timezone
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+DB_PATH = os.path.join(tempfile.mkdtemp(prefix="bench_snapshot_"), "bench.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+
+from sqlalchemy import insert, func
+
+from settings.db_settings import SessionLocal
+from db_env import Account, Expense, DailyEarning, FinancialOverview
+from migrations import run_migrations
+import calculations
+import scheduler_tasks
+
+def seed(users, expenses_per_user, earnings_per_user):
+    rng = random.Random(42)
+    now = datetime.now(timezone.utc)
+    session = SessionLocal()
+    batch = 2000
+    for first in range(0, users, batch):
+        names = [f"user{i}" for i in range(first, min(users, first + batch))]
+        session.execute(insert(Account), [
+            {"username": name, "email": f"{name}@example.com", "password": "x",
+             "monthly_savings_goal": rng.choice([0.0, 100.0, 250.0])}
+            for name in names
+        ])
+        session.execute(insert(Expense), [
+            {"username": name, "name": "Expense", "price": round(rng.uniform(1, 80), 2),
+             "repeating": rng.random() < 0.1, "timestamp": now - timedelta(hours=rng.uniform(0, 24 * 60))}
+            for name in names for _ in range(expenses_per_user)
+        ])
+        session.execute(insert(DailyEarning), [
+            {"username": name, "cash_tips": round(rng.uniform(0, 50), 2), "hours": rng.choice([4.0, 6.0, 8.0]),
+             "hourly_rate": 15.0, "salary": rng.choice([0.0, 0.0, 52000.0]),
+             "timestamp": now - timedelta(days=rng.uniform(0, 40))}
+            for name in names for _ in range(earnings_per_user)
+        ])
+        session.commit()
+    session.close()
+
+def main():
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else 0
+    expenses_per_user, earnings_per_user = 20, 10
+
+    print(f"Seeding {users} users into {DB_PATH}")
+    run_migrations()
+    seed(users, expenses_per_user, earnings_per_user)
+    # Build the recurring expense calendar the way the nightly job would
+    scheduler_tasks.extend_recurring_expenses()
+
+    result = scheduler_tasks.update_spending_limit(workers=workers)
+    print(f"Throughput: {result['users_per_second']:.0f} users/s with {workers or 1} process(es); "
+          f"projected {100000 / result['users_per_second']:.0f}s for 100k users")
+
+    session = SessionLocal()
+    snapshots = session.query(func.count(FinancialOverview.id)).scalar()
+    print(f"Rows written: {snapshots}")
+    mismatches = 0
+    for i in random.Random(7).sample(range(users), min(users, 20)):
+        username = f"user{i}"
+        snapshot = session.query(FinancialOverview).filter_by(username=username).first()
+        expected_repeating = calculations.calculate_monthly_expenses_repeating(username)
+        expected_limit = calculations.calculate_daily_limit(username, datetime.now(timezone.utc))
+        if (abs(snapshot.monthly_expenses_repeating - expected_repeating) > 0.01
+                or abs(snapshot.daily_limit - expected_limit) > 0.01):
+            mismatches += 1
+    print(f"Spot check against per-user calculations: {mismatches} mismatches")
+    session.close()
+
+if __name__ == "__main__":
+    main()
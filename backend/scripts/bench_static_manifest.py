@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Benchmark frontend serving, before and after static_manifest.py.
+Writes a synthetic Next.js export (pages, hashed chunks with .br/.gz siblings, one
+large asset) into a temp directory, then serves the same requests through two
+FastAPI apps: one with the previous catch-all route, which probed the filesystem and
+sent a FileResponse on every request, and one answering from the startup manifest.
+Both are driven in-process through raw ASGI calls, so the numbers are the per-request
+cost without a server or network.
+Run this from the root of your backend directory.
+"""
+
+import asyncio
+import gzip
+import os
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import FileResponse
+
+from static_manifest import build_frontend_manifest
+
+CHUNK = "main-3f9a2b1c4d5e6f70.js"
+
+def write_frontend(root: Path):
+    chunks = root / "out" / "_next" / "static" / "chunks"
+    chunks.mkdir(parents=True)
+    (root / "out" / "index.html").write_text("<html>" + "index " * 2000 + "</html>")
+    for page in ("dashboard", "expenses", "inventory", "settings"):
+        (root / "out" / f"{page}.html").write_text("<html>" + page * 1000 + "</html>")
+    for i in range(200):
+        body = (f"console.log({i});" * 2000).encode()
+        name = CHUNK if i == 0 else f"chunk{i}-{i:016x}.js"
+        (chunks / name).write_bytes(body)
+        (chunks / (name + ".gz")).write_bytes(gzip.compress(body))
+    (root / "out" / "large.bin").write_bytes(os.urandom(2 * 1024 * 1024))
+
+def legacy_app(frontend_dir: Path):
+    """The catch-all route main.py used before the manifest."""
+    app = FastAPI()
+
+    @app.get("/{full_path:path}")
+    async def serve_frontend(full_path: str):
+        if (frontend_dir / "out").exists():
+            file_path = frontend_dir / "out" / full_path
+            if file_path.exists() and file_path.is_file():
+                return FileResponse(file_path)
+            html_path = file_path.with_suffix(".html")
+            if html_path.exists():
+                return FileResponse(html_path)
+            index_path = frontend_dir / "out" / "index.html"
+            if index_path.exists():
+                return FileResponse(index_path)
+        return {"message": "Page not found. Make sure your frontend is built correctly."}
+    return app
+
+def manifest_app(frontend_dir: Path):
+    app = FastAPI()
+    assets = build_frontend_manifest(frontend_dir)
+
+    @app.get("/{full_path:path}")
+    async def serve_frontend(full_path: str, request: Request):
+        asset = assets.lookup(full_path)
+        if asset is not None:
+            return assets.response(asset, request.headers)
+        raise HTTPException(status_code=404, detail="Page not found. Make sure your frontend is built correctly.")
+    return app
+
+def make_scope(path, headers):
+    return {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": b"", "root_path": "",
+        "headers": headers, "client": ("127.0.0.1", 12345), "server": ("127.0.0.1", 8000),
+    }
+
+async def run(app, scope, requests):
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    sent = {"status": None, "bytes": 0}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            sent["status"] = message["status"]
+        elif message["type"] == "http.response.body":
+            sent["bytes"] += len(message.get("body", b""))
+
+    for _ in range(50):  # Warm up
+        await app(dict(scope), receive, send)
+    sent["bytes"] = 0
+    started = time.perf_counter()
+    for _ in range(requests):
+        await app(dict(scope), receive, send)
+    elapsed = time.perf_counter() - started
+    return requests / elapsed, sent["status"], sent["bytes"] // requests
+
+async def main():
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    root = Path(tempfile.mkdtemp(prefix="bench_static_manifest_"))
+    try:
+        write_frontend(root)
+        apps = {"before": legacy_app(root), "after": manifest_app(root)}
+        cases = {
+            "page (/dashboard)": make_scope("/dashboard", []),
+            "SPA fallback": make_scope("/expenses/42/edit", []),
+            "hashed chunk, gzip": make_scope(f"/_next/static/chunks/{CHUNK}", [(b"accept-encoding", b"gzip, br")]),
+            "2 MB file": make_scope("/large.bin", []),
+        }
+        for label, scope in cases.items():
+            results = {stack: await run(app, scope, requests) for stack, app in apps.items()}
+            summary = ", ".join(f"{stack} {rate:,.0f} req/s ({status}, {size:,} B)"
+                                for stack, (rate, status, size) in results.items())
+            print(f"{label:<20} {summary} (after/before: {results['after'][0] / results['before'][0]:.2f}x)")
+    finally:
+        shutil.rmtree(root)
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Check that every GET /expenses filter combination and sort key is answered from an index.
+Seeds a throwaway SQLite file with expenses for many users (some created from receipts),
+runs ANALYZE so the planner sees realistic statistics, then runs EXPLAIN QUERY PLAN on
+the statement read_models builds for each combination of filters and each sort order.
+A plan fails the check (exit code 1) if it scans expenses or receipts without an index,
+or if a filtered query seeks the expense indexes on username alone and then sorts, i.e.
+reads and sorts every expense the user has. Walking a sort-order index on username alone
+while filtering is allowed, since the LIMIT stops it early.
+Run this from the root of your backend directory.
+"""
+
+import itertools
+import os
+import random
+import sys
+import tempfile
+from datetime import datetime, timedelta, timezone
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+DB_PATH = os.path.join(tempfile.mkdtemp(prefix="check_expense_query_plans_"), "check.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+
+from sqlalchemy import insert, text
+
+from settings.db_settings import SessionLocal, engine
+from db_env import Account, Expense, Receipt
+from migrations import run_migrations
+from categories import CATEGORIES
+import read_models
+
+VENDORS = ["Kroger", "Walmart", "Target", "Costco", "Shell"]
+
+# One value per filter; each combination of these is checked
+FILTERS = {
+    "start": datetime(2024, 1, 1),
+    "end": datetime(2024, 3, 1),
+    "min_price": 10.0,
+    "max_price": 50.0,
+    "category": "Groceries",
+    "repeating": True,
+    "name_prefix": "cof",
+    "vendor": "Kroger",
+}
+
+def seed(users, expenses_per_user):
+    rng = random.Random(7)
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    session = SessionLocal()
+    for u in range(users):
+        username = f"user{u}"
+        session.add(Account(username=username, email=f"{username}@example.com", password="x"))
+        session.flush()
+        receipts = [
+            {"username": username, "vendor": rng.choice(VENDORS), "total": 20.0, "category": "Groceries",
+             "date": now, "timestamp": now}
+            for _ in range(expenses_per_user // 10)
+        ]
+        session.execute(insert(Receipt), receipts)
+        receipt_ids = [row.id for row in session.execute(text("SELECT id FROM receipts WHERE username = :u"), {"u": username})]
+        session.execute(insert(Expense), [
+            {"username": username, "name": rng.choice(["Coffee", "Groceries", "Gas", "Rent", "Lunch"]) + f" {i}",
+             "price": round(rng.uniform(1, 200), 2), "category": rng.choice(CATEGORIES), "repeating": i % 20 == 0,
+             "receipt_id": rng.choice(receipt_ids) if i % 10 == 0 else None,
+             "timestamp": now - timedelta(minutes=rng.randrange(0, 60 * 24 * 730))}
+            for i in range(expenses_per_user)
+        ])
+    session.commit()
+    session.close()
+    with engine.begin() as conn:
+        conn.execute(text("ANALYZE"))
+
+def explain(conn, stmt) -> list:
+    compiled = stmt.compile(dialect=engine.dialect)
+    params = tuple(
+        value.isoformat(" ") if isinstance(value, datetime) else value
+        for value in (compiled.params[name] for name in compiled.positiontup)
+    )
+    return [row[-1] for row in conn.exec_driver_sql("EXPLAIN QUERY PLAN " + str(compiled), params)]
+
+def problems(plan: list, filtered: bool) -> list:
+    found = []
+    sorts = any("TEMP B-TREE" in detail for detail in plan)
+    for detail in plan:
+        # "SCAN expenses USING INDEX ..." walks an index in order; a bare SCAN reads the whole table
+        if detail.startswith("SCAN") and "USING" not in detail and ("expenses" in detail or "receipts" in detail):
+            found.append("full table scan")
+        if filtered and sorts and detail.startswith("SEARCH expenses") and detail.endswith("(username=?)"):
+            found.append("reads and sorts every expense of the user")
+    return found
+
+def main():
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    expenses_per_user = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    run_migrations()
+    seed(users, expenses_per_user)
+
+    sorts = [prefix + key for key in read_models.EXPENSE_SORT_KEYS for prefix in ("", "-")]
+    checked, failures, sorted_in_temp = 0, [], 0
+    with engine.connect() as conn:
+        for size in range(len(FILTERS) + 1):
+            for names in itertools.combinations(FILTERS, size):
+                for sort in sorts:
+                    query = read_models.ExpenseQuery(sort=sort, **{name: FILTERS[name] for name in names})
+                    plan = explain(conn, read_models.expense_statement("user0", 0, 100, query))
+                    checked += 1
+                    found = problems(plan, bool(names))
+                    if found:
+                        failures.append((names, sort, found, plan))
+                    if any("TEMP B-TREE" in detail for detail in plan):
+                        sorted_in_temp += 1
+
+    for names, sort, found, plan in failures:
+        print(f"FAIL filters={','.join(names) or '-'} sort={sort}: {', '.join(found)}")
+        for detail in plan:
+            print(f"    {detail}")
+    print(f"Checked {checked} plans: {checked - len(failures)} seek an index, {len(failures)} don't; "
+          f"{sorted_in_temp} sort the matching rows in a temp b-tree")
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Check that the main endpoints stay within their query budget and issue no repeated
+(per-row or per-day) statements.
+Runs the app in-process with QUERY_PROFILER=raise against a throwaway SQLite file,
+seeds a user with a realistic amount of data (expenses, recurring expenses, earnings,
+inventory, tasks, budgets), then calls each endpoint and reports the query count and
+time from the X-Query-Count and X-Query-Time-MS headers. Receipt line items are
+checked by profiling the inventory update directly, since OCR needs Tesseract.
+A request fails the check (exit code 1) if the profiler raised, i.e. it went over
+QUERY_BUDGET queries or ran one statement shape more than QUERY_REPEAT_LIMIT times.
+Run this from the root of your backend directory.
+"""
+
+import os
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='check_query_budgets_'), 'check.db')}"
+os.environ["QUERY_PROFILER"] = "raise"
+os.environ["SCHEDULER_ENABLED"] = "false"
+
+from fastapi.testclient import TestClient
+
+import main
+import query_profiler
+from migrations import run_migrations
+from settings.db_settings import SessionLocal
+from routes.receipt_scanner import add_items_to_inventory
+
+NAMES = ["Coffee", "Groceries", "Gas", "Rent", "Lunch", "Movie tickets", "Pharmacy", "Parking"]
+
+def call(client, method, path, **kwargs):
+    response = client.request(method, path, **kwargs)
+    if response.status_code >= 400:
+        sys.exit(f"Seeding failed: {method} {path} returned {response.status_code} {response.text[:300]}")
+    return response
+
+def seed(client) -> dict:
+    call(client, "POST", "/register", json={"username": "budget", "password": "pw", "email": "budget@example.com"})
+    token = call(client, "POST", "/login", data={"username": "budget", "password": "pw"}).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    for i in range(60):
+        call(client, "POST", "/expenses", headers=headers, json={
+            "name": f"{NAMES[i % len(NAMES)]} {i}", "price": 3.5 + i,
+            "repeating": i % 10 == 0, "recurrence": ["weekly", "monthly", "yearly"][i % 3] if i % 10 == 0 else None,
+        })
+    for i in range(10):
+        call(client, "POST", "/earnings", headers=headers, json={"cash_tips": 5 * i, "salary": 0, "hours": 4, "hourly_rate": 15})
+    for i in range(20):
+        call(client, "POST", "/inventory", headers=headers, json={"name": f"item {i}", "quantity": 1, "price": 2.5})
+    for i in range(10):
+        call(client, "POST", "/tasks", headers=headers, json={"title": f"task {i}", "repeat_daily": i % 2 == 0})
+    for category in ("Groceries", "Dining", "Transportation"):
+        call(client, "PUT", "/budgets", headers=headers, json={"category": category, "amount": 300})
+    return headers
+
+def check_receipt_items() -> tuple:
+    items = [{"name": f"item {i % 30}", "quantity": 1, "price": 2.0, "confidence": "high"} for i in range(40)]
+    session = SessionLocal()
+    try:
+        with query_profiler.profile("receipt line items") as profile:
+            add_items_to_inventory(session, "budget", items, "Groceries")
+            session.commit()
+        return profile.count, profile.seconds * 1000, None
+    except query_profiler.QueryBudgetExceeded as e:
+        return None, None, str(e)
+    finally:
+        session.close()
+
+def main_check():
+    run_migrations()
+    client = TestClient(main.app, raise_server_exceptions=False)
+    headers = seed(client)
+    requests = [
+        ("GET", "/financial-dashboard"), ("GET", "/expenses"), ("GET", "/expenses?sort=-price&limit=50"),
+        ("GET", "/expenses?category=Dining&name_prefix=co"), ("GET", "/earnings"), ("GET", "/inventory"),
+        ("GET", "/inventory/search?q=item"), ("GET", "/tasks"), ("GET", "/budgets"), ("GET", "/forecast"),
+        ("GET", "/stats/expenses"), ("GET", "/notifications"), ("POST", "/expenses"),
+    ]
+    failures = []
+    for method, path in requests:
+        body = {"name": "Coffee", "price": 4.5} if method == "POST" else None
+        response = client.request(method, path, headers=headers, json=body)
+        count = response.headers.get("x-query-count", "?")
+        elapsed = response.headers.get("x-query-time-ms", "?")
+        ok = response.status_code < 400
+        print(f"{'ok  ' if ok else 'FAIL'} {method:<5} {path:<45} {response.status_code} {count:>3} queries {elapsed:>6} ms")
+        if not ok:
+            failures.append((method, path, response.text[:500]))
+
+    count, elapsed, error = check_receipt_items()
+    if error is None:
+        print(f"ok   {'-':<5} {'receipt line items (40)':<45}     {count:>3} queries {elapsed:>6.1f} ms")
+    else:
+        print(f"FAIL {'-':<5} receipt line items (40)")
+        failures.append(("-", "receipt line items", error))
+
+    for method, path, detail in failures:
+        print(f"\n{method} {path}: {detail}")
+    print(f"\nBudget {query_profiler.QUERY_BUDGET} queries, repeat limit {query_profiler.QUERY_REPEAT_LIMIT}: "
+          f"{len(failures)} failure(s)")
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main_check()
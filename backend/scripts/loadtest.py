@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""
+In-process load test of the main endpoints at several data sizes.
+For each scale tier a fresh SQLite database is seeded with scripts/synthetic_data.py
+(users x expenses per user) and the app is driven through httpx's ASGI transport, so
+the numbers cover routing, middleware, auth, queries and serialization without any
+network or server in between. Each tier runs in its own subprocess so module-level
+state (engine, caches) never leaks from one tier into the next.
+Scenarios, run in order with CONCURRENCY requests in flight, spread over the seeded users:
+- login: POST /login (bcrypt-bound, so it runs fewer requests)
+- dashboard: GET /financial-dashboard
+- list: GET /expenses with the default page, sorted by price and filtered by category
+- create: POST /expenses
+- receipt: POST /upload-receipt with a rendered receipt image (skipped without Tesseract)
+Reports requests/second, mean, p50, p95 and p99 latency and the error count per scenario.
+--output writes the results as JSON (with the commit they were measured at) and
+--compare prints the change against an earlier results file, flagging p95 regressions
+over --threshold percent, so two commits can be compared on the same machine.
+
+    python scripts/loadtest.py [--tiers small,medium] [--requests 500] [--output results.json] [--compare baseline.json]
+
+Run this from the root of your backend directory.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPTS_DIR = os.path.join(BACKEND_DIR, "scripts")
+
+# name -> (users, expenses per user)
+TIERS = {
+    "small": (10, 200),
+    "medium": (100, 1000),
+    "large": (1000, 2000),
+}
+SCENARIOS = ["login", "dashboard", "list", "create", "receipt"]
+# Requests per scenario as a fraction of --requests; login and OCR are orders of magnitude slower
+SCENARIO_SHARE = {"login": 0.1, "receipt": 0.1}
+SEED = 42
+
+def percentile(sorted_values: list, fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+def summarize(latencies: list, errors: int, seconds: float) -> dict:
+    latencies = sorted(latencies)
+    count = len(latencies)
+    return {
+        "requests": count,
+        "errors": errors,
+        "throughput": round(count / seconds, 1) if seconds else 0.0,
+        "mean_ms": round(sum(latencies) / count * 1000, 2) if count else 0.0,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+    }
+
+async def run_scenario(client, make_request, count: int, concurrency: int) -> dict:
+    """Send count requests, at most concurrency at a time; make_request(i) returns the request kwargs."""
+    latencies = []
+    errors = 0
+    next_index = 0
+
+    async def worker():
+        nonlocal errors, next_index
+        while next_index < count:
+            i = next_index
+            next_index += 1
+            kwargs = make_request(i)
+            started = time.perf_counter()
+            try:
+                response = await client.request(**kwargs)
+                failed = response.status_code >= 400
+            except Exception:
+                failed = True
+            latencies.append(time.perf_counter() - started)
+            errors += failed
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, errors, time.perf_counter() - started)
+
+async def run_tier(users: int, expenses_per_user: int, requests: int, concurrency: int, scenarios: list) -> dict:
+    """Seed this process's database and run the scenarios against it. Called in the tier subprocess."""
+    import httpx
+
+    import synthetic_data
+    import main
+    from auth import create_access_token
+    from routes.receipt_scanner import tesseract_available
+
+    started = time.perf_counter()
+    counts = synthetic_data.seed(users, expenses_per_user, SEED)
+    seed_seconds = time.perf_counter() - started
+
+    rng = random.Random(SEED)
+    usernames = [synthetic_data.username_for(i) for i in range(users)]
+    # Logins are measured separately; every other scenario reuses tokens minted up front
+    auth = [{"Authorization": f"Bearer {create_access_token({'sub': username})}"} for username in usernames]
+    receipts = [synthetic_data.receipt_image(rng) for _ in range(20)] if "receipt" in scenarios else []
+
+    def user(i):
+        return rng.randrange(users)
+
+    requests_for = {
+        "login": lambda i: {"method": "POST", "url": "/login",
+                            "data": {"username": usernames[user(i)], "password": synthetic_data.PASSWORD}},
+        "dashboard": lambda i: {"method": "GET", "url": "/financial-dashboard", "headers": auth[user(i)]},
+        "list": lambda i: {"method": "GET", "headers": auth[user(i)],
+                           "url": ["/expenses", "/expenses?sort=-price&limit=50", "/expenses?category=Dining"][i % 3]},
+        "create": lambda i: {"method": "POST", "url": "/expenses", "headers": auth[user(i)],
+                             "json": {"name": rng.choice(synthetic_data.MERCHANTS)[0], "price": round(rng.uniform(2, 80), 2)}},
+        "receipt": lambda i: {"method": "POST", "url": "/upload-receipt", "headers": auth[user(i)],
+                              "files": {"receipt": ("receipt.png", receipts[i % len(receipts)], "image/png")}},
+    }
+
+    results = {"users": users, "expenses_per_user": expenses_per_user, "rows": counts,
+               "seed_seconds": round(seed_seconds, 1), "scenarios": {}}
+    transport = httpx.ASGITransport(app=main.app)
+    async with main.app.router.lifespan_context(main.app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=120) as client:
+            for name in scenarios:
+                if name == "receipt" and not tesseract_available():
+                    print("  receipt: skipped, Tesseract is not available", file=sys.stderr)
+                    continue
+                count = max(concurrency, int(requests * SCENARIO_SHARE.get(name, 1)))
+                # Warm up caches and lazily built state before measuring
+                await run_scenario(client, requests_for[name], min(count, 2 * concurrency), concurrency)
+                results["scenarios"][name] = await run_scenario(client, requests_for[name], count, concurrency)
+                print(f"  {name:<10}{format_result(results['scenarios'][name])}", file=sys.stderr)
+    return results
+
+def format_result(result: dict) -> str:
+    return (f"{result['throughput']:>8.1f} req/s  mean {result['mean_ms']:>7.2f}  p50 {result['p50_ms']:>7.2f}  "
+            f"p95 {result['p95_ms']:>7.2f}  p99 {result['p99_ms']:>7.2f} ms  {result['errors']} errors")
+
+def tier_worker(args):
+    """Entry point of a tier subprocess: point the app at a fresh database, then measure."""
+    directory = tempfile.mkdtemp(prefix="loadtest_")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(directory, 'loadtest.db')}"
+    os.environ["SCHEDULER_ENABLED"] = "false"
+    os.environ.setdefault("QUERY_PROFILER", "off")
+    sys.path.insert(0, BACKEND_DIR)
+    sys.path.insert(0, SCRIPTS_DIR)
+    users, expenses_per_user = TIERS[args.tier]
+    try:
+        results = asyncio.run(run_tier(users, expenses_per_user, args.requests, args.concurrency, args.scenarios.split(",")))
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    with open(args.result_file, "w") as f:
+        json.dump(results, f)
+
+def run_tiers(args) -> dict:
+    tiers = {}
+    for tier in args.tiers.split(","):
+        users, expenses_per_user = TIERS[tier]
+        print(f"{tier}: {users} users x {expenses_per_user} expenses", file=sys.stderr)
+        with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as result_file:
+            path = result_file.name
+        try:
+            subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--tier-worker", tier, "--result-file", path,
+                 "--requests", str(args.requests), "--concurrency", str(args.concurrency), "--scenarios", args.scenarios],
+                cwd=BACKEND_DIR, check=True, stdout=subprocess.DEVNULL,
+            )
+            with open(path) as f:
+                tiers[tier] = json.load(f)
+        finally:
+            os.unlink(path)
+    return tiers
+
+def commit_hash() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def compare(results: dict, baseline: dict, threshold: float) -> int:
+    """Print the change against a baseline results file; returns the number of p95 regressions."""
+    regressions = 0
+    print(f"\nCompared with {baseline.get('commit', 'unknown')} ({baseline.get('timestamp', '?')}):")
+    for tier, tier_results in results["tiers"].items():
+        for name, result in tier_results["scenarios"].items():
+            before = baseline.get("tiers", {}).get(tier, {}).get("scenarios", {}).get(name)
+            if not before or not before["p95_ms"] or not before["throughput"]:
+                continue
+            p95_change = (result["p95_ms"] / before["p95_ms"] - 1) * 100
+            throughput_change = (result["throughput"] / before["throughput"] - 1) * 100
+            regressed = p95_change > threshold
+            regressions += regressed
+            print(f"{'REGRESSED' if regressed else 'ok':<10}{tier:<8}{name:<11}"
+                  f"p95 {before['p95_ms']:>8.2f} -> {result['p95_ms']:>8.2f} ms ({p95_change:+6.1f}%)  "
+                  f"throughput {throughput_change:+6.1f}%")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="In-process load test at several data sizes")
+    parser.add_argument("--tiers", default="small,medium", help=f"comma-separated, from {', '.join(TIERS)}")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--requests", type=int, default=500, help="requests per scenario (login and receipt run 10%%)")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--compare", help="results JSON from an earlier run to compare against")
+    parser.add_argument("--threshold", type=float, default=10.0, help="p95 increase (percent) flagged as a regression")
+    parser.add_argument("--tier-worker", dest="tier", help=argparse.SUPPRESS)
+    parser.add_argument("--result-file", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.tier:
+        tier_worker(args)
+        return
+
+    results = {
+        "commit": commit_hash(),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "tiers": run_tiers(args),
+    }
+
+    print(f"\n{'tier':<8}{'scenario':<11}{'req/s':>13}")
+    for tier, tier_results in results["tiers"].items():
+        for name, result in tier_results["scenarios"].items():
+            print(f"{tier:<8}{name:<11}{format_result(result)}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.output}")
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        sys.exit(1 if regressions else 0)
+
+if __name__ == "__main__":
+    main()
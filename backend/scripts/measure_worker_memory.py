@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Measure gunicorn's memory per worker with and without a preloaded app.
+Starts gunicorn with gunicorn.conf.py twice (GUNICORN_PRELOAD=true, then false) against
+a throwaway SQLite database, warms every worker with requests, and reads each process's
+/proc/<pid>/smaps_rollup:
+- RSS: resident pages, counting shared ones in full (what `ps` and `top` show)
+- PSS: resident pages with shared ones split between the processes sharing them; the
+  sum over master and workers is what the container's memory limit is charged
+- USS: pages private to the process, i.e. what one more worker costs
+Linux only; needs gunicorn and uvicorn installed.
+
+    python scripts/measure_worker_memory.py [workers] [requests_per_worker]
+
+Run this from the root of your backend directory.
+"""
+
+import os
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CONTAINER_LIMIT_MB = 512
+WARM_PATHS = ["/api/debug/connection", "/openapi.json", "/", "/metrics"]
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def children(pid: int) -> list:
+    with open(f"/proc/{pid}/task/{pid}/children") as f:
+        return [int(child) for child in f.read().split()]
+
+def memory(pid: int) -> dict:
+    """RSS, PSS and USS of a process in MB, from smaps_rollup."""
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                fields[parts[0].rstrip(":")] = int(parts[1]) / 1024
+    return {"rss": fields["Rss"], "pss": fields["Pss"], "uss": fields["Private_Clean"] + fields["Private_Dirty"]}
+
+def wait_ready(url: str, process, timeout: float = 60.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            sys.exit(f"gunicorn exited with code {process.returncode}")
+        try:
+            urllib.request.urlopen(url, timeout=1).read()
+            return
+        except OSError:
+            time.sleep(0.2)
+    sys.exit(f"gunicorn did not answer {url} within {timeout:.0f} s")
+
+def measure(preload: bool, workers: int, requests_per_worker: int) -> dict:
+    directory = tempfile.mkdtemp(prefix="worker_memory_")
+    port = free_port()
+    env = dict(
+        os.environ, GUNICORN_PRELOAD=str(preload).lower(), WEB_CONCURRENCY=str(workers),
+        GUNICORN_BIND=f"127.0.0.1:{port}", DATABASE_URL=f"sqlite:///{os.path.join(directory, 'memory.db')}",
+        PROMETHEUS_MULTIPROC_DIR=os.path.join(directory, "prometheus"), SCHEDULER_ENABLED="false",
+    )
+    process = subprocess.Popen([sys.executable, "-m", "gunicorn", "main:app", "--config", "gunicorn.conf.py"],
+                               cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        base = f"http://127.0.0.1:{port}"
+        wait_ready(base + WARM_PATHS[0], process)
+        deadline = time.monotonic() + 30
+        while len(children(process.pid)) < workers and time.monotonic() < deadline:
+            time.sleep(0.2)
+        # Connections are spread over workers by the kernel; enough of them reach every worker
+        for i in range(requests_per_worker * workers):
+            urllib.request.urlopen(base + WARM_PATHS[i % len(WARM_PATHS)], timeout=10).read()
+        time.sleep(1)
+        return {"master": memory(process.pid), "workers": [memory(pid) for pid in children(process.pid)]}
+    finally:
+        process.send_signal(signal.SIGTERM)
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+        shutil.rmtree(directory, ignore_errors=True)
+
+def report(label: str, result: dict) -> float:
+    workers = result["workers"]
+    average = {key: sum(worker[key] for worker in workers) / len(workers) for key in ("rss", "pss", "uss")}
+    total = result["master"]["pss"] + sum(worker["pss"] for worker in workers)
+    print(f"{label:<12}{len(workers):>3} workers  per worker RSS {average['rss']:6.1f}  PSS {average['pss']:6.1f}  "
+          f"USS {average['uss']:6.1f} MB  master PSS {result['master']['pss']:6.1f}  total PSS {total:6.1f} MB")
+    return total
+
+def main():
+    if not os.path.exists("/proc/self/smaps_rollup"):
+        sys.exit("This measurement needs Linux /proc/<pid>/smaps_rollup")
+    workers = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    requests_per_worker = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    totals = {}
+    for preload in (False, True):
+        label = "preloaded" if preload else "per worker"
+        totals[label] = report(label, measure(preload, workers, requests_per_worker))
+    saved = totals["per worker"] - totals["preloaded"]
+    print(f"\nPreloading saves {saved:.1f} MB in total ({saved / workers:.1f} MB per worker); "
+          f"{totals['preloaded']:.1f} of the {CONTAINER_LIMIT_MB} MB container limit in use")
+
+if __name__ == "__main__":
+    main()
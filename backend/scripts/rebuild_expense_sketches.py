@@ -0,0 +1,31 @@
+#!/usr/bin/env python3
+"""
+Rebuild the per-day expense histograms and merchant totals behind /stats/expenses.
+Expense writes keep the sketches up to date incrementally, and a schema migration
+seeds them from older expenses; run this to recompute them after changing timezones.
+Run this from the root of your backend directory.
+"""
+
+import os
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from settings.db_settings import SessionLocal
+from migrations import run_migrations
+import sketches
+
+def main():
+    username = sys.argv[1] if len(sys.argv) > 1 else None
+    run_migrations()
+    session = SessionLocal()
+    try:
+        count = sketches.rebuild_sketches(session, username)
+        session.commit()
+        print(f"Rebuilt expense sketches from {count} expenses")
+    finally:
+        session.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Report what a worker spends its boot time on.
+Starts fresh interpreters against a throwaway SQLite database and times each phase of
+startup: importing the app, applying migrations to a new database, the schema version
+check a worker does once migrations have run, and the app's lifespan startup (with the
+scheduler off). The import is also run under `python -X importtime`, and its cost is
+broken down by top-level package (self time, so nothing is counted twice) and by the
+app's own modules (cumulative). Finally it lists heavy optional modules (OCR, imaging,
+templating) that got imported at startup although only some requests need them.
+Run this from the root of your backend directory.
+"""
+
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from collections import Counter
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Imported on first use; finding one of these at startup is a regression
+LAZY_MODULES = ["PIL", "pytesseract", "jinja2"]
+
+PHASES = """
+import asyncio, json, sys, time
+started = time.perf_counter()
+import main
+imported = time.perf_counter()
+from migrations import run_migrations
+run_migrations()
+migrated = time.perf_counter()
+run_migrations()
+checked = time.perf_counter()
+
+async def lifespan():
+    async with main.app.router.lifespan_context(main.app):
+        return time.perf_counter()
+
+ready = asyncio.run(lifespan())
+print(json.dumps({
+    "import": imported - started, "migrate (new database)": migrated - imported,
+    "migrate (up to date)": checked - migrated, "lifespan startup": ready - checked,
+    "lazy_imported": [name for name in %r if name in sys.modules],
+}))
+""" % (LAZY_MODULES,)
+
+def run(args, database_url):
+    env = dict(os.environ, DATABASE_URL=database_url, SCHEDULER_ENABLED="false", MIGRATE_ON_STARTUP="false")
+    return subprocess.run([sys.executable, *args], cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True)
+
+def parse_importtime(stderr: str) -> list:
+    """(module, self_us, cumulative_us) for each line of -X importtime output."""
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        modules.append((name.strip(), int(self_us), int(cumulative_us)))
+    return modules
+
+def app_modules() -> set:
+    names = set()
+    for root, dirs, files in os.walk(BACKEND_DIR):
+        dirs[:] = [d for d in dirs if d not in ("scripts", "__pycache__", "instance")]
+        package = os.path.relpath(root, BACKEND_DIR).replace(os.sep, ".")
+        for file in files:
+            if file.endswith(".py"):
+                module = file[:-3] if package == "." else f"{package}.{file[:-3]}"
+                names.add(package if module.endswith(".__init__") else module)
+    return names
+
+def main():
+    top = int(sys.argv[1]) if len(sys.argv) > 1 else 15
+    directory = tempfile.mkdtemp(prefix="startup_report_")
+    try:
+        phases = json.loads(run(["-c", PHASES], f"sqlite:///{os.path.join(directory, 'phases.db')}").stdout.splitlines()[-1])
+        modules = parse_importtime(run(["-X", "importtime", "-c", "import main"],
+                                       f"sqlite:///{os.path.join(directory, 'imports.db')}").stderr)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    lazy_imported = phases.pop("lazy_imported")
+    print("Startup phases (fresh interpreter):")
+    for phase, seconds in phases.items():
+        print(f"  {phase:<24}{seconds * 1000:>9.1f} ms")
+
+    total_us = sum(self_us for _, self_us, _ in modules)
+    by_package = Counter()
+    for name, self_us, _ in modules:
+        by_package[name.split(".")[0]] += self_us
+    print(f"\nImport of main: {total_us / 1000:.1f} ms over {len(modules)} modules. By top-level package (self time):")
+    for package, self_us in by_package.most_common(top):
+        print(f"  {package:<32}{self_us / 1000:>9.1f} ms  {self_us / total_us:>5.1%}")
+
+    own = app_modules()
+    print("\nApp modules (cumulative, including what they import first):")
+    for name, _, cumulative_us in sorted((m for m in modules if m[0] in own), key=lambda m: -m[2])[:top]:
+        print(f"  {name:<32}{cumulative_us / 1000:>9.1f} ms")
+
+    if lazy_imported:
+        print(f"\nImported at startup but meant to load lazily: {', '.join(lazy_imported)}")
+    else:
+        print(f"\nNot imported at startup (loaded on first use): {', '.join(LAZY_MODULES)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+Deterministic synthetic data for benchmarks and load tests.
+Seeds N users (user00000, user00001, ...) with a year of realistic data: expenses
+named after real merchants (a few of them recurring), receipts with line items and
+the expenses created from them, earnings, tasks, inventory and monthly budgets. The
+same seed always produces the same rows, with dates relative to today. Rows are bulk
+inserted, then the derived tables (category rollups, sketches, anomaly statistics and
+recurring occurrences) are rebuilt the way the backfill scripts do.
+Every user's password is PASSWORD. receipt_image() renders a receipt with PIL in the
+"Item - qty @ $price" layout the scanner parses, for upload benchmarks.
+
+Seeds the database in DATABASE_URL (the app's default database if unset):
+
+    DATABASE_URL=sqlite:///bench.db python scripts/synthetic_data.py [users] [expenses_per_user] [seed]
+
+Run this from the root of your backend directory.
+"""
+
+import io
+import os
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta, timezone
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from PIL import Image, ImageDraw, ImageFont
+from sqlalchemy import insert, select
+
+from settings.db_settings import SessionLocal, engine
+from db_env import Account, Budget, DailyEarning, Expense, InventoryItem, Receipt, Task, rebuild_category_spend
+from categories import determine_category
+from auth import get_password_hash
+from migrations import run_migrations
+import anomalies
+import budgets
+import scheduler_tasks
+import sketches
+
+PASSWORD = "benchmark-password"
+USERS_PER_BATCH = 100
+
+# (merchant, typical price) pairs; categories come from categories.determine_category
+MERCHANTS = [
+    ("Starbucks", 6), ("Chipotle", 14), ("Burger Bistro", 18), ("Sushi Bar", 32), ("Taco Truck", 9),
+    ("Kroger", 65), ("Trader Joe's", 48), ("Costco", 140), ("Safeway", 55), ("Farmers Market", 25),
+    ("Shell Gas", 45), ("Uber", 22), ("Metro Transit", 3), ("Parking Garage", 12),
+    ("Netflix", 16), ("Spotify", 11), ("Cinema 8 Movie", 15), ("Bowling Alley", 30),
+    ("CVS Pharmacy", 20), ("Dental Clinic", 120), ("Amazon", 35), ("Target", 42), ("Best Buy", 180),
+    ("Barber Shop", 28), ("Fitness Gym", 40), ("Bookstore", 24), ("Corner Shop", 8),
+]
+SUBSCRIPTIONS = [("Netflix", 15.49, "monthly"), ("Spotify", 10.99, "monthly"), ("Internet Comcast", 70.0, "monthly"),
+                 ("Fitness Gym", 40.0, "monthly"), ("Phone Verizon", 65.0, "monthly"), ("Amazon Prime", 139.0, "yearly"),
+                 ("Lawn Care", 35.0, "weekly")]
+RECEIPT_VENDORS = ["Kroger", "Trader Joe's", "Costco", "Safeway", "Target", "Walmart"]
+GROCERIES = [("Milk", 3.49), ("Eggs", 4.29), ("Bread", 2.99), ("Bananas", 1.29), ("Apples", 4.99),
+             ("Chicken Breast", 9.99), ("Rice", 3.79), ("Pasta", 1.99), ("Tomato Sauce", 2.49), ("Cheddar", 5.49),
+             ("Greek Yogurt", 5.99), ("Coffee Beans", 11.99), ("Olive Oil", 8.99), ("Spinach", 3.99),
+             ("Orange Juice", 4.49), ("Butter", 4.79), ("Cereal", 4.99), ("Peanut Butter", 3.89)]
+TASKS = ["Check budget", "Log receipts", "Pay rent", "Review subscriptions", "Transfer to savings",
+         "Meal prep", "Pack lunch", "Compare grocery prices"]
+
+def username_for(index: int) -> str:
+    return f"user{index:05d}"
+
+def _expense_rows(rng, username, count, now):
+    rows = []
+    for name, price, recurrence in rng.sample(SUBSCRIPTIONS, k=min(len(SUBSCRIPTIONS), max(1, count // 100))):
+        rows.append({"username": username, "name": name, "price": price, "category": determine_category(name, ""),
+                     "repeating": True, "recurrence": recurrence,
+                     "timestamp": now - timedelta(days=rng.randrange(30, 365))})
+    while len(rows) < count:
+        merchant, typical = rng.choice(MERCHANTS)
+        price = round(max(1.0, rng.lognormvariate(0, 0.4) * typical), 2)
+        rows.append({"username": username, "name": merchant, "price": price,
+                     "category": determine_category(merchant, ""), "repeating": False,
+                     "timestamp": now - timedelta(minutes=rng.randrange(0, 60 * 24 * 365))})
+    return rows
+
+def _receipt_rows(rng, username, count, now):
+    rows = []
+    for _ in range(count):
+        vendor = rng.choice(RECEIPT_VENDORS)
+        items = [{"name": name, "quantity": rng.randint(1, 3), "price": price, "confidence": "high"}
+                 for name, price in rng.sample(GROCERIES, k=rng.randint(3, 10))]
+        total = round(sum(item["quantity"] * item["price"] for item in items), 2)
+        when = (now - timedelta(days=rng.randrange(0, 365))).replace(hour=0, minute=0, second=0, microsecond=0)
+        rows.append({"username": username, "vendor": vendor, "total": total, "items": items,
+                     "category": determine_category("", vendor), "date": when, "timestamp": when,
+                     "processed_data": {"vendor_address": "", "payment_method": "Credit card", "confidence": "high"}})
+    return rows
+
+def seed(users: int, expenses_per_user: int, seed: int = 42, start: int = 0) -> dict:
+    """Insert users start .. start+users-1 and their data. Returns row counts."""
+    run_migrations()
+    rng = random.Random(seed * 1000003 + start)
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    today = now.date()
+    password = get_password_hash(PASSWORD)  # Hashed once: bcrypt is deliberately slow
+    counts = dict.fromkeys(("users", "expenses", "receipts", "earnings", "tasks", "inventory", "budgets"), 0)
+    session = SessionLocal()
+    try:
+        for batch_start in range(start, start + users, USERS_PER_BATCH):
+            usernames = [username_for(i) for i in range(batch_start, min(start + users, batch_start + USERS_PER_BATCH))]
+            session.execute(insert(Account), [
+                {"username": u, "email": f"{u}@example.com", "password": password, "spending_limit": 100.0,
+                 "monthly_savings_goal": 500.0, "data_version": 0,
+                 "timezone": rng.choice(["America/New_York", "America/Chicago", "America/Los_Angeles", "Europe/London"])}
+                for u in usernames
+            ])
+            receipts = [row for u in usernames for row in _receipt_rows(rng, u, max(1, expenses_per_user // 20), now)]
+            session.execute(insert(Receipt), receipts)
+            expenses = [row for u in usernames for row in _expense_rows(rng, u, expenses_per_user - expenses_per_user // 20, now)]
+            # Each receipt created an expense linked to it, as upload_receipt does
+            for receipt in session.execute(
+                select(Receipt.id, Receipt.username, Receipt.vendor, Receipt.total, Receipt.date, Receipt.category)
+                .where(Receipt.username.in_(usernames))
+            ):
+                expenses.append({"username": receipt.username, "name": f"Receipt: {receipt.vendor}",
+                                 "price": receipt.total, "category": receipt.category, "receipt_id": receipt.id,
+                                 "repeating": False, "timestamp": receipt.date})
+            session.execute(insert(Expense), expenses)
+            session.execute(insert(DailyEarning), [
+                {"username": u, "hourly_rate": 18.0, "hours": rng.choice([4, 6, 8]), "cash_tips": round(rng.uniform(0, 80), 2),
+                 "salary": 0.0, "timestamp": now - timedelta(days=day)}
+                for u in usernames for day in range(0, 365, 3)
+            ])
+            session.execute(insert(Task), [
+                {"username": u, "title": title, "is_complete": rng.random() < 0.3, "repeat_daily": i % 2 == 0,
+                 "timestamp": now - timedelta(days=rng.randrange(0, 60))}
+                for u in usernames for i, title in enumerate(rng.sample(TASKS, k=5))
+            ])
+            session.execute(insert(InventoryItem), [
+                {"username": u, "name": name, "category": "Groceries", "quantity": float(rng.randint(0, 6)),
+                 "price": price, "timestamp": now - timedelta(days=rng.randrange(0, 90))}
+                for u in usernames for name, price in rng.sample(GROCERIES, k=12)
+            ])
+            month = budgets.month_start(today)
+            session.execute(insert(Budget), [
+                {"username": u, "category": category, "month": month, "amount": amount}
+                for u in usernames for category, amount in (("Groceries", 400.0), ("Dining", 250.0), ("Transportation", 150.0))
+            ])
+            session.commit()
+            counts["users"] += len(usernames)
+            counts["expenses"] += len(expenses)
+            counts["receipts"] += len(receipts)
+            counts["earnings"] += len(usernames) * len(range(0, 365, 3))
+            counts["tasks"] += len(usernames) * 5
+            counts["inventory"] += len(usernames) * 12
+            counts["budgets"] += len(usernames) * 3
+
+        # Derived tables, rebuilt from the raw rows like the backfill scripts do
+        with engine.begin() as conn:
+            rebuild_category_spend(conn)
+        sketches.rebuild_sketches(session)
+        anomalies.rebuild_stats(session)
+        session.commit()
+    finally:
+        session.close()
+    scheduler_tasks.extend_recurring_expenses()
+    return counts
+
+def receipt_lines(rng: random.Random, when: date = None) -> list:
+    when = when or date.today()
+    items = [(name, rng.randint(1, 3), price) for name, price in rng.sample(GROCERIES, k=rng.randint(3, 8))]
+    total = sum(quantity * price for _, quantity, price in items)
+    return ([rng.choice(RECEIPT_VENDORS), "123 Main Street", f"Date: {when.strftime('%m/%d/%Y')}", ""]
+            + [f"{name} - {quantity} @ ${price:.2f}" for name, quantity, price in items]
+            + ["", f"Total: ${total:.2f}", "Credit card"])
+
+def render_receipt(lines: list) -> bytes:
+    """A receipt as a PNG: dark text on a white strip, roughly what a phone scan looks like after cropping."""
+    try:
+        font = ImageFont.load_default(size=28)
+    except TypeError:  # Pillow < 10.1 has only the fixed bitmap font
+        font = ImageFont.load_default()
+    line_height = 40
+    image = Image.new("L", (640, 60 + line_height * len(lines)), color=255)
+    draw = ImageDraw.Draw(image)
+    for i, line in enumerate(lines):
+        draw.text((30, 30 + i * line_height), line, fill=0, font=font)
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+def receipt_image(rng: random.Random, when: date = None) -> bytes:
+    return render_receipt(receipt_lines(rng, when))
+
+def main():
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    expenses_per_user = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    seed_value = int(sys.argv[3]) if len(sys.argv) > 3 else 42
+    started = time.perf_counter()
+    counts = seed(users, expenses_per_user, seed_value)
+    print(f"Seeded {engine.url} in {time.perf_counter() - started:.1f} s: "
+          + ", ".join(f"{count} {name}" for name, count in counts.items()))
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,26 @@
+import os
 from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
+from metrics import TimedQueuePool, instrument_engine
+import query_profiler
+
 # Database settings
-SQLALCHEMY_DATABASE_URL = "sqlite:///./instance/financial_data.db"
+SQLALCHEMY_DATABASE_URL = os.environ.get("DATABASE_URL", "sqlite:///./instance/financial_data.db")
+IS_SQLITE = SQLALCHEMY_DATABASE_URL.startswith("sqlite")
+# In-memory SQLite needs its single shared connection; everything else gets the default
+# QueuePool, timed so /metrics can report how long requests wait for a connection
+IS_MEMORY = IS_SQLITE and SQLALCHEMY_DATABASE_URL in ("sqlite://", "sqlite:///:memory:")
 
 # Create engine and session
 engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
+    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False} if IS_SQLITE else {},
+    **({} if IS_MEMORY else {"poolclass": TimedQueuePool})
 )
+instrument_engine(engine)
+# Per-request query counts and N+1 detection when QUERY_PROFILER is set (development only)
+query_profiler.install(engine)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 # Create base class for SQLAlchemy models
@@ -0,0 +1,143 @@
+# This file implements request coalescing (single-flight) for expensive computations.
+# Concurrent calls with the same key share one in-flight future instead of each
+# running the computation; only the first caller (the leader) does the work.
+
+import asyncio
+import threading
+from concurrent.futures import Future
+from functools import wraps
+from typing import Any, Awaitable, Callable, Hashable, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+class _Abandoned(Exception):
+    """The shared run stopped without a result (its leader was interrupted); waiters run it again."""
+
+class SingleFlight:
+    """Coalesce concurrent calls that share a key onto a single execution.
+
+    Only an Exception from the work is shared with the waiters. Async work runs in its
+    own task and is awaited through asyncio.shield, so a caller that is cancelled (its
+    client disconnected, say) stops waiting without cancelling the work for the others.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._in_flight = {}
+        self._tasks = set()
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.coalesced = 0
+
+    def _join(self, key: Hashable):
+        """Return (future, is_leader) for a key, registering a new future if none is in flight."""
+        with self._lock:
+            self.calls += 1
+            future = self._in_flight.get(key)
+            if future is not None:
+                self.coalesced += 1
+                return future, False
+            future = Future()
+            self._in_flight[key] = future
+            return future, True
+
+    def _finish(self, key: Hashable, future: Future, result: Any = None, error: BaseException = None):
+        with self._lock:
+            self._in_flight.pop(key, None)
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """Run fn for key from a worker thread, or wait for the in-flight run to finish."""
+        while True:
+            future, leader = self._join(key)
+            if not leader:
+                try:
+                    return future.result()
+                except _Abandoned:
+                    continue
+            try:
+                result = fn()
+            except Exception as e:
+                self._finish(key, future, error=e)
+                raise
+            except BaseException:
+                self._finish(key, future, error=_Abandoned())
+                raise
+            self._finish(key, future, result)
+            return result
+
+    async def do_async(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """Like do(), for the event loop: the blocking fn runs in the threadpool."""
+        result, _ = await self._shared(key, lambda: run_in_threadpool(fn))
+        return result
+
+    async def do_coroutine(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """Await fn() for key on the event loop, or wait for the in-flight run; returns (result, is_leader)."""
+        return await self._shared(key, fn)
+
+    async def _shared(self, key: Hashable, start: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        while True:
+            future, leader = self._join(key)
+            if leader:
+                task = asyncio.ensure_future(start())
+                self._tasks.add(task)  # The loop only holds weak references to tasks
+                task.add_done_callback(lambda done, future=future: self._settle(key, future, done))
+            try:
+                return await asyncio.shield(asyncio.wrap_future(future)), leader
+            except _Abandoned:
+                continue
+
+    def _settle(self, key: Hashable, future: Future, task: asyncio.Task):
+        self._tasks.discard(task)
+        error = None if task.cancelled() else task.exception()
+        if task.cancelled() or (error is not None and not isinstance(error, Exception)):
+            self._finish(key, future, error=_Abandoned())
+        elif error is not None:
+            self._finish(key, future, error=error)
+        else:
+            self._finish(key, future, task.result())
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "coalesced": self.coalesced,
+                "in_flight": len(self._in_flight),
+                "coalesced_rate": round(self.coalesced / self.calls, 4) if self.calls else 0.0
+            }
+
+_flights = {}
+_flights_lock = threading.Lock()
+
+def get_flight(name: str) -> SingleFlight:
+    with _flights_lock:
+        flight = _flights.get(name)
+        if flight is None:
+            flight = _flights[name] = SingleFlight(name)
+        return flight
+
+def coalesced(name: str, key: Callable[..., Hashable] = None):
+    """Decorator that coalesces concurrent calls of a function with the same key.
+
+    key(*args, **kwargs) maps a call to its key; without it, calls coalesce only when
+    their arguments are identical.
+    """
+    flight = get_flight(name)
+
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            call_key = key(*args, **kwargs) if key is not None else (args, tuple(sorted(kwargs.items())))
+            return flight.do(call_key, lambda: fn(*args, **kwargs))
+        wrapper.flight = flight
+        return wrapper
+    return decorator
+
+def stats() -> dict:
+    """Per-flight call and coalescing counters."""
+    with _flights_lock:
+        flights = list(_flights.values())
+    return {flight.name: flight.stats() for flight in flights}
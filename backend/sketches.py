@@ -0,0 +1,197 @@
+# This file maintains mergeable per-user, per-day spending sketches behind /stats/expenses.
+# Every expense write adds to one fixed, log-spaced histogram bucket for its local day and
+# to the day's total for its merchant (upserts, so O(1) per write). Daily sketches merge
+# by plain addition, so any date window is answered with two grouped range queries over
+# at most a few rows per day, however many expenses it covers. Percentiles read off the
+# merged histogram are within BUCKET_RELATIVE_ERROR of the exact value.
+
+import math
+from datetime import date
+from typing import List, Optional, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from db_env import Account, Expense, ExpenseHistogramBucket, MerchantDailyTotal
+import timeframes
+
+# Bucket i holds amounts in (GAMMA^(i-1), GAMMA^i]
+GAMMA = 1.05
+BUCKET_RELATIVE_ERROR = (GAMMA - 1) / (GAMMA + 1)  # About 2.4%
+MIN_AMOUNT = 0.01  # Zero and negative amounts share the lowest bucket
+# Fine buckets merged per reported histogram bin; GAMMA^14 is about 2, so bins roughly double
+HISTOGRAM_GROUP = 14
+MERCHANT_MAX_LENGTH = 100
+
+_LOG_GAMMA = math.log(GAMMA)
+
+def bucket_index(amount: float) -> int:
+    return math.ceil(math.log(max(amount, MIN_AMOUNT)) / _LOG_GAMMA)
+
+def bucket_value(index: int) -> float:
+    """Representative amount of a bucket (minimizes the worst-case relative error)."""
+    return 2 * GAMMA ** index / (GAMMA + 1)
+
+def merchant_name(expense: Expense) -> str:
+    name = (expense.name or "").strip()
+    if name.startswith("Receipt: "):
+        name = name[len("Receipt: "):].strip()
+    return (name or "Unknown")[:MERCHANT_MAX_LENGTH]
+
+def expense_sample(expense: Expense, tz_name: Optional[str] = None) -> Optional[Tuple[date, float, str]]:
+    """The (local day, amount, merchant) an expense contributes to the sketches, or None."""
+    if expense.price is None or expense.timestamp is None:
+        return None
+    return timeframes.local_today(tz_name, expense.timestamp), float(expense.price), merchant_name(expense)
+
+def upsert_totals(db: Session, model, keys: dict, count: int, amount: float):
+    """Add count and amount to a (count, total) rollup row, creating it if missing."""
+    dialect = db.get_bind().dialect.name
+    if dialect not in ("sqlite", "postgresql"):
+        # No portable upsert; fall back to read-modify-write
+        row = db.get(model, tuple(keys.values()))
+        if row is None:
+            db.add(model(**keys, count=count, total=amount))
+        else:
+            row.count += count
+            row.total += amount
+        return
+    insert = sqlite_insert if dialect == "sqlite" else postgresql_insert
+    table = model.__table__
+    stmt = insert(table).values(**keys, count=count, total=amount)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=list(keys),
+        set_={"count": table.c.count + stmt.excluded.count, "total": table.c.total + stmt.excluded.total}
+    )
+    db.execute(stmt)
+
+def _apply(db: Session, username: str, sample: Tuple[date, float, str], sign: int):
+    day, amount, merchant = sample
+    upsert_totals(db, ExpenseHistogramBucket, {"username": username, "day": day, "bucket": bucket_index(amount)},
+            sign, sign * amount)
+    upsert_totals(db, MerchantDailyTotal, {"username": username, "day": day, "merchant": merchant},
+            sign, sign * amount)
+
+def record_expense(db: Session, expense: Expense, tz_name: Optional[str] = None,
+                   previous: Optional[Tuple[date, float, str]] = None):
+    """Add an expense write to its day's sketches, first removing its previous sample on updates."""
+    sample = expense_sample(expense, tz_name)
+    if sample == previous:
+        return
+    if previous is not None:
+        _apply(db, expense.username, previous, -1)
+    if sample is not None:
+        _apply(db, expense.username, sample, 1)
+
+def forget_expense(db: Session, expense: Expense, tz_name: Optional[str] = None):
+    sample = expense_sample(expense, tz_name)
+    if sample is not None:
+        _apply(db, expense.username, sample, -1)
+
+def _percentile(buckets: List[Tuple[int, int]], count: int, q: float) -> Optional[float]:
+    if count <= 0:
+        return None
+    rank = q * (count - 1)
+    seen = 0
+    for index, bucket_count in buckets:
+        seen += bucket_count
+        if seen > rank:
+            return round(bucket_value(index), 2)
+    return round(bucket_value(buckets[-1][0]), 2)
+
+def expense_stats(db: Session, username: str, start: date, end: date, top: int = 10) -> dict:
+    """Percentiles, a histogram and top merchants for start <= day <= end, from the daily sketches."""
+    buckets = [
+        (index, count, total)
+        for index, count, total in db.connection().execute(
+            select(ExpenseHistogramBucket.bucket, func.sum(ExpenseHistogramBucket.count),
+                   func.sum(ExpenseHistogramBucket.total))
+            .where(
+                ExpenseHistogramBucket.username == username,
+                ExpenseHistogramBucket.day >= start,
+                ExpenseHistogramBucket.day <= end
+            )
+            .group_by(ExpenseHistogramBucket.bucket)
+            .order_by(ExpenseHistogramBucket.bucket)
+        )
+        if count > 0
+    ]
+    count = sum(row[1] for row in buckets)
+    total = sum(row[2] for row in buckets)
+
+    histogram = {}
+    for index, bucket_count, bucket_total in buckets:
+        group = math.floor(index / HISTOGRAM_GROUP)
+        entry = histogram.setdefault(group, [0, 0.0])
+        entry[0] += bucket_count
+        entry[1] += bucket_total
+
+    merchant_total = func.sum(MerchantDailyTotal.total)
+    merchants = db.connection().execute(
+        select(MerchantDailyTotal.merchant, func.sum(MerchantDailyTotal.count), merchant_total)
+        .where(
+            MerchantDailyTotal.username == username,
+            MerchantDailyTotal.day >= start,
+            MerchantDailyTotal.day <= end
+        )
+        .group_by(MerchantDailyTotal.merchant)
+        .having(func.sum(MerchantDailyTotal.count) > 0)
+        .order_by(merchant_total.desc())
+        .limit(top)
+    ).all()
+
+    ranked = [(index, bucket_count) for index, bucket_count, _ in buckets]
+    return {
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "count": count,
+        "total": round(total, 2),
+        "mean": round(total / count, 2) if count else None,
+        "percentiles": {f"p{int(q * 100)}": _percentile(ranked, count, q) for q in (0.5, 0.9, 0.99)},
+        "histogram": [
+            {
+                "min": round(GAMMA ** (group * HISTOGRAM_GROUP - 1), 2),
+                "max": round(GAMMA ** ((group + 1) * HISTOGRAM_GROUP - 1), 2),
+                "count": entry[0],
+                "total": round(entry[1], 2)
+            }
+            for group, entry in sorted(histogram.items())
+        ],
+        "topMerchants": [
+            {"merchant": merchant, "count": merchant_count, "total": round(merchant_sum, 2)}
+            for merchant, merchant_count, merchant_sum in merchants
+        ]
+    }
+
+def rebuild_sketches(db: Session, username: Optional[str] = None) -> int:
+    """Recompute sketches from raw expenses (e.g. for expenses written before sketches existed)."""
+    histogram_query = db.query(ExpenseHistogramBucket)
+    merchant_query = db.query(MerchantDailyTotal)
+    expenses = db.query(Expense, Account.timezone).join(Account, Account.username == Expense.username)
+    if username is not None:
+        histogram_query = histogram_query.filter(ExpenseHistogramBucket.username == username)
+        merchant_query = merchant_query.filter(MerchantDailyTotal.username == username)
+        expenses = expenses.filter(Expense.username == username)
+    histogram_query.delete(synchronize_session=False)
+    merchant_query.delete(synchronize_session=False)
+
+    histograms, merchants = {}, {}
+    count = 0
+    for expense, tz_name in expenses.yield_per(1000):
+        sample = expense_sample(expense, tz_name)
+        if sample is None:
+            continue
+        day, amount, merchant = sample
+        for totals, key in ((histograms, (expense.username, day, bucket_index(amount))),
+                            (merchants, (expense.username, day, merchant))):
+            entry = totals.setdefault(key, [0, 0.0])
+            entry[0] += 1
+            entry[1] += amount
+        count += 1
+    db.add_all(ExpenseHistogramBucket(username=u, day=d, bucket=b, count=c, total=t)
+               for (u, d, b), (c, t) in histograms.items())
+    db.add_all(MerchantDailyTotal(username=u, day=d, merchant=m, count=c, total=t)
+               for (u, d, m), (c, t) in merchants.items())
+    return count
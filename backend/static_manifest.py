@@ -0,0 +1,186 @@
+# This file contains the in-memory manifest the frontend is served from.
+# The Next.js export (out/), build (.next/static) and public/ trees are walked once at
+# startup into a route -> file map holding each file's stat result, ETag, media type,
+# cache policy and any pre-compressed .br/.gz siblings, so serving a frontend request
+# is a dict lookup followed by sending the file, with no stat calls on the request path.
+# Small files are kept in memory; larger ones are sent with the server's zero-copy
+# extension when it offers one. The frontend must be rebuilt before the server starts
+# (or the server restarted after a rebuild) for new files to be picked up.
+
+import mimetypes
+import os
+import re
+import stat
+from dataclasses import dataclass
+from email.utils import formatdate
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+
+from responses import accepts_encoding
+
+# Files up to this size are read into memory at startup and served from there
+STATIC_INLINE_MAX_BYTES = int(os.environ.get("STATIC_INLINE_MAX_BYTES", str(64 * 1024)))
+# Upper bound on the memory used by inlined files; the rest are sent from disk
+STATIC_INLINE_BUDGET_BYTES = int(os.environ.get("STATIC_INLINE_BUDGET_BYTES", str(32 * 1024 * 1024)))
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "no-cache"
+
+# Pre-compressed siblings, in order of preference: (Content-Encoding, file suffix)
+PRECOMPRESSED = (("br", ".br"), ("gzip", ".gz"))
+# Content hashes in build output file names, e.g. main-3f9a2b1c4d5e6f70.js or 9a8b7c6d.css
+HASHED_NAME = re.compile(r"(^|[.\-_])[0-9a-f]{8,}\.[A-Za-z0-9]+$")
+# Routes under these are files, never pages: a miss is a 404, not the SPA fallback
+ASSET_PREFIXES = ("static/", "out/", "public/", "_next/")
+
+@dataclass(frozen=True, slots=True)
+class StaticFile:
+    path: str
+    stat_result: os.stat_result
+    etag: str
+    last_modified: str
+    body: Optional[bytes] = None
+
+@dataclass(frozen=True, slots=True)
+class StaticAsset:
+    media_type: str
+    cache_control: str
+    identity: StaticFile
+    encoded: Tuple[Tuple[str, StaticFile], ...] = ()
+
+class SendfileResponse(FileResponse):
+    """FileResponse that hands whole-file sends to the server's zero-copy extension when offered."""
+
+    async def __call__(self, scope, receive, send):
+        if ("http.response.zerocopysend" in scope.get("extensions", {}) and scope["method"] == "GET"
+                and b"range" not in dict(scope["headers"])):
+            await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+            with open(self.path, "rb") as file:
+                await send({"type": "http.response.zerocopysend", "file": file.fileno()})
+            return
+        await super().__call__(scope, receive, send)
+
+class StaticManifest:
+    """Route -> StaticAsset map built from the frontend directories."""
+
+    def __init__(self):
+        self.routes: Dict[str, StaticAsset] = {}
+        self.index: Optional[StaticAsset] = None
+        self.fallback: Optional[StaticAsset] = None
+        self.inlined_bytes = 0
+        self._assets: Dict[str, StaticAsset] = {}
+
+    def __len__(self):
+        return len(self._assets)
+
+    def add_tree(self, root: Path, prefix: str = "", html_routes: bool = False, immutable: bool = False):
+        """Add every file under root as prefix + its relative path (and without .html when html_routes)."""
+        for dirpath, _, filenames in os.walk(root):
+            names = set(filenames)
+            for name in sorted(filenames):
+                # Pre-compressed siblings are served through the file they compress
+                if any(name.endswith(suffix) and name[:-len(suffix)] in names for _, suffix in PRECOMPRESSED):
+                    continue
+                path = os.path.join(dirpath, name)
+                relative = Path(path).relative_to(root).as_posix()
+                hashed = relative.startswith("_next/static/") or HASHED_NAME.search(name) is not None
+                asset = self.load(path, immutable or hashed)
+                if asset is None:
+                    continue
+                self.routes[prefix + relative] = asset
+                if html_routes and name.endswith(".html"):
+                    route = relative[:-len(".html")]
+                    self.routes.setdefault(prefix + route, asset)
+                    if name == "index.html" and route != "index":
+                        # about/index.html also answers about and about/
+                        self.routes.setdefault(prefix + route[:-len("index")], asset)
+                        self.routes.setdefault(prefix + route[:-len("/index")], asset)
+
+    def load(self, path: str, immutable: bool) -> Optional[StaticAsset]:
+        if path in self._assets:
+            return self._assets[path]
+        identity = self._file(path)
+        if identity is None:
+            return None
+        encoded = tuple(
+            (encoding, variant) for encoding, variant in
+            ((encoding, self._file(path + suffix)) for encoding, suffix in PRECOMPRESSED)
+            if variant is not None
+        )
+        media_type = mimetypes.guess_type(path)[0] or "text/plain"
+        cache_control = IMMUTABLE_CACHE_CONTROL if immutable else REVALIDATE_CACHE_CONTROL
+        asset = self._assets[path] = StaticAsset(media_type, cache_control, identity, encoded)
+        return asset
+
+    def _file(self, path: str) -> Optional[StaticFile]:
+        try:
+            stat_result = os.stat(path)
+        except OSError:
+            return None
+        if not stat.S_ISREG(stat_result.st_mode):
+            return None
+        body = None
+        size = stat_result.st_size
+        if size <= STATIC_INLINE_MAX_BYTES and self.inlined_bytes + size <= STATIC_INLINE_BUDGET_BYTES:
+            with open(path, "rb") as file:
+                body = file.read()
+            self.inlined_bytes += size
+        etag = f'"{size:x}-{stat_result.st_mtime_ns:x}"'
+        return StaticFile(path, stat_result, etag, formatdate(stat_result.st_mtime, usegmt=True), body)
+
+    def lookup(self, route: str) -> Optional[StaticAsset]:
+        """The asset for a request path (without the leading slash), else the SPA fallback for page routes."""
+        asset = self.routes.get(route)
+        if asset is not None or route.startswith(ASSET_PREFIXES):
+            return asset
+        return self.fallback
+
+    def response(self, asset: StaticAsset, request_headers: Headers) -> Response:
+        file, encoding = asset.identity, None
+        if asset.encoded:
+            accept = request_headers.get("accept-encoding", "")
+            for candidate, variant in asset.encoded:
+                if accepts_encoding(accept, candidate):
+                    file, encoding = variant, candidate
+                    break
+
+        headers = {"ETag": file.etag, "Last-Modified": file.last_modified, "Cache-Control": asset.cache_control}
+        if asset.encoded:
+            headers["Vary"] = "Accept-Encoding"
+
+        if_none_match = request_headers.get("if-none-match")
+        if if_none_match and (if_none_match.strip() == "*" or file.etag in
+                              (tag.strip().removeprefix("W/") for tag in if_none_match.split(","))):
+            return Response(status_code=304, headers=headers)
+        if encoding:
+            headers["Content-Encoding"] = encoding
+        if file.body is not None:
+            return Response(file.body, media_type=asset.media_type, headers=headers)
+        return SendfileResponse(file.path, headers=headers, media_type=asset.media_type, stat_result=file.stat_result)
+
+def build_frontend_manifest(frontend_dir: Path) -> StaticManifest:
+    """Scan the frontend build output into a manifest; call once at startup."""
+    manifest = StaticManifest()
+    next_dir = frontend_dir / ".next"
+    out_dir = frontend_dir / "out"
+    public_dir = frontend_dir / "public"
+
+    # Everything under .next/static is content-addressed by the build id or a hash
+    if (next_dir / "static").is_dir():
+        manifest.add_tree(next_dir / "static", "static/", immutable=True)
+    if out_dir.is_dir():
+        # Exported pages are served at the root (about -> about.html) and under /out
+        manifest.add_tree(out_dir, "", html_routes=True)
+        manifest.add_tree(out_dir, "out/")
+        manifest.fallback = manifest.routes.get("index.html")
+    if public_dir.is_dir():
+        manifest.add_tree(public_dir, "public/")
+
+    for index_path in (next_dir / "server" / "pages" / "index.html", out_dir / "index.html", public_dir / "index.html"):
+        if index_path.is_file():
+            manifest.index = manifest.load(str(index_path), immutable=False)
+            break
+    return manifest
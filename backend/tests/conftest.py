@@ -0,0 +1,40 @@
+# Shared fixtures: the app runs against a throwaway SQLite database with the scheduler
+# off, and every test gets its own registered user.
+import os
+import shutil
+import sys
+import tempfile
+import uuid
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATABASE_DIR = tempfile.mkdtemp(prefix="budget_tests_")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(DATABASE_DIR, 'test.db')}"
+os.environ["SCHEDULER_ENABLED"] = "false"
+sys.path.insert(0, BACKEND_DIR)
+
+from fastapi.testclient import TestClient
+
+import main
+from auth import create_access_token
+from settings.db_settings import engine
+
+@pytest.fixture(scope="session")
+def client():
+    with TestClient(main.app) as test_client:
+        yield test_client
+    engine.dispose()
+    shutil.rmtree(DATABASE_DIR, ignore_errors=True)
+
+@pytest.fixture
+def username(client):
+    name = f"user_{uuid.uuid4().hex[:8]}"
+    response = client.post("/register", json={"username": name, "password": "test-password",
+                                              "email": f"{name}@example.com"})
+    assert response.status_code == 200, response.text
+    return name
+
+@pytest.fixture
+def headers(username):
+    return {"Authorization": f"Bearer {create_access_token({'sub': username})}"}
@@ -0,0 +1,29 @@
+import asyncio
+
+import httpx
+from sqlalchemy import select
+
+import main
+from db_env import CategoryStat
+from settings.db_settings import engine
+
+EXPENSES = 8
+
+def test_concurrent_first_expenses_in_a_category_all_count(client, username, headers):
+    async def post_all():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as async_client:
+            return await asyncio.gather(*(
+                async_client.post("/expenses", headers=headers, json={"name": "Groceries", "price": 10.0 + i,
+                                                                      "category": "Groceries"})
+                for i in range(EXPENSES)
+            ))
+
+    responses = asyncio.run(post_all())
+
+    assert [response.status_code for response in responses] == [200] * EXPENSES
+    with engine.connect() as conn:
+        stat = conn.execute(select(CategoryStat.__table__).where(
+            CategoryStat.username == username, CategoryStat.category == "Groceries")).one()
+    assert stat.count == EXPENSES
+    assert abs(stat.mean - (10.0 + (EXPENSES - 1) / 2)) < 1e-9
@@ -0,0 +1,48 @@
+from datetime import datetime, timezone
+
+from sqlalchemy import select, update
+
+from db_env import CategorySpend, Expense, rebuild_category_spend
+from settings.db_settings import engine
+
+def spend_rows(username):
+    with engine.connect() as conn:
+        return conn.execute(select(CategorySpend.month, CategorySpend.count, CategorySpend.total)
+                            .where(CategorySpend.username == username)).all()
+
+def groceries(client, headers, month=None):
+    params = {"month": month} if month else {}
+    response = client.get("/budgets", headers=headers, params=params)
+    assert response.status_code == 200
+    return next((row for row in response.json()["budgetCategories"] if row["category"] == "Groceries"), None)
+
+def test_rollup_follows_expense_writes(client, headers):
+    assert client.put("/budgets", headers=headers, json={"category": "Groceries", "amount": 100.0}).status_code == 200
+    ids = [client.post("/expenses", headers=headers,
+                       json={"name": "Corner Market", "price": price, "category": "Groceries"}).json()["id"]
+           for price in (20.0, 30.0)]
+    assert groceries(client, headers) == {"category": "Groceries", "budgeted": 100.0, "spent": 50.0,
+                                          "remaining": 50.0, "percentage": 50.0}
+
+    assert client.put(f"/expenses/{ids[0]}", headers=headers, json={"price": 45.0}).status_code == 200
+    assert groceries(client, headers)["spent"] == 75.0
+    assert client.delete(f"/expenses/{ids[1]}", headers=headers).status_code == 200
+    assert groceries(client, headers)["spent"] == 45.0
+
+def test_timezone_change_moves_spending_across_the_month_boundary(client, username, headers):
+    assert client.put("/account/timezone", headers=headers, json={"timezone": "UTC"}).status_code == 200
+    expense_id = client.post("/expenses", headers=headers,
+                             json={"name": "Corner Market", "price": 20.0, "category": "Groceries"}).json()["id"]
+    # Late on January 31st in UTC, already February 1st in Kiritimati (UTC+14)
+    with engine.begin() as conn:
+        conn.execute(update(Expense.__table__).where(Expense.id == expense_id)
+                     .values(timestamp=datetime(2026, 1, 31, 20, tzinfo=timezone.utc)))
+        rebuild_category_spend(conn, username)
+    assert groceries(client, headers, "2026-01")["spent"] == 20.0
+
+    assert client.put("/account/timezone", headers=headers, json={"timezone": "Pacific/Kiritimati"}).status_code == 200
+    assert groceries(client, headers, "2026-01") is None
+    assert groceries(client, headers, "2026-02")["spent"] == 20.0
+
+    assert client.delete(f"/expenses/{expense_id}", headers=headers).status_code == 200
+    assert all(count == 0 and total == 0 for _, count, total in spend_rows(username))
@@ -0,0 +1,83 @@
+import asyncio
+import threading
+import time
+from datetime import datetime, timezone
+
+import httpx
+
+import calculations
+import main
+from singleflight import SingleFlight
+
+CALLERS = 8
+
+def slow_counter(monkeypatch):
+    """Patch the repeating-expenses total (part of the daily limit) to count calls and take a while."""
+    calls = []
+    lock = threading.Lock()
+
+    def slow(username):
+        with lock:
+            calls.append(username)
+        time.sleep(0.3)
+        return 0
+
+    monkeypatch.setattr(calculations, "calculate_monthly_expenses_repeating", slow)
+    return calls
+
+def test_daily_limit_coalesces_calls_made_with_different_instants(client, username, monkeypatch):
+    calls = slow_counter(monkeypatch)
+    barrier = threading.Barrier(CALLERS)
+    results = []
+
+    def call():
+        barrier.wait()
+        # Each caller passes its own now(); they share the local day
+        results.append(calculations.calculate_daily_limit(username, datetime.now(timezone.utc), "UTC"))
+
+    threads = [threading.Thread(target=call) for _ in range(CALLERS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert len(results) == CALLERS and len(set(results)) == 1
+
+def test_concurrent_dashboards_compute_the_daily_limit_once(client, headers, monkeypatch):
+    calls = slow_counter(monkeypatch)
+
+    async def fetch_all():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as async_client:
+            return await asyncio.gather(*(
+                async_client.get("/financial-dashboard", headers=headers) for _ in range(CALLERS)
+            ))
+
+    responses = asyncio.run(fetch_all())
+
+    assert [response.status_code for response in responses] == [200] * CALLERS
+    assert len({response.json()["daily_limit"] for response in responses}) == 1
+    assert len(calls) == 1
+
+def test_cancelling_the_leader_does_not_cancel_its_followers():
+    flight = SingleFlight("test")
+    runs = []
+
+    async def work():
+        runs.append(1)
+        await asyncio.sleep(0.1)
+        return "done"
+
+    async def scenario():
+        leader = asyncio.ensure_future(flight.do_coroutine("key", work))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(flight.do_coroutine("key", work))
+        await asyncio.sleep(0)
+        leader.cancel()
+        return await follower, leader
+
+    (result, is_leader), leader = asyncio.run(scenario())
+    assert leader.cancelled()
+    assert (result, is_leader) == ("done", False)
+    assert len(runs) == 1
@@ -0,0 +1,40 @@
+import asyncio
+
+from sqlalchemy import text
+
+import commit_queue
+from commit_queue import CommitQueue
+
+def test_writer_connection_is_opened_on_first_use_only(client):
+    queue = CommitQueue()
+    assert queue._engine is None
+
+    result = asyncio.run(queue.submit(lambda session: session.execute(text("SELECT 1")).scalar()))
+    assert result == 1
+    assert queue._engine is not None
+
+    inherited = queue._queue
+    queue.after_fork()
+    assert queue._engine is None and queue._thread is None
+    inherited.put(None)  # No fork here, so stop the old writer thread by hand
+    # The writer starts again, with a connection of its own, after a fork
+    assert asyncio.run(queue.submit(lambda session: session.execute(text("SELECT 2")).scalar())) == 2
+    queue.stop()
+    assert queue._engine is None
+
+def test_expense_writes_go_through_the_writer(client, headers, monkeypatch):
+    queue = CommitQueue()
+    monkeypatch.setattr(commit_queue, "GROUP_COMMIT", True)
+    monkeypatch.setattr(commit_queue, "commit_queue", queue)
+    try:
+        expense_id = client.post("/expenses", headers=headers, json={"name": "Corner Market", "price": 20.0}).json()["id"]
+        updated = client.put(f"/expenses/{expense_id}", headers=headers, json={"price": 35.0})
+        assert updated.status_code == 200 and updated.json()["price"] == 35.0
+        assert client.get("/stats/expenses", headers=headers).json()["total"] == 35.0
+
+        assert client.delete(f"/expenses/{expense_id}", headers=headers).status_code == 200
+        assert client.delete(f"/expenses/{expense_id}", headers=headers).status_code == 404
+        assert client.get("/stats/expenses", headers=headers).json()["count"] == 0
+        assert queue.operations == 4
+    finally:
+        queue.stop()
@@ -0,0 +1,36 @@
+import asyncio
+
+import events
+from events import attach_delta, event_bus
+
+class RecordingBackend:
+    """Stands in for the Redis relay: collects what would be sent to other workers."""
+
+    def __init__(self):
+        self.sent = []
+
+    async def send(self, message: dict):
+        self.sent.append(message)
+
+def test_writers_leave_the_expense_delta_to_subscribers(client, username, headers, monkeypatch):
+    computed = []
+
+    def counting_delta(db, delta_user, tz_name=None):
+        computed.append(delta_user)
+        return events.expense_delta(db, delta_user, tz_name)
+
+    backend = RecordingBackend()
+    monkeypatch.setitem(events.DELTAS, "expense", counting_delta)
+    monkeypatch.setattr(event_bus, "backend", backend)
+
+    response = client.post("/expenses", headers=headers, json={"name": "Corner Market", "price": 20.0})
+    assert response.status_code == 200
+    # Published through the shared backend, but nobody has run the delta queries yet
+    message = next(message for message in backend.sent if message["type"] == "expense.created")
+    assert message["delta"] == "expense" and "delta" not in message["data"]
+    assert computed == []
+
+    delivered = asyncio.run(attach_delta(message, "UTC"))
+    assert computed == [username]
+    assert delivered["data"]["delta"]["dailyTotal"] == 20.0
+    assert delivered["data"]["id"] == response.json()["id"]
@@ -0,0 +1,13 @@
+def test_name_prefix_filters(client, headers):
+    for name in ("Coffee Shop", "coffee beans", "Cinema", "École fees", "école supplies", "100% juice", "1000 pens"):
+        assert client.post("/expenses", headers=headers, json={"name": name, "price": 5.0}).status_code == 200
+
+    def names(prefix):
+        response = client.get("/expenses", headers=headers, params={"name_prefix": prefix})
+        assert response.status_code == 200
+        return sorted(expense["name"] for expense in response.json())
+
+    assert names("COF") == ["Coffee Shop", "coffee beans"]
+    # SQLite's lower() leaves "É" alone, so a str.lower() range would miss this one
+    assert names("École") == ["École fees"]
+    assert names("100%") == ["100% juice"]
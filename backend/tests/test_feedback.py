@@ -0,0 +1,18 @@
+from sqlalchemy import update
+
+from db_env import Account
+from settings.db_settings import engine
+
+def test_feedback_list_requires_admin(client, username, headers):
+    response = client.post("/api/feedback", headers=headers, json={"message": "Great app", "type": "general", "rating": 5})
+    assert response.status_code == 200, response.text
+
+    assert client.get("/api/feedback", headers=headers).status_code == 403
+
+    with engine.begin() as conn:
+        conn.execute(update(Account).where(Account.username == username).values(is_admin=True))
+    response = client.get("/api/feedback", headers=headers)
+    assert response.status_code == 200, response.text
+    mine = [item for item in response.json() if item["username"] == username]
+    assert [item["message"] for item in mine] == ["Great app"]
+    assert set(mine[0]) == {"id", "username", "message", "type", "rating", "timestamp"}
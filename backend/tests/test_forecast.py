@@ -0,0 +1,49 @@
+from datetime import date
+
+import numpy as np
+
+import forecast
+
+TODAY = date(2026, 3, 1)
+
+def history(spend, income, recurring_day=None, horizon=90):
+    recurring = np.zeros(horizon)
+    if recurring_day is not None:
+        recurring[recurring_day] = 120.0
+    return forecast.History(today=TODAY, spend=np.array(spend, dtype=float), income=np.array(income, dtype=float),
+                            salary_daily=36500 / 365, recurring=recurring, savings_goal=500.0)
+
+def test_same_seed_gives_the_same_forecast():
+    rng = np.random.default_rng(7)
+    past = history(rng.gamma(2.0, 30.0, 90), rng.gamma(2.0, 25.0, 90), recurring_day=14)
+    paths = forecast.PATH_BLOCK + 500  # More than one block
+
+    first = forecast.build_forecast(past, 90, paths, seed=42)
+    assert forecast.build_forecast(past, 90, paths, seed=42) == first
+    assert forecast.build_forecast(past, 90, paths, seed=43)["summary"] != first["summary"]
+
+def test_seed_depends_on_the_data_version_and_day():
+    seed = forecast.forecast_seed("alice", 3, TODAY)
+    assert forecast.forecast_seed("alice", 3, TODAY) == seed
+    assert forecast.forecast_seed("alice", 4, TODAY) != seed
+    assert forecast.forecast_seed("alice", 3, date(2026, 3, 2)) != seed
+
+def test_constant_history_has_no_spread():
+    # Every resampled day nets the same, so every path lands on the expected balance
+    past = history([40.0] * 30, [25.0] * 30, recurring_day=9, horizon=365)
+    result = forecast.build_forecast(past, 365, 1000, seed=1)
+
+    assert [row["days"] for row in result["summary"]] == [30, 90, 365]
+    for row in result["summary"]:
+        assert row["p10"] == row["p50"] == row["p90"] == row["expectedBalance"]
+    # 30 days of (100 + 25 - 40) minus the one recurring charge
+    assert result["savingsGoal"]["expectedSavings"] == 30 * 85.0 - 120.0
+    assert result["savingsGoal"]["probability"] == 1.0
+
+def test_forecast_route(client, headers):
+    assert client.post("/expenses", headers=headers, json={"name": "Corner Market", "price": 20.0}).status_code == 200
+    response = client.get("/forecast", headers=headers, params={"horizon": 30, "paths": 200})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["paths"] == 200 and len(body["projection"]) == 30
+    assert client.get("/forecast", headers=headers, params={"horizon": 45}).status_code == 400
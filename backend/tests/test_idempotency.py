@@ -0,0 +1,60 @@
+import asyncio
+
+import httpx
+import msgpack
+
+import commit_queue
+import main
+
+def test_replay_is_negotiated_for_the_retry(client, headers):
+    expense = {"name": "Hardware store " + "x" * 2000, "price": 42.0}
+    first = client.post("/expenses", json=expense,
+                        headers={**headers, "Idempotency-Key": "negotiate-1", "Accept-Encoding": "gzip"})
+    assert first.status_code == 200
+    assert first.headers["content-encoding"] == "gzip"
+
+    plain = client.post("/expenses", json=expense,
+                        headers={**headers, "Idempotency-Key": "negotiate-1", "Accept-Encoding": "identity"})
+    assert plain.headers["idempotent-replayed"] == "true"
+    assert "content-encoding" not in plain.headers
+    assert plain.json() == first.json()
+
+    packed = client.post("/expenses", json=expense,
+                         headers={**headers, "Idempotency-Key": "negotiate-1", "Accept": "application/msgpack",
+                                  "Accept-Encoding": "identity"})
+    assert packed.headers["content-type"] == "application/msgpack"
+    assert msgpack.unpackb(packed.content) == first.json()
+
+def test_duplicates_of_a_failed_request_run_it_again(client, headers, monkeypatch):
+    original = commit_queue.run
+    failures = []
+
+    async def fail_first(work, db):
+        if not failures:
+            failures.append(1)
+            await asyncio.sleep(0.3)  # Long enough for the duplicates to join this run
+            raise RuntimeError("disk full")
+        return await original(work, db)
+
+    monkeypatch.setattr(commit_queue, "run", fail_first)
+    feedback = {"message": "Retry me", "type": "general", "rating": 5}
+    request_headers = {**headers, "Idempotency-Key": "failing-1"}
+
+    async def post_all():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as async_client:
+            first = asyncio.ensure_future(async_client.post("/api/feedback", json=feedback, headers=request_headers))
+            await asyncio.sleep(0.1)
+            duplicates = asyncio.gather(*(
+                async_client.post("/api/feedback", json=feedback, headers=request_headers) for _ in range(3)
+            ))
+            return await first, await duplicates
+
+    first, duplicates = asyncio.run(post_all())
+
+    assert first.status_code == 500
+    assert "idempotent-replayed" not in first.headers
+    assert [response.status_code for response in duplicates] == [200] * 3
+    # One duplicate ran the request again and the others were coalesced onto it
+    assert len({response.json()["id"] for response in duplicates}) == 1
+    assert sorted(response.headers.get("idempotent-replayed", "") for response in duplicates) == ["", "true", "true"]
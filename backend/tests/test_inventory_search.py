@@ -0,0 +1,54 @@
+from sqlalchemy import delete, insert, text, update
+
+import inventory_search
+from db_env import Receipt
+from settings.db_settings import SessionLocal, engine
+
+def search(client, headers, q):
+    response = client.get("/inventory/search", headers=headers, params={"q": q})
+    assert response.status_code == 200
+    return [(row["source"], row["name"]) for row in response.json()["results"]]
+
+def direct_search(username, q):
+    # Straight from the index, since writes made outside the ORM don't invalidate cached responses
+    with SessionLocal() as db:
+        return [(row["source"], row["name"]) for row in inventory_search.search_inventory(db, username, q)["results"]]
+
+def test_item_writes_keep_the_index_in_sync(client, username, headers):
+    item = {"name": "Oat Milk", "quantity": 2, "price": 3.5}
+    item_id = client.post("/inventory", headers=headers, json=item).json()["id"]
+    assert search(client, headers, "oat") == [("inventory", "Oat Milk")]
+
+    assert client.put(f"/inventory/{item_id}", headers=headers, json={**item, "name": "Almond Milk"}).status_code == 200
+    assert search(client, headers, "oat") == []
+    assert search(client, headers, "alm mil") == [("inventory", "Almond Milk")]
+
+    # Triggers also cover writes that bypass the ORM
+    with engine.begin() as conn:
+        conn.execute(text("UPDATE inventory_items SET name = 'Crème fraîche' WHERE id = :id"), {"id": item_id})
+    assert direct_search(username, "creme") == [("inventory", "Crème fraîche")]
+
+    assert client.delete(f"/inventory/{item_id}", headers=headers).status_code == 200
+    assert direct_search(username, "creme") == []
+
+def test_receipt_line_items_are_indexed_per_owner(client, username, headers):
+    other = f"{username}_other"
+    with engine.begin() as conn:
+        receipt_id = conn.execute(insert(Receipt.__table__).values(
+            username=username, vendor="Corner Market", category="Groceries",
+            items=[{"name": "Sourdough Bread", "price": 6.0}, {"name": "Butter", "price": 4.0}, {"price": 1.0}]
+        )).inserted_primary_key[0]
+        conn.execute(insert(Receipt.__table__).values(username=other, items=[{"name": "Sourdough Starter"}]))
+
+    assert direct_search(username, "sour") == [("receipt", "Sourdough Bread")]
+    assert sorted(direct_search(username, "groceries")) == [("receipt", "Butter"), ("receipt", "Sourdough Bread")]
+
+    with engine.begin() as conn:
+        conn.execute(update(Receipt.__table__).where(Receipt.id == receipt_id).values(items=[{"name": "Rye Bread"}]))
+    assert direct_search(username, "sour") == []
+    assert direct_search(username, "bread") == [("receipt", "Rye Bread")]
+
+    with engine.begin() as conn:
+        conn.execute(delete(Receipt.__table__).where(Receipt.id == receipt_id))
+    assert direct_search(username, "bread") == []
+    assert direct_search(other, "sour") == [("receipt", "Sourdough Starter")]
@@ -0,0 +1,49 @@
+import os
+from datetime import datetime, timezone
+
+from sqlalchemy import create_engine, func, inspect, insert, select, text
+
+import migrations
+from db_env import Account, CategorySpend, CategoryStat, Expense, ExpenseHistogramBucket, MerchantDailyTotal
+
+def test_expense_rollups_are_backfilled_for_existing_expenses(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{os.path.join(tmp_path, 'old.db')}")
+    # A database from before the rollups were backfilled: expenses, but no rollup rows
+    monkeypatch.setattr(migrations, "MIGRATIONS", [m for m in migrations.MIGRATIONS if m[0] < 4])
+    migrations.run_migrations(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(Account.__table__).values(username="old_user", password="x", timezone="UTC"))
+        conn.execute(insert(Expense.__table__), [
+            {"username": "old_user", "name": "Corner Market", "price": price, "category": "Groceries",
+             "repeating": False, "timestamp": datetime(2026, 1, day, 12, tzinfo=timezone.utc)}
+            for day, price in ((5, 12.5), (5, 7.5), (6, 30.0))
+        ])
+    monkeypatch.undo()
+
+    assert (4, "expense rollups") in migrations.run_migrations(engine)
+
+    with engine.connect() as conn:
+        stat = conn.execute(select(CategoryStat.__table__)).one()
+        assert (stat.username, stat.category, stat.count) == ("old_user", "Groceries", 3)
+        assert conn.scalar(select(func.sum(ExpenseHistogramBucket.count))) == 3
+        assert conn.scalar(select(func.sum(MerchantDailyTotal.total))) == 50.0
+        assert conn.scalar(select(func.sum(CategorySpend.total))) == 50.0
+    engine.dispose()
+
+def test_admin_flag_is_added_false_for_existing_accounts(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{os.path.join(tmp_path, 'old.db')}")
+    monkeypatch.setattr(migrations, "MIGRATIONS", [m for m in migrations.MIGRATIONS if m[0] < 3])
+    migrations.run_migrations(engine)
+    with engine.begin() as conn:
+        # The baseline creates today's accounts table; drop the column to look like an older one
+        conn.execute(text("ALTER TABLE accounts DROP COLUMN is_admin"))
+        conn.execute(text("INSERT INTO accounts (username, password, data_version) VALUES ('old_user', 'x', 0)"))
+    monkeypatch.undo()
+
+    assert (3, "account admin flag") in migrations.run_migrations(engine)
+
+    with engine.connect() as conn:
+        column = next(col for col in inspect(conn).get_columns("accounts") if col["name"] == "is_admin")
+        assert column["nullable"] is False
+        assert conn.scalar(select(Account.is_admin).where(Account.username == "old_user")) is False
+    engine.dispose()
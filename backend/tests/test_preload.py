@@ -0,0 +1,27 @@
+import asyncio
+
+from sqlalchemy import text
+
+import main
+from commit_queue import CommitQueue
+from settings.db_settings import engine
+
+def test_after_fork_resets_per_process_state(client, headers, monkeypatch):
+    queue = CommitQueue()
+    monkeypatch.setattr(main, "commit_queue", queue)
+    monkeypatch.setattr(main.scheduler, "holder", main.scheduler.holder)
+    asyncio.run(queue.submit(lambda session: session.execute(text("SELECT 1")).scalar()))
+    inherited_queue, pool, holder = queue._queue, engine.pool, main.scheduler.holder
+
+    with engine.connect() as inherited:
+        main.after_fork()
+        # The master's connections are left open for it, not closed from the worker
+        assert inherited.execute(text("SELECT 1")).scalar() == 1
+
+    assert engine.pool is not pool
+    assert queue._engine is None and queue._thread is None
+    assert main.scheduler.holder != holder
+    inherited_queue.put(None)  # No fork here, so stop the old writer thread by hand
+    queue.stop()
+    # The worker opens its own connections from here on
+    assert client.get("/expenses", headers=headers).status_code == 200
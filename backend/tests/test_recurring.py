@@ -0,0 +1,58 @@
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import select
+
+import recurring
+import timeframes
+from db_env import Expense, ExpenseOccurrence
+from settings.db_settings import engine
+
+# 26 hours apart, so the local day always differs between them
+WEST, EAST = "Etc/GMT+12", "Pacific/Kiritimati"
+
+def occurrences(expense_id):
+    with engine.connect() as conn:
+        return sorted(conn.scalars(select(ExpenseOccurrence.occurs_on).where(ExpenseOccurrence.expense_id == expense_id)))
+
+def materialized_through(expense_id):
+    with engine.connect() as conn:
+        return conn.scalar(select(Expense.materialized_through).where(Expense.id == expense_id))
+
+def test_occurrence_dates_expand_each_rule():
+    anchor = date(2026, 1, 15)
+    assert list(recurring.occurrence_dates("weekly", 0, anchor, date(2026, 1, 1), date(2026, 2, 1))) == [
+        date(2026, 1, 19), date(2026, 1, 26)]
+    # Day 31 falls on the last day of shorter months, and nothing fires before the anchor
+    assert list(recurring.occurrence_dates("monthly", 31, anchor, date(2026, 1, 1), date(2026, 4, 30))) == [
+        date(2026, 1, 31), date(2026, 2, 28), date(2026, 3, 31), date(2026, 4, 30)]
+    assert list(recurring.occurrence_dates("yearly", 29, date(2024, 2, 29), date(2024, 1, 1), date(2026, 12, 31))) == [
+        date(2024, 2, 29), date(2025, 2, 28), date(2026, 2, 28)]
+
+def test_rule_edit_regenerates_the_calendar(client, headers):
+    response = client.post("/expenses", headers=headers, json={"name": "Rent", "price": 900.0, "recurrence": "monthly",
+                                                               "recurrence_day": 1})
+    assert response.status_code == 200
+    expense_id = response.json()["id"]
+    assert {day.day for day in occurrences(expense_id)} == {1}
+
+    response = client.put(f"/expenses/{expense_id}", headers=headers, json={"recurrence": "weekly", "recurrence_day": 4})
+    assert response.status_code == 200
+    days = occurrences(expense_id)
+    assert days and {day.weekday() for day in days} == {4}
+    assert all(later - earlier == timedelta(days=7) for earlier, later in zip(days, days[1:]))
+
+def test_timezone_change_regenerates_occurrences(client, headers):
+    assert client.put("/account/timezone", headers=headers, json={"timezone": WEST}).status_code == 200
+    response = client.post("/expenses", headers=headers, json={"name": "Gym", "price": 30.0, "recurrence": "weekly",
+                                                               "recurrence_day": 2})
+    expense_id = response.json()["id"]
+    assert materialized_through(expense_id) == timeframes.local_today(WEST) + timedelta(days=recurring.RECURRENCE_HORIZON_DAYS)
+
+    assert client.put("/account/timezone", headers=headers, json={"timezone": EAST}).status_code == 200
+
+    today = timeframes.local_today(EAST)
+    through = today + timedelta(days=recurring.RECURRENCE_HORIZON_DAYS)
+    assert materialized_through(expense_id) == through
+    anchor = timeframes.local_today(EAST, datetime.fromisoformat(response.json()["timestamp"]))
+    expected = list(recurring.occurrence_dates("weekly", 2, anchor, today - timedelta(days=recurring.RECURRENCE_LOOKBACK_DAYS), through))
+    assert occurrences(expense_id) == expected
@@ -0,0 +1,73 @@
+import pytest
+from sqlalchemy import func, select, update
+
+import calculations
+import recurring
+import scheduler_tasks
+from db_env import Expense, FinancialOverview, JobRun, Task
+from scheduler import LEADER_LEASE, JobSpec, LeaderScheduler, release_lease
+from settings.db_settings import engine
+
+def overview_count(username):
+    with engine.connect() as conn:
+        return conn.scalar(select(func.count()).select_from(FinancialOverview).where(FinancialOverview.username == username))
+
+def test_snapshot_run_fails_when_a_chunk_fails(client, username, monkeypatch):
+    original = calculations.calculate_financial_overviews
+
+    def fail_for_others(session, usernames, current_date=None):
+        if username not in usernames:
+            raise RuntimeError("database is locked")
+        return original(session, usernames, current_date)
+
+    other = f"{username}_other"
+    assert client.post("/register", json={"username": other, "password": "test-password",
+                                          "email": f"{other}@example.com"}).status_code == 200
+    monkeypatch.setattr(calculations, "calculate_financial_overviews", fail_for_others)
+    before = overview_count(username)
+
+    # One user per chunk: this user's chunk is written, every other chunk fails
+    with pytest.raises(RuntimeError, match="snapshot chunks failed"):
+        scheduler_tasks.update_spending_limit(chunk_size=1, workers=0)
+    assert overview_count(username) == before + 1
+
+def test_failed_jobs_are_recorded_as_failed_and_can_run_again(client, username, headers, monkeypatch):
+    response = client.post("/expenses", headers=headers, json={"name": "Gym", "price": 30.0, "recurrence": "monthly"})
+    assert response.status_code == 200
+    with engine.begin() as conn:
+        conn.execute(update(Expense).where(Expense.id == response.json()["id"]).values(materialized_through=None))
+
+    def broken(session, expense, tz_name=None):
+        raise RuntimeError("disk I/O error")
+
+    monkeypatch.setattr(recurring, "materialize", broken)
+    job = JobSpec(id=f"extend_{username}", func=scheduler_tasks.extend_recurring_expenses, cron="15 0 * * *")
+    leader = LeaderScheduler(jobs=[job], holder=f"test-{username}")
+    try:
+        leader._run(job.id)
+        # A failed run doesn't count as recent, so a catch-up run still goes ahead
+        leader._run(job.id)
+    finally:
+        release_lease(LEADER_LEASE, leader.holder)
+
+    with engine.connect() as conn:
+        runs = conn.execute(select(JobRun.status, JobRun.error).where(JobRun.job_id == job.id)).all()
+    assert runs == [("failed", "disk I/O error")] * 2
+
+def test_task_reset_resets_repeating_tasks_and_reports_errors(client, headers, monkeypatch):
+    response = client.post("/tasks", headers=headers, json={"title": "Water plants", "repeat_daily": True})
+    assert response.status_code == 200
+    task_id = response.json()["id"]
+    with engine.begin() as conn:
+        conn.execute(update(Task).where(Task.id == task_id).values(is_complete=True))
+
+    scheduler_tasks.reset_repeating_tasks()
+    with engine.connect() as conn:
+        assert conn.scalar(select(Task.is_complete).where(Task.id == task_id)) is False
+
+    def broken(*args, **kwargs):
+        raise RuntimeError("database is locked")
+
+    monkeypatch.setattr(scheduler_tasks, "update", broken)
+    with pytest.raises(RuntimeError, match="database is locked"):
+        scheduler_tasks.reset_repeating_tasks()
@@ -0,0 +1,48 @@
+from sqlalchemy import select
+
+import sketches
+from db_env import ExpenseHistogramBucket, MerchantDailyTotal
+from settings.db_settings import engine
+
+# 26 hours apart, so the local day always differs between them
+WEST, EAST = "Etc/GMT+12", "Pacific/Kiritimati"
+
+def sketch_rows(username):
+    with engine.connect() as conn:
+        histogram = conn.execute(select(ExpenseHistogramBucket.day, ExpenseHistogramBucket.count,
+                                        ExpenseHistogramBucket.total)
+                                 .where(ExpenseHistogramBucket.username == username)).all()
+        merchants = conn.execute(select(MerchantDailyTotal.day, MerchantDailyTotal.count, MerchantDailyTotal.total)
+                                 .where(MerchantDailyTotal.username == username)).all()
+    return histogram, merchants
+
+def test_bucket_values_are_within_the_relative_error():
+    for amount in (0.5, 1.0, 3.99, 12.5, 87.0, 1234.56, 99999.0):
+        value = sketches.bucket_value(sketches.bucket_index(amount))
+        assert abs(value - amount) / amount <= sketches.BUCKET_RELATIVE_ERROR + 1e-12
+
+def test_percentiles_and_deletion(client, headers):
+    ids = []
+    for price in range(1, 101):
+        response = client.post("/expenses", headers=headers, json={"name": f"Shop {price % 3}", "price": float(price)})
+        ids.append(response.json()["id"])
+
+    stats = client.get("/stats/expenses", headers=headers).json()
+    assert stats["count"] == 100 and stats["total"] == 5050.0
+    for name, exact in (("p50", 50.5), ("p90", 90.1), ("p99", 99.01)):
+        assert abs(stats["percentiles"][name] - exact) / exact <= 2 * sketches.BUCKET_RELATIVE_ERROR
+
+    for expense_id in ids[:50]:
+        assert client.delete(f"/expenses/{expense_id}", headers=headers).status_code == 200
+    stats = client.get("/stats/expenses", headers=headers).json()
+    assert stats["count"] == 50 and stats["total"] == sum(range(51, 101))
+    assert sum(merchant["count"] for merchant in stats["topMerchants"]) == 50
+
+def test_timezone_change_keeps_deletions_on_the_day_they_were_added(client, username, headers):
+    assert client.put("/account/timezone", headers=headers, json={"timezone": WEST}).status_code == 200
+    expense_id = client.post("/expenses", headers=headers, json={"name": "Corner Market", "price": 20.0}).json()["id"]
+    assert client.put("/account/timezone", headers=headers, json={"timezone": EAST}).status_code == 200
+    assert client.delete(f"/expenses/{expense_id}", headers=headers).status_code == 200
+
+    histogram, merchants = sketch_rows(username)
+    assert all(count == 0 and total == 0 for _, count, total in histogram + merchants)
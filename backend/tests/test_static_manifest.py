@@ -0,0 +1,52 @@
+import gzip
+
+import pytest
+
+import main
+from static_manifest import IMMUTABLE_CACHE_CONTROL, REVALIDATE_CACHE_CONTROL, build_frontend_manifest
+
+CHUNK = "_next/static/chunks/main-3f9a2b1c4d5e6f70.js"
+CHUNK_BODY = b"console.log('chunk');" * 200
+
+@pytest.fixture
+def frontend(tmp_path, monkeypatch):
+    out = tmp_path / "out"
+    (out / "_next" / "static" / "chunks").mkdir(parents=True)
+    (out / "index.html").write_text("<html>index</html>")
+    (out / "dashboard.html").write_text("<html>dashboard</html>")
+    (out / CHUNK).write_bytes(CHUNK_BODY)
+    (out / (CHUNK + ".gz")).write_bytes(gzip.compress(CHUNK_BODY))
+    monkeypatch.setattr(main, "frontend_assets", build_frontend_manifest(tmp_path))
+
+def test_pages_and_the_spa_fallback(client, frontend):
+    page = client.get("/dashboard")
+    assert page.status_code == 200 and page.text == "<html>dashboard</html>"
+    assert page.headers["cache-control"] == REVALIDATE_CACHE_CONTROL
+    # Client-side routes get index.html
+    assert client.get("/settings/profile").text == "<html>index</html>"
+
+@pytest.mark.parametrize("path", ["/_next/static/chunks/missing-0123456789abcdef.js", "/static/css/missing.css",
+                                  "/out/missing.html", "/public/missing.png"])
+def test_missing_assets_are_not_found(client, frontend, path):
+    assert client.get(path).status_code == 404
+
+def test_precompressed_variant_is_negotiated(client, frontend):
+    compressed = client.get("/" + CHUNK, headers={"Accept-Encoding": "gzip"})
+    assert compressed.headers["content-encoding"] == "gzip"
+    assert compressed.headers["vary"] == "Accept-Encoding"
+    assert compressed.headers["cache-control"] == IMMUTABLE_CACHE_CONTROL
+    assert compressed.content == CHUNK_BODY
+
+    plain = client.get("/" + CHUNK, headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in plain.headers
+    assert plain.content == CHUNK_BODY
+    assert plain.headers["etag"] != compressed.headers["etag"]
+
+def test_matching_etag_is_not_modified(client, frontend):
+    first = client.get("/" + CHUNK, headers={"Accept-Encoding": "gzip"})
+    etag = first.headers["etag"]
+    again = client.get("/" + CHUNK, headers={"Accept-Encoding": "gzip", "If-None-Match": f'W/{etag}, "other"'})
+    assert again.status_code == 304 and again.content == b""
+    assert again.headers["etag"] == etag
+    # The identity file has its own ETag, so the gzip one does not match it
+    assert client.get("/" + CHUNK, headers={"Accept-Encoding": "identity", "If-None-Match": etag}).status_code == 200
@@ -0,0 +1,79 @@
+# This file converts a user's local calendar (day, week, month) into UTC range bounds.
+# Timestamps are stored as naive UTC, so every aggregation can filter on
+# "timestamp >= start AND timestamp < end" and stay index friendly instead of
+# converting each row to local time in SQL. Bounds are cached per (timezone, day),
+# so all users sharing a timezone share one computation per day.
+
+import os
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta, timezone
+from functools import lru_cache
+from typing import Optional, Tuple
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+# Used for accounts that haven't set a timezone (the app previously assumed UTC-5)
+DEFAULT_TIMEZONE = os.environ.get("DEFAULT_TIMEZONE", "America/New_York")
+
+@dataclass(frozen=True, slots=True)
+class Timeframe:
+    """A local day with its day, week and month bounds as naive UTC datetimes (end exclusive)."""
+    timezone: str
+    today: date
+    day_start: datetime
+    day_end: datetime
+    week_start: datetime
+    week_end: datetime
+    month_start: datetime
+    month_end: datetime
+
+@lru_cache(maxsize=None)
+def is_valid_timezone(name: str) -> bool:
+    try:
+        ZoneInfo(name)
+        return True
+    except (ZoneInfoNotFoundError, ValueError):
+        return False
+
+def resolve_timezone(name: Optional[str]) -> str:
+    """The IANA name to use for an account, falling back to DEFAULT_TIMEZONE."""
+    return name if name and is_valid_timezone(name) else DEFAULT_TIMEZONE
+
+def _utc_midnight(tz_name: str, day: date) -> datetime:
+    local = datetime.combine(day, time.min, tzinfo=ZoneInfo(tz_name))
+    return local.astimezone(timezone.utc).replace(tzinfo=None)
+
+def local_today(tz_name: Optional[str] = None, now: Optional[datetime] = None) -> date:
+    """The calendar day in a timezone at a UTC instant (now by default; naive means UTC)."""
+    now = now or datetime.now(timezone.utc)
+    if now.tzinfo is None:
+        now = now.replace(tzinfo=timezone.utc)
+    return now.astimezone(ZoneInfo(resolve_timezone(tz_name))).date()
+
+@lru_cache(maxsize=4096)
+def _timeframe(tz_name: str, today: date) -> Timeframe:
+    week_start = today - timedelta(days=today.weekday())
+    month_start = today.replace(day=1)
+    next_month = (month_start + timedelta(days=32)).replace(day=1)
+    return Timeframe(
+        timezone=tz_name,
+        today=today,
+        day_start=_utc_midnight(tz_name, today),
+        day_end=_utc_midnight(tz_name, today + timedelta(days=1)),
+        week_start=_utc_midnight(tz_name, week_start),
+        week_end=_utc_midnight(tz_name, week_start + timedelta(days=7)),
+        month_start=_utc_midnight(tz_name, month_start),
+        month_end=_utc_midnight(tz_name, next_month)
+    )
+
+def timeframe(tz_name: Optional[str] = None, now: Optional[datetime] = None, today: Optional[date] = None) -> Timeframe:
+    """Day, week and month bounds for a timezone, for a given local day or the day at now."""
+    tz_name = resolve_timezone(tz_name)
+    return _timeframe(tz_name, today or local_today(tz_name, now))
+
+@lru_cache(maxsize=4096)
+def _day_edges(tz_name: str, first_day: date, days: int) -> Tuple[datetime, ...]:
+    return tuple(_utc_midnight(tz_name, first_day + timedelta(days=i)) for i in range(days + 1))
+
+def day_edges(tz_name: Optional[str], first_day: date, days: int) -> Tuple[datetime, ...]:
+    """UTC midnights bounding `days` consecutive local days (days + 1 edges, DST aware)."""
+    return _day_edges(resolve_timezone(tz_name), first_day, days)